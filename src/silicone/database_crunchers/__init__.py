@@ -8,13 +8,16 @@ timeseries.
 """
 
 from .constant_ratio import ConstantRatio  # noqa: F401
+from .database_store import load_database_store, save_database_store  # noqa: F401
 from .equal_quantile_walk import EqualQuantileWalk  # noqa: F401
 from .interpolate_specified_scenarios_and_models import (  # noqa: F401
     ScenarioAndModelSpecificInterpolate,
 )
 from .latest_time_ratio import LatestTimeRatio  # noqa: F401
+from .lazy_result import LazyResult  # noqa: F401
 from .linear_interpolation import LinearInterpolation  # noqa: F401
 from .quantile_rolling_windows import QuantileRollingWindows  # noqa: F401
+from .relationship_cache import RelationshipCache  # noqa: F401
 from .rms_closest import RMSClosest  # noqa: F401
 from .time_dep_quantile_rolling_windows import (  # noqa: F401
     TimeDepQuantileRollingWindows,
@@ -1,24 +1,78 @@
 from abc import ABCMeta, abstractmethod
 
+import numpy as np
+
+from ..utils import _write_output
+from .cube import (
+    _check_database_unchanged,
+    _DatabaseCube,
+    _fingerprint_database,
+    _get_shared_cube,
+    _MetadataIndex,
+)
+from .lazy_result import _make_filler_output
+
 
 class _DatabaseCruncher(metaclass=ABCMeta):
     """
     Base class for database crunching.
 
     Common operations are shared here, allowing subclasses to just focus on
-    implementing the crunching algorithms.
+    implementing the crunching algorithms. In particular, the first time it is needed
+    the database is converted into a :class:`_DatabaseCube`, from which subclasses
+    select the data they need by integer indexing, and a :class:`_MetadataIndex` of
+    it is used to validate requests.
     """
 
-    def __init__(self, db):
+    def __init__(self, db, copy=True, compact=False):
         """
         Initialise the database cruncher
 
         Parameters
         ----------
         db : IamDataFrame
-            The database to use
+            The database to use. This may also be a database loaded from disk with
+            :func:`silicone.database_crunchers.load_database_store`, in which case
+            ``copy`` and ``compact`` have no effect.
+
+        copy : bool
+            If ``True``, the cruncher works on a copy of ``db``. If ``False``, the
+            cruncher only keeps a reference to ``db``, which avoids duplicating large
+            databases in memory, and all crunchers created from the same database in
+            this way share a single (read-only) array representation of it. ``db``
+            must then not be modified until relationships have been derived from it.
+            Modifications which replace its data (as most pyam operations do) raise a
+            ``ValueError``, but changes made directly to the values or labels of
+            ``db.data`` are not detected.
+
+        compact : bool
+            If ``True``, the cruncher immediately converts ``db`` into its array
+            representation, with the values stored as ``float32`` and each label
+            stored once (as in a categorical), and keeps no copy of or reference to
+            ``db`` itself. This roughly halves the memory needed for the values of
+            large databases, at the cost of their precision (reductions over them are
+            still calculated in ``float64``). ``copy`` has no effect in this case.
         """
-        self._db = db.copy()
+        if isinstance(db, _DatabaseCube):
+            self._db = None
+            self._db_fingerprint = None
+            self._cube = db
+            self._metadata = None
+            return
+        if compact:
+            self._db = None
+            self._db_fingerprint = None
+            self._cube = _DatabaseCube(db.data, db.time_col, dtype=np.float32)
+            self._metadata = None
+            return
+        if copy:
+            self._db = db.copy()
+            self._db_fingerprint = None
+        else:
+            self._db = db
+            self._db_fingerprint = _fingerprint_database(db)
+        self._cube = None
+        self._metadata = None
 
     @abstractmethod
     def derive_relationship(self, variable_follower, variable_leaders, **kwargs):
@@ -46,19 +100,234 @@ class _DatabaseCruncher(metaclass=ABCMeta):
             ``variable_leaders`` timeseries and returns timeseries for
             ``variable_follower`` based on the derived relationship between the two.
             Please see the source code for the exact definition (and docstring) of the
-            returned function.
+            returned function. Its ``fill_array`` attribute is an array version of it,
+            which takes an :obj:`np.ndarray` of leader values (with a row per
+            timeseries and a column per time) and their times and returns the follower
+            values, optionally writing them into a supplied output array. Its
+            ``trusted`` attribute validates some input once and returns a version of
+            it which skips validation, for use with inputs of the same format. For
+            some crunchers, its ``tables`` attribute holds the arrays which fully
+            determine it, so that it can be saved and rebuilt without the database,
+            otherwise this is ``None``.
         """
         # TODO: think about how to add region handling in here...
 
-    def _check_follower_and_leader_in_db(self, variable_follower, variable_leaders):
+    def derive_relationships(self, variable_followers, variable_leaders, **kwargs):
+        """
+        Derive the relationships between several followers and the same leaders
+
+        By default, this simply calls :meth:`derive_relationship` for each follower.
+        Crunchers may override it to share the work which only depends on the
+        leaders between the followers.
+
+        Parameters
+        ----------
+        variable_followers : list[str]
+            The variables for which we want to calculate timeseries (e.g.
+            ``["Emissions|C5F12", "Emissions|C6F14"]``).
+
+        variable_leaders : list[str]
+            The variables we want to use in order to infer timeseries of
+            ``variable_followers`` (e.g. ``["Emissions|CO2", "Emissions|CH4"]``)
+
+        **kwargs
+            Keyword arguments passed to :meth:`derive_relationship`.
+
+        Returns
+        -------
+        dict{str: :obj:`func`}
+            Dictionary mapping each of ``variable_followers`` to the filler function
+            which :meth:`derive_relationship` returns for it.
+        """
+        return {
+            variable_follower: self.derive_relationship(
+                variable_follower, variable_leaders, **kwargs
+            )
+            for variable_follower in variable_followers
+        }
+
+    @staticmethod
+    def _build_filler(
+        validate,
+        fill_values,
+        variable_follower,
+        variable_leaders,
+        follower_unit,
+        tables=None,
+        trusted_filler=None,
+    ):
+        """
+        Build the filler function of a derived relationship, with its alternative
+        interfaces (see :meth:`derive_relationship`).
+
+        Crunchers only supply the parts which are specific to them. ``validate``
+        checks that a :obj:`pyam.IamDataFrame` can be infilled, raising an error if
+        not. ``fill_values`` is the array kernel of the relationship: it takes the
+        leader values (as a ``float`` array with a row per timeseries and a column per
+        time), their times and any keyword arguments of the filler function, and
+        returns the follower values. ``tables`` are the arrays from which the
+        relationship was built, if any. Crunchers whose output is not simply the
+        follower values at the times of the leader supply their own
+        ``trusted_filler``, which takes the same arguments as the filler function and
+        skips validation (``variable_follower`` and ``follower_unit`` are only used by
+        the default one).
+        """
+
+        def filler(in_iamdf, lazy=False, **kwargs):
+            """
+            Filler function derived from a database cruncher. See the
+            ``derive_relationship`` method of the cruncher for details.
+
+            Parameters
+            ----------
+            in_iamdf : :obj:`pyam.IamDataFrame`
+                Input data to fill data in
+
+            lazy : bool
+                If ``True``, return a :obj:`LazyResult` rather than a
+                :obj:`pyam.IamDataFrame`.
+
+            **kwargs
+                Keyword arguments which control the infilling, for the crunchers which
+                have any (e.g. ``interpolate`` for :class:`LatestTimeRatio`).
 
-        if not all([v in self._db.variables().tolist() for v in variable_leaders]):
+            Returns
+            -------
+            :obj:`pyam.IamDataFrame` or :obj:`LazyResult`
+                Filled in data (without original source data)
+
+            Raises
+            ------
+            ValueError
+                ``in_iamdf`` cannot be infilled, e.g. it does not have data for the
+                times or units of the database the relationship was derived from.
+            """
+            validate(in_iamdf)
+            return trusted_filler(in_iamdf, lazy=lazy, **kwargs)
+
+        def fill_array(lead_values, fill_times, out=None, **kwargs):
+            """
+            Array version of the filler function, which skips all the checks and
+            conversions of :obj:`pyam.IamDataFrame` data.
+
+            Parameters
+            ----------
+            lead_values : np.ndarray
+                Values of the lead variable (in the units of the database), with a row
+                per timeseries and a column per entry of ``fill_times``.
+
+            fill_times : list-like
+                The (sorted) times of the columns of ``lead_values``.
+
+            out : np.ndarray
+                If supplied, the follower values are written into this array, which
+                must have the same shape as the returned array.
+
+            **kwargs
+                Keyword arguments of the filler function which control the infilling.
+
+            Returns
+            -------
+            np.ndarray
+                The values of the follower variable (in the units of the database),
+                with the same shape as ``lead_values`` unless the cruncher documents
+                otherwise.
+
+            Raises
+            ------
+            ValueError
+                The relationship cannot be applied at ``fill_times``.
+            """
+            lead = np.asarray(lead_values, dtype=float)
+            return _write_output(fill_values(lead, fill_times, **kwargs), out)
+
+        if trusted_filler is None:
+
+            def trusted_filler(in_iamdf, lazy=False, **kwargs):
+                """
+                Does the same as ``filler`` without validating ``in_iamdf``.
+                """
+                output_ts = in_iamdf.filter(variable=variable_leaders).timeseries()
+                output_ts.loc[:, :] = fill_array(
+                    output_ts.values, output_ts.columns, **kwargs
+                )
+                output_ts = output_ts.reset_index()
+                output_ts["variable"] = variable_follower
+                output_ts["unit"] = follower_unit
+                return _make_filler_output(output_ts, lazy)
+
+        def trusted(in_iamdf):
+            """
+            Validate ``in_iamdf`` and get a version of the filler function which skips
+            all validation.
+
+            This avoids repeating the checks when many inputs with the same format are
+            infilled (e.g. in Monte Carlo runs or a streaming service), where they
+            often take longer than the infilling itself. The returned function must
+            only be used with inputs which have the same time column, times, variables
+            and units as ``in_iamdf``, otherwise its results are undefined.
+
+            Parameters
+            ----------
+            in_iamdf : :obj:`pyam.IamDataFrame`
+                Input data with the format of the data which will be infilled
+
+            Returns
+            -------
+            :obj:`func`
+                Function which takes the same arguments, and returns the same results,
+                as the filler function.
+
+            Raises
+            ------
+            ValueError
+                ``in_iamdf`` cannot be infilled by the filler function.
+            """
+            validate(in_iamdf)
+            return trusted_filler
+
+        filler.fill_array = fill_array
+        filler.trusted = trusted
+        filler.tables = tables
+        return filler
+
+    def _get_cube(self):
+        """
+        Get the database as a :class:`_DatabaseCube`. This is only built once.
+
+        Raises
+        ------
+        ValueError
+            The cruncher was created with ``copy=False`` and the database has been
+            modified since.
+        """
+        if self._cube is None:
+            if self._db_fingerprint is None:
+                self._cube = _DatabaseCube(self._db.data, self._db.time_col)
+            else:
+                _check_database_unchanged(self._db, self._db_fingerprint)
+                self._cube = _get_shared_cube(self._db, self._db_fingerprint)
+
+        return self._cube
+
+    def _get_metadata(self):
+        """
+        Get the :class:`_MetadataIndex` of the database. This is only built once.
+        """
+        if self._metadata is None:
+            self._metadata = _MetadataIndex.from_cube(self._get_cube())
+
+        return self._metadata
+
+    def _check_follower_and_leader_in_db(self, variable_follower, variable_leaders):
+        metadata = self._get_metadata()
+        if not all([v in metadata for v in variable_leaders]):
             error_msg = "No data for `variable_leaders` ({}) in database".format(
                 variable_leaders
             )
             raise ValueError(error_msg)
 
-        if variable_follower not in self._db.variables().tolist():
+        if variable_follower not in metadata:
             error_msg = "No data for `variable_follower` ({}) in database".format(
                 variable_follower
             )
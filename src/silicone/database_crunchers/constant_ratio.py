@@ -3,10 +3,11 @@ Module for the database cruncher which uses the 'constant given ratio' technique
 """
 import logging
 
+import numpy as np
 import pandas as pd
-from pyam import IamDataFrame
 
 from .base import _DatabaseCruncher
+from .lazy_result import LazyResult
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +28,7 @@ class ConstantRatio(_DatabaseCruncher):
     emissions of the lead variable.
     """
 
-    def __init__(self, db=None):
+    def __init__(self, db=None, copy=True, compact=False):
         """
         Initialise the database cruncher
 
@@ -36,6 +37,12 @@ class ConstantRatio(_DatabaseCruncher):
         db : IamDataFrame
             Supplied to ensure consistency with the base class. This cruncher doesn't
             actually use the database at all.
+
+        copy : bool
+            Supplied to ensure consistency with the base class. It has no effect.
+
+        compact : bool
+            Supplied to ensure consistency with the base class. It has no effect.
         """
         if db is not None:
             logger.info(
@@ -44,15 +51,19 @@ class ConstantRatio(_DatabaseCruncher):
 
         super().__init__(pd.DataFrame())
 
-    def derive_relationship(self, variable_follower, variable_leaders, ratio, units):
+    def derive_relationship(
+        self, variable_follower, variable_leaders, ratio=None, units=None
+    ):
         """
         Derive the relationship between two variables from the database.
 
         Parameters
         ----------
-        variable_follower : str
+        variable_follower : str or dict{str: (float, str)}
             The variable for which we want to calculate timeseries (e.g.
-            ``"Emissions|C5F12"``).
+            ``"Emissions|C5F12"``). Alternatively, a dictionary mapping several
+            follower variables to their ``(ratio, units)``, in which case all of them
+            are calculated together and ``ratio`` and ``units`` must not be given.
 
         variable_leaders : list[str]
             The variable we want to use in order to infer timeseries of
@@ -70,40 +81,96 @@ class ConstantRatio(_DatabaseCruncher):
             Function which takes a :obj:`pyam.IamDataFrame` containing
             ``variable_leaders`` timeseries and returns timeseries for
             ``variable_follower`` based on the derived relationship between the two.
+
+        Raises
+        ------
+        ValueError
+            ``variable_leaders`` contains more than one variable.
+
+        ValueError
+            ``ratio`` and ``units`` are not given for a single follower, or are given
+            as well as a dictionary of followers.
         """
         if len(variable_leaders) > 1:
             raise ValueError(
                 "For `ConstantRatio`, ``variable_leaders`` should only "
                 "contain one variable"
             )
-
-        def filler(in_iamdf):
+        if isinstance(variable_follower, dict):
+            if ratio is not None or units is not None:
+                raise ValueError(
+                    "`ratio` and `units` must be given in the dictionary of followers "
+                    "rather than as arguments"
+                )
+            followers = list(variable_follower.keys())
+            ratios, follower_units = zip(*variable_follower.values())
+        else:
+            if ratio is None or units is None:
+                raise ValueError("`ratio` and `units` must be given")
+            followers = [variable_follower]
+            ratios = [ratio]
+            follower_units = [units]
+        ratios = np.array(ratios, dtype=float)
+
+        def validate(in_iamdf):
             """
-            Filler function derived from :obj:`TimeDepRatio`.
-
-            Parameters
-            ----------
-            in_iamdf : :obj:`pyam.IamDataFrame`
-                Input data to fill data in
-
-            Returns
-            -------
-            :obj:`pyam.IamDataFrame`
-                Filled-in data (without original source data)
-
-            Raises
-            ------
-            ValueError
-                The key year for filling is not in ``in_iamdf``.
+            Checks that ``in_iamdf`` can be infilled.
             """
-            output_ts = in_iamdf.filter(variable=variable_leaders)
+            lead_units = in_iamdf.data.loc[
+                in_iamdf.data["variable"].isin(variable_leaders), "unit"
+            ]
             assert (
-                output_ts["unit"].nunique() == 1
+                lead_units.nunique() == 1
             ), "There are multiple units for the lead variable."
-            output_ts["value"] = output_ts["value"] * ratio
-            output_ts["variable"] = variable_follower
-            output_ts["unit"] = units
+
+        def trusted_filler(in_iamdf, lazy=False):
+            """
+            Infills ``in_iamdf`` without validating it, with the data of all the
+            followers together.
+            """
+            output_ts = in_iamdf.filter(variable=variable_leaders)
+            if lazy:
+                lead_ts = output_ts.timeseries()
+                lead_unit = output_ts["unit"].iloc[0]
+                return LazyResult.concat(
+                    [
+                        LazyResult(
+                            (lead_ts * ratio)
+                            .rename(
+                                index={variable_leaders[0]: follower}, level="variable"
+                            )
+                            .rename(index={lead_unit: unit}, level="unit")
+                        )
+                        for follower, ratio, unit in zip(
+                            followers, ratios, follower_units
+                        )
+                    ]
+                )
+            # Repeat the leader data once for each follower
+            n_lead = len(output_ts.data)
+            data = pd.concat([output_ts.data] * len(followers), ignore_index=True)
+            data["value"] = data["value"].values * np.repeat(ratios, n_lead)
+            data["variable"] = np.repeat(followers, n_lead)
+            data["unit"] = np.repeat(follower_units, n_lead)
+            output_ts.data = data
 
             return output_ts
 
-        return filler
+        def fill_values(lead, fill_times):
+            """
+            Infills ``lead``, whatever ``fill_times`` are, as the ratio is the same at
+            all times. If a dictionary of followers was given, the values of each
+            follower are stacked along a new first axis.
+            """
+            if isinstance(variable_follower, dict):
+                return ratios.reshape((-1,) + (1,) * lead.ndim) * lead
+            return ratios[0] * lead
+
+        return self._build_filler(
+            validate,
+            fill_values,
+            variable_follower,
+            variable_leaders,
+            follower_units,
+            trusted_filler=trusted_filler,
+        )
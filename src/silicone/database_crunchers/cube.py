@@ -0,0 +1,506 @@
+"""
+Dense array representation of a database, shared by the database crunchers.
+"""
+import hashlib
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from ..utils import _TimeIndex
+
+# Cubes of the databases used by crunchers which do not copy their database, so that
+# crunchers created from the same database can share them
+_SHARED_CUBES = weakref.WeakKeyDictionary()
+
+
+class _DatabaseCube:
+    """
+    Dense representation of the timeseries in a database.
+
+    The data is held in a single float array with dimensions of timeseries key (a
+    variable and unit pair), run (a unique combination of model, scenario, region and
+    any extra columns) and time. Missing data is ``nan``. Crunchers can then select
+    data by integer indexing rather than repeatedly filtering and pivoting the
+    long-format data. The arrays are read-only, so that cubes can be shared between
+    crunchers.
+    """
+
+    def __init__(self, data, time_col, dtype=float):
+        """
+        Initialise the cube
+
+        Parameters
+        ----------
+        data : :obj:`pd.DataFrame`
+            Long-format data, as held by :obj:`pyam.IamDataFrame`, i.e. with columns
+            "model", "scenario", "region", "variable", "unit", ``time_col``, "value"
+            and optionally some extra columns.
+
+        time_col : str
+            The name of the time column (``"year"`` or ``"time"``)
+
+        dtype : :obj:`np.dtype`
+            The type in which the values are stored, e.g. ``np.float32`` to halve the
+            memory they need
+        """
+        self.time_col = time_col
+        self.run_cols = [
+            c for c in data.columns if c not in ["variable", "unit", time_col, "value"]
+        ]
+        key_codes, self.keys = _factorize_columns(data, ["variable", "unit"])
+        run_codes, self.runs = _factorize_columns(data, self.run_cols)
+        time_codes, self.times = pd.factorize(data[time_col], sort=True)
+        shape = (len(self.keys), len(self.runs), len(self.times))
+        self.values = np.full(shape, np.nan, dtype=dtype)
+        self.values[key_codes, run_codes, time_codes] = data["value"].values
+        self._set_up()
+
+    @classmethod
+    def from_arrays(cls, values, time_col, run_cols, keys, runs, times, key_times=None):
+        """
+        Create a cube from its values and labels, e.g. as stored on disk
+
+        Parameters
+        ----------
+        values : :obj:`np.ndarray`
+            The values, with dimensions of key, run and time. This may be a
+            memory-mapped array.
+
+        time_col : str
+            The name of the time column
+
+        run_cols : list[str]
+            The names of the columns which identify a run
+
+        keys : :obj:`pd.MultiIndex`
+            The variable and unit of each key
+
+        runs : :obj:`pd.MultiIndex`
+            The values of ``run_cols`` of each run
+
+        times : :obj:`pd.Index`
+            The (sorted) times
+
+        key_times : :obj:`np.ndarray`
+            Which times each key has data at (see :attr:`key_times`), if known. This
+            avoids reading all the values to find it.
+
+        Returns
+        -------
+        :obj:`_DatabaseCube`
+            The cube
+        """
+        cube = cls.__new__(cls)
+        cube.values = values
+        cube.time_col = time_col
+        cube.run_cols = run_cols
+        cube.keys = keys
+        cube.runs = runs
+        cube.times = times
+        cube._set_up(key_times)
+        return cube
+
+    def _set_up(self, key_times=None):
+        """
+        Builds the lookups shared by all cubes once their values and labels are set
+        """
+        self.values.setflags(write=False)
+        self.time_index = _TimeIndex(self.times)
+        self._variable_keys = {}
+        for ind, variable in enumerate(self.keys.get_level_values("variable")):
+            self._variable_keys.setdefault(variable, []).append(ind)
+        self._mask = None
+        self._key_times = key_times
+
+    @property
+    def mask(self):
+        """
+        :obj:`np.ndarray` of bool: Which values are present (i.e. not ``nan``)
+        """
+        if self._mask is None:
+            self._mask = ~np.isnan(self.values)
+            self._mask.setflags(write=False)
+        return self._mask
+
+    @property
+    def key_times(self):
+        """
+        :obj:`np.ndarray` of bool: Which times each key has data at, with a row per
+        key and a column per time
+        """
+        if self._key_times is None:
+            # Work through the keys one by one, so that memory-mapped values do not
+            # all need to be read at once
+            self._key_times = np.array(
+                [self.key_mask(ind).any(axis=0) for ind in range(len(self.keys))],
+                dtype=bool,
+            ).reshape(len(self.keys), len(self.times))
+        return self._key_times
+
+    def key_mask(self, indices):
+        """
+        Get which values of some keys are present, without building :attr:`mask` for
+        the whole cube
+
+        Parameters
+        ----------
+        indices : int or list[int]
+            The indices of the keys along the first axis
+
+        Returns
+        -------
+        :obj:`np.ndarray` of bool
+            ``self.mask[indices]``
+        """
+        if self._mask is not None:
+            return self._mask[indices]
+        return ~np.isnan(self.values[indices])
+
+    @property
+    def variables(self):
+        """
+        list[str]: The variables in the database
+        """
+        return list(self._variable_keys.keys())
+
+    def key_indices(self, variable):
+        """
+        Get the indices along the first axis of the timeseries of a variable
+
+        Parameters
+        ----------
+        variable : str
+            The variable of interest
+
+        Returns
+        -------
+        list[int]
+            The indices, one per unit that the variable is reported in (empty if the
+            variable is not in the database)
+        """
+        return self._variable_keys.get(variable, [])
+
+    def units(self, variable):
+        """
+        Get the units of a variable
+
+        Parameters
+        ----------
+        variable : str
+            The variable of interest
+
+        Returns
+        -------
+        list[str]
+            The units in which ``variable`` is reported
+        """
+        return [self.keys[ind][1] for ind in self.key_indices(variable)]
+
+    def variable_values(self, variable):
+        """
+        Get the values of a variable which is only reported in one unit
+
+        Parameters
+        ----------
+        variable : str
+            The variable of interest
+
+        Returns
+        -------
+        :obj:`np.ndarray`
+            Array of values with a row per run and a column per time
+
+        Raises
+        ------
+        ValueError
+            ``variable`` is not reported in exactly one unit
+        """
+        indices = self.key_indices(variable)
+        if len(indices) != 1:
+            raise ValueError(
+                "`{}` is reported in {} units".format(variable, len(indices))
+            )
+        return self.values[indices[0]]
+
+    def group_runs(self, columns):
+        """
+        Group the runs by the values of some of their columns
+
+        Parameters
+        ----------
+        columns : list[str]
+            The columns to group by (e.g. ``["model", "scenario"]``)
+
+        Returns
+        -------
+        (:obj:`np.ndarray`, int)
+            The integer code of the group of each run and the number of groups
+        """
+        codes, groups = _factorize_columns(self.runs.to_frame(index=False), columns)
+        return codes, len(groups)
+
+    def timeseries(self, variable, values=None):
+        """
+        Get the data for a variable in the same format as
+        :meth:`pyam.IamDataFrame.timeseries`
+
+        Runs and times without any data are dropped.
+
+        Parameters
+        ----------
+        variable : str
+            The variable of interest
+
+        values : :obj:`np.ndarray`
+            If supplied, these values are used instead of those in the cube. They must
+            have the same shape as ``self.values[self.key_indices(variable)]``, e.g.
+            they may be the values of ``variable`` with some of them masked.
+
+        Returns
+        -------
+        :obj:`pd.DataFrame`
+            The timeseries of ``variable``, indexed by run, variable and unit
+        """
+        indices = self.key_indices(variable)
+        if not indices:
+            raise ValueError("No data for `{}` in database".format(variable))
+        if values is None:
+            values = self.values[indices]
+        frames = []
+        for ind, key_values in zip(indices, values):
+            run_mask = ~np.isnan(key_values).all(axis=1)
+            index = self.runs[run_mask].to_frame(index=False)
+            index["variable"], index["unit"] = self.keys[ind]
+            frames.append(
+                pd.DataFrame(
+                    key_values[run_mask],
+                    index=pd.MultiIndex.from_frame(index),
+                    columns=self.times,
+                )
+            )
+        return pd.concat(frames).dropna(axis=1, how="all")
+
+
+class _MetadataIndex:
+    """
+    Index of the variables, units and times in some data.
+
+    This allows the data to be validated (e.g. checking which units a variable is
+    reported in) with dictionary lookups rather than by filtering or pivoting it.
+    """
+
+    def __init__(self, units, times, all_times, time_col, runs=None):
+        """
+        Initialise the index. Normally, an index is created using
+        :meth:`from_data` or :meth:`from_cube` instead.
+
+        Parameters
+        ----------
+        units : dict{str: list[str]}
+            The units in which each variable is reported
+
+        times : dict{str: :obj:`pd.Index`}
+            The (sorted) times at which each variable has data
+
+        all_times : :obj:`pd.Index`
+            The (sorted) times at which any variable has data
+
+        time_col : str
+            The name of the time column
+
+        runs : :obj:`pd.MultiIndex`
+            The runs (unique combinations of model, scenario, region and any extra
+            columns) in the data, if known
+        """
+        self._units = units
+        self._times = times
+        self.all_times = all_times
+        self.time_col = time_col
+        self.runs = runs
+
+    @classmethod
+    def from_data(cls, data, time_col):
+        """
+        Build an index from long-format data
+
+        Parameters
+        ----------
+        data : :obj:`pd.DataFrame`
+            Data in the format of :attr:`pyam.IamDataFrame.data`
+
+        time_col : str
+            The name of the time column
+
+        Returns
+        -------
+        :obj:`_MetadataIndex`
+            Index of ``data`` (without runs)
+        """
+        units = {}
+        for variable, unit in data[["variable", "unit"]].drop_duplicates().values:
+            units.setdefault(variable, []).append(unit)
+        var_times = data[["variable", time_col]].drop_duplicates()
+        times = {
+            variable: pd.Index(np.sort(group.values))
+            for variable, group in var_times.groupby("variable")[time_col]
+        }
+        all_times = pd.Index(np.sort(var_times[time_col].unique()))
+        return cls(units, times, all_times, time_col)
+
+    @classmethod
+    def from_cube(cls, cube):
+        """
+        Build an index from a :class:`_DatabaseCube`
+
+        Parameters
+        ----------
+        cube : :obj:`_DatabaseCube`
+            The cube to index
+
+        Returns
+        -------
+        :obj:`_MetadataIndex`
+            Index of ``cube``
+        """
+        key_times = cube.key_times
+        units = {}
+        times = {}
+        for variable in cube.variables:
+            indices = cube.key_indices(variable)
+            units[variable] = cube.units(variable)
+            times[variable] = cube.times[key_times[indices].any(axis=0)]
+        all_times = cube.times[key_times.any(axis=0)]
+        return cls(units, times, all_times, cube.time_col, runs=cube.runs)
+
+    @property
+    def variables(self):
+        """
+        list[str]: The variables in the data
+        """
+        return list(self._units.keys())
+
+    def __contains__(self, variable):
+        return variable in self._units
+
+    def units(self, variable):
+        """
+        Get the units of a variable
+
+        Parameters
+        ----------
+        variable : str
+            The variable of interest
+
+        Returns
+        -------
+        list[str]
+            The units in which ``variable`` is reported (empty if there is no data
+            for ``variable``)
+        """
+        return self._units.get(variable, [])
+
+    def times(self, variable):
+        """
+        Get the times at which a variable has data
+
+        Parameters
+        ----------
+        variable : str
+            The variable of interest
+
+        Returns
+        -------
+        :obj:`pd.Index`
+            The sorted times at which ``variable`` has data
+        """
+        return self._times.get(variable, self.all_times[:0])
+
+
+def _fingerprint_database(db):
+    """
+    Fingerprint of the data in ``db``, used by :func:`_check_database_unchanged` to
+    detect whether it has been modified. Only the identity and shape of the data are
+    recorded, so that it is cheap to compute and check. Changes which replace the data
+    (as most pyam operations do, including those made in place) or change its length
+    are detected, but changes made directly to the values or labels of ``db.data``
+    are not.
+    """
+    return db.data, db.data.shape
+
+
+def _check_database_unchanged(db, fingerprint):
+    """
+    Check that ``db`` still has ``fingerprint`` (see :func:`_fingerprint_database`)
+
+    Raises
+    ------
+    ValueError
+        ``db`` has been modified since ``fingerprint`` was taken.
+    """
+    data, shape = fingerprint
+    if db.data is not data or db.data.shape != shape:
+        raise ValueError(
+            "The database has been modified since the cruncher was created. "
+            "Databases used by crunchers created with `copy=False` must not be "
+            "modified."
+        )
+
+
+def _fingerprint_content(data):
+    """
+    Fingerprint of the content of long-format ``data``, which (unlike
+    :func:`_fingerprint_database`) is the same for equal data in different objects,
+    but is only worth computing once for each database, as every row is hashed.
+    It combines the shape of the data with a digest of the hashes of its rows.
+    """
+    row_hashes = pd.util.hash_pandas_object(data, index=False).values
+    return data.shape, hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+def _get_shared_cube(db, fingerprint):
+    """
+    Get the cube of ``db``, which has ``fingerprint``, reusing the one already built
+    for it if ``db`` still has the data it had then.
+    """
+    cached = _SHARED_CUBES.get(db)
+    if cached is None or cached[0][0] is not fingerprint[0]:
+        cached = (fingerprint, _DatabaseCube(db.data, db.time_col))
+        _SHARED_CUBES[db] = cached
+
+    return cached[1]
+
+
+def _factorize_columns(data, columns):
+    """
+    Encode the unique combinations of values of ``columns`` in ``data`` as integers.
+
+    Returns
+    -------
+    (:obj:`np.ndarray`, :obj:`pd.MultiIndex`)
+        The integer code of each row and the (sorted) unique combinations
+    """
+    combined = np.zeros(len(data), dtype=np.int64)
+    levels = []
+    level_codes = []
+    for col in columns:
+        codes, uniques = pd.factorize(data[col], sort=True)
+        if (codes == -1).any():
+            # Keep missing values as a label of their own
+            codes = np.where(codes == -1, len(uniques), codes)
+            uniques = uniques.append(pd.Index([np.nan]))
+        levels.append(uniques)
+        level_codes.append(codes)
+        # Re-encode as we go so the combined codes cannot overflow
+        combined, inverse = np.unique(
+            combined * len(uniques) + codes, return_inverse=True
+        )
+        combined = inverse
+    unique_codes, first = np.unique(combined, return_index=True)
+    index = pd.MultiIndex(
+        levels=levels,
+        codes=[codes[first] for codes in level_codes],
+        names=columns,
+        verify_integrity=False,
+    )
+    return combined, index
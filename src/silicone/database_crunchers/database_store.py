@@ -0,0 +1,203 @@
+"""
+On-disk storage of databases for crunching.
+
+A database is stored in a directory, with its values in a ``.npy`` file and a small
+index of its labels alongside. The values are memory-mapped when the database is
+loaded, so crunchers only read the slices of them which they use (e.g. the values of
+the leader and follower variables) from disk. This allows crunching against
+databases which are larger than the available memory, or which are shared by many
+processes.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cube import _DatabaseCube, _factorize_columns
+from .relationship_tables import _save_arrays
+
+_VALUES_FILE = "values.npy"
+_INDEX_FILE = "index.npz"
+
+
+def save_database_store(db, path, compact=False, chunksize=100000):
+    """
+    Save a database for crunching to disk
+
+    The values are written straight to disk, ``chunksize`` rows of the data at a time,
+    so the database is never also held in memory as an array.
+
+    Parameters
+    ----------
+    db : :obj:`pyam.IamDataFrame`
+        The database to save
+
+    path : str
+        The directory to save it in. This is created if it does not exist and any
+        database already stored in it is overwritten.
+
+    compact : bool
+        If ``True``, the values are stored as ``float32`` rather than ``float64``,
+        which halves their size at the cost of their precision.
+
+    chunksize : int
+        The number of rows of the data to write at a time
+
+    Raises
+    ------
+    ValueError
+        Some of the labels of ``db`` are neither strings nor numbers or times, so
+        cannot be stored.
+    """
+    data = db.data
+    time_col = db.time_col
+    run_cols = [
+        c for c in data.columns if c not in ["variable", "unit", time_col, "value"]
+    ]
+    chunks = [data.iloc[i : i + chunksize] for i in range(0, len(data), chunksize)]
+    # Find the labels first, so that the position of each value is known as soon as
+    # its chunk is read
+    keys = _get_labels(chunks, ["variable", "unit"])
+    runs = _get_labels(chunks, run_cols)
+    times = pd.factorize(
+        pd.concat([chunk[time_col].drop_duplicates() for chunk in chunks]), sort=True
+    )[1]
+
+    os.makedirs(path, exist_ok=True)
+    values = np.lib.format.open_memmap(
+        os.path.join(path, _VALUES_FILE),
+        mode="w+",
+        dtype=np.float32 if compact else float,
+        shape=(len(keys), len(runs), len(times)),
+    )
+    for key_values in values:
+        key_values[:] = np.nan
+    key_times = np.zeros((len(keys), len(times)), dtype=bool)
+    for chunk in chunks:
+        key_codes = _get_label_codes(keys, chunk)
+        run_codes = _get_label_codes(runs, chunk)
+        time_codes = times.get_indexer(chunk[time_col])
+        chunk_values = chunk["value"].values
+        values[key_codes, run_codes, time_codes] = chunk_values
+        known = ~np.isnan(chunk_values)
+        key_times[key_codes[known], time_codes[known]] = True
+    values.flush()
+    del values
+
+    index = {
+        "time_col": np.asarray(time_col),
+        "times": np.asarray(times),
+        "key_times": key_times,
+    }
+    index.update(_labels_to_arrays(keys, "keys/"))
+    index.update(_labels_to_arrays(runs, "runs/"))
+    _save_arrays(os.path.join(path, _INDEX_FILE), index)
+
+
+def load_database_store(path):
+    """
+    Load a database saved with :func:`save_database_store`
+
+    Parameters
+    ----------
+    path : str
+        The directory the database was saved in
+
+    Returns
+    -------
+    :obj:`_DatabaseCube`
+        The database, with its values memory-mapped (read-only). This can be passed
+        to any cruncher in place of a :obj:`pyam.IamDataFrame`, e.g.
+        ``QuantileRollingWindows(load_database_store(path))``.
+    """
+    with np.load(os.path.join(path, _INDEX_FILE), allow_pickle=False) as index:
+        index = {key: index[key] for key in index.files}
+    runs = _labels_from_arrays(index, "runs/")
+    values = np.load(os.path.join(path, _VALUES_FILE), mmap_mode="r")
+    return _DatabaseCube.from_arrays(
+        values,
+        time_col=index["time_col"].item(),
+        run_cols=list(runs.names),
+        keys=_labels_from_arrays(index, "keys/"),
+        runs=runs,
+        times=pd.Index(index["times"]),
+        key_times=index["key_times"],
+    )
+
+
+def _get_labels(chunks, columns):
+    """
+    Get the sorted unique combinations of the values of ``columns`` in ``chunks``, in
+    the same format as :func:`_factorize_columns`.
+    """
+    labels = pd.concat([chunk[columns].drop_duplicates() for chunk in chunks])
+    return _factorize_columns(labels, columns)[1]
+
+
+def _get_label_codes(labels, chunk):
+    """
+    Get the position in ``labels`` (as returned by :func:`_get_labels`) of each row of
+    ``chunk``.
+
+    The values of each column are looked up in the levels of ``labels`` separately,
+    which is much quicker than looking up combinations of them, and the codes are
+    then combined in the same way as in :func:`_factorize_columns`.
+    """
+    label_codes = np.zeros(len(labels), dtype=np.int64)
+    chunk_codes = np.zeros(len(chunk), dtype=np.int64)
+    for name, level, codes in zip(labels.names, labels.levels, labels.codes):
+        label_codes = label_codes * len(level) + codes
+        chunk_codes = chunk_codes * len(level) + level.get_indexer(chunk[name])
+        # Re-encode as we go so the combined codes cannot overflow
+        uniques, label_codes = np.unique(label_codes, return_inverse=True)
+        chunk_codes = np.searchsorted(uniques, chunk_codes)
+    return chunk_codes
+
+
+def _labels_to_arrays(labels, prefix):
+    """
+    Converts the :obj:`pd.MultiIndex` ``labels`` into a dictionary of arrays which
+    can be saved with :func:`np.savez` without pickling, with ``prefix`` added to
+    each key. Labels which are strings are stored as such, with a mask of those which
+    are missing.
+
+    Raises
+    ------
+    ValueError
+        Some labels are neither strings nor numbers or times.
+    """
+    arrays = {prefix + "names": np.asarray(labels.names, dtype=str)}
+    for i, (level, codes) in enumerate(zip(labels.levels, labels.codes)):
+        missing = np.asarray(pd.isnull(level))
+        values = np.asarray(level)
+        if values.dtype == object:
+            if not all(isinstance(value, str) for value in values[~missing]):
+                raise ValueError(
+                    "The values of `{}` cannot be stored, as they are not all "
+                    "strings".format(labels.names[i])
+                )
+            values = np.where(missing, "", values).astype(str)
+        arrays["{}levels/{}".format(prefix, i)] = values
+        arrays["{}missing/{}".format(prefix, i)] = missing
+        arrays["{}codes/{}".format(prefix, i)] = np.asarray(codes)
+    return arrays
+
+
+def _labels_from_arrays(arrays, prefix):
+    """
+    Reverses :func:`_labels_to_arrays` for the keys of ``arrays`` starting with
+    ``prefix``.
+    """
+    names = arrays[prefix + "names"].tolist()
+    levels = []
+    codes = []
+    for i in range(len(names)):
+        values = arrays["{}levels/{}".format(prefix, i)]
+        if values.dtype.kind == "U":
+            values = values.astype(object)
+            values[arrays["{}missing/{}".format(prefix, i)]] = np.nan
+        levels.append(pd.Index(values))
+        codes.append(arrays["{}codes/{}".format(prefix, i)])
+    return pd.MultiIndex(
+        levels=levels, codes=codes, names=names, verify_integrity=False
+    )
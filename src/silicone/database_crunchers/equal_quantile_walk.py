@@ -4,9 +4,10 @@ Module for the database cruncher which uses the 'equal quantile walk' technique.
 
 import numpy as np
 import scipy.interpolate
-from pyam import IamDataFrame
 
+from ..utils import _get_time_indices
 from .base import _DatabaseCruncher
+from .cube import _MetadataIndex
 
 
 class EqualQuantileWalk(_DatabaseCruncher):
@@ -53,43 +54,85 @@ class EqualQuantileWalk(_DatabaseCruncher):
             database.
 
         """
-        iamdf_follower = self._get_iamdf_follower(variable_follower, variable_leaders)
-        follower_ts = iamdf_follower.timeseries()
+        return self.derive_relationships([variable_follower], variable_leaders)[
+            variable_follower
+        ]
 
-        data_follower_time_col = iamdf_follower.time_col
-        data_follower_unit = iamdf_follower["unit"].values[0]
-        lead_ts = self._db.filter(variable=variable_leaders).timeseries()
-        lead_unit = lead_ts.index.get_level_values("unit")[0]
+    def derive_relationships(self, variable_followers, variable_leaders):
+        """
+        Derive the relationships between several followers and the same leader.
+
+        The leader's values at each time are only sorted once and are then shared by
+        all the followers. See :meth:`derive_relationship` for details of the errors
+        raised.
+
+        Parameters
+        ----------
+        variable_followers : list[str]
+            The variables for which we want to calculate timeseries (e.g.
+            ``["Emissions|C5F12", "Emissions|C6F14"]``).
+
+        variable_leaders : list[str]
+            The variable we want to use in order to infer timeseries of
+            ``variable_followers`` (e.g. ``["Emissions|CO2"]``).
 
-        def filler(in_iamdf, interpolate=False):
+        Returns
+        -------
+        dict{str: :obj:`func`}
+            Dictionary mapping each of ``variable_followers`` to its filler function,
+            as returned by :meth:`derive_relationship`.
+        """
+        for variable_follower in variable_followers:
+            self._check_leader_and_follower(variable_follower, variable_leaders)
+        cube = self._get_cube()
+        metadata = self._get_metadata()
+        lead_unit = metadata.units(variable_leaders[0])[0]
+        # The sorted values at each time, from all the (units and) runs. These are
+        # interpolated, so are always held in double precision.
+        lead_vals = cube.values[cube.key_indices(variable_leaders[0])]
+        lead_vals = lead_vals.reshape(-1, len(cube.times)).astype(float)
+        sorted_lead_vals = [np.sort(vals[~np.isnan(vals)]) for vals in lead_vals.T]
+        lead_times = metadata.times(variable_leaders[0])
+        return {
+            variable_follower: self._make_filler(
+                cube,
+                metadata,
+                variable_follower,
+                variable_leaders,
+                lead_unit,
+                sorted_lead_vals,
+                lead_times,
+            )
+            for variable_follower in variable_followers
+        }
+
+    def _make_filler(
+        self,
+        cube,
+        metadata,
+        variable_follower,
+        variable_leaders,
+        lead_unit,
+        sorted_lead_vals,
+        lead_times,
+    ):
+        data_follower_time_col = cube.time_col
+        data_follower_unit = metadata.units(variable_follower)[0]
+        # Array of the values at each time, with a row per (unit and) run
+        follower_vals = cube.values[cube.key_indices(variable_follower)]
+        follower_vals = follower_vals.reshape(-1, len(cube.times))
+        follower_times = metadata.times(variable_follower)
+
+        def validate(in_iamdf):
             """
-            Filler function derived from :obj:`LatestTimeRatio`.
-
-            Parameters
-            ----------
-            in_iamdf : :obj:`pyam.IamDataFrame`
-                Input data to fill data in
-
-            interpolate : bool
-                If the key year for filling is not in ``in_iamdf``, should a value be
-                interpolated?
-
-            Returns
-            -------
-            :obj:`pyam.IamDataFrame`
-                Filled in data (without original source data)
-
-            Raises
-            ------
-            ValueError
-                The key year for filling is not in ``in_iamdf`` and ``interpolate is
-                False``.
+            Checks that ``in_iamdf`` can be infilled.
             """
-            lead_in = in_iamdf.filter(variable=variable_leaders)
-            if not all(lead_in.variables(True)["unit"] == lead_unit):
+            in_metadata = _MetadataIndex.from_data(in_iamdf.data, in_iamdf.time_col)
+            lead_in_units = in_metadata.units(variable_leaders[0])
+            if not all(unit == lead_unit for unit in lead_in_units):
                 raise ValueError(
                     "Units of lead variable is meant to be `{}`, found `{}`".format(
-                        lead_unit, lead_in.variables(True)["unit"].tolist()
+                        lead_unit, lead_in_units
                     )
                 )
 
@@ -100,17 +143,17 @@ class EqualQuantileWalk(_DatabaseCruncher):
                         data_follower_time_col
                     )
                 )
-            if lead_in.data.empty:
+            if variable_leaders[0] not in in_metadata:
                 raise ValueError(
                     "There is no data for {} so it cannot be infilled".format(
                         variable_leaders
                     )
                 )
-            output_ts = lead_in.timeseries()
+            in_lead_times = in_metadata.times(variable_leaders[0])
             if any(
                 [
-                    (time not in lead_ts.columns) or (time not in follower_ts.columns)
-                    for time in output_ts.columns
+                    (time not in lead_times) or (time not in follower_times)
+                    for time in in_lead_times
                 ]
             ):
                 # We allow for cases where either lead or follow have gaps
@@ -118,21 +161,34 @@ class EqualQuantileWalk(_DatabaseCruncher):
                     "Not all required timepoints are present in the database we "
                     "crunched, we crunched \n\t{} for the lead and \n\t{} for the "
                     "follow \nbut you passed in \n\t{}".format(
-                        lead_ts.columns, follower_ts.columns, output_ts.columns
+                        lead_times, follower_times, in_lead_times
                     )
                 )
-            for col in output_ts.columns:
-                output_ts[col] = self._find_same_quantile(
-                    follower_ts[col], lead_ts[col], output_ts[col]
+
+        def fill_values(lead, fill_times, interpolate=False):
+            """
+            Infills ``lead``, raising a ``ValueError`` if not all of ``fill_times``
+            have data for both the lead and follow variables in the database we
+            crunched. ``interpolate`` has no effect, as values are never
+            interpolated.
+            """
+            _get_time_indices(lead_times.intersection(follower_times), fill_times)
+            filled = lead.copy()
+            for i, ind in enumerate(cube.times.get_indexer(fill_times)):
+                filled[:, i] = self._find_same_quantile(
+                    follower_vals[:, ind], sorted_lead_vals[ind], filled[:, i]
                 )
-            output_ts = output_ts.reset_index()
-            output_ts["variable"] = variable_follower
-            output_ts["unit"] = data_follower_unit
-            return IamDataFrame(output_ts)
+            return filled
 
-        return filler
+        return self._build_filler(
+            validate,
+            fill_values,
+            variable_follower,
+            variable_leaders,
+            data_follower_unit,
+        )
 
-    def _get_iamdf_follower(self, variable_follower, variable_leaders):
+    def _check_leader_and_follower(self, variable_follower, variable_leaders):
         if len(variable_leaders) > 1:
             raise ValueError(
                 "For `EqualQuantileWalk`, ``variable_leaders`` should only "
@@ -141,17 +197,14 @@ class EqualQuantileWalk(_DatabaseCruncher):
 
         self._check_follower_and_leader_in_db(variable_follower, variable_leaders)
 
-        return self._db.filter(variable=variable_follower)
-
     def _find_same_quantile(self, follow_vals, lead_vals, lead_input):
-        # Dispose of nans that can cloud the calculation
+        # ``lead_vals`` are already sorted and without nans. Dispose of nans in the
+        # follow values too, as they can cloud the calculation.
         follow_vals = follow_vals[~np.isnan(follow_vals)]
-        lead_vals = lead_vals[~np.isnan(lead_vals)]
         len_lead_not_nan = len(lead_vals)
         if len_lead_not_nan <= 1:
             # If there is only a single value we have to return the best guess.
             return np.nanmean(follow_vals)
-        lead_vals = lead_vals.sort_values()
         quant_of_lead_vals = np.arange(len_lead_not_nan) / (len_lead_not_nan - 1)
         if any(quant_of_lead_vals > 1) or any(quant_of_lead_vals < 0):
             raise ValueError("Impossible quantiles!")
@@ -1,5 +1,13 @@
+import numpy as np
+import pandas as pd
+from pyam.utils import pattern_match
+
 from .base import _DatabaseCruncher
-from .linear_interpolation import LinearInterpolation
+from .linear_interpolation import (
+    _check_unique_model_and_scenario,
+    _get_leader_and_follower_units,
+    _make_linear_interpolation_filler,
+)
 
 
 class ScenarioAndModelSpecificInterpolate(_DatabaseCruncher):
@@ -7,8 +15,32 @@ class ScenarioAndModelSpecificInterpolate(_DatabaseCruncher):
     Database cruncher which pre-filters to only use data from specific scenarios, then
     runs the linear interpolator to return values from that set of scenarios. See the
     documentation of LinearInterpolation for more details.
+
+    The scenario and model filters are applied as masks on the runs of the database
+    and the derived relationships are cached, so deriving relationships for several
+    filters which select the same scenarios does not repeat any work.
     """
 
+    def __init__(self, db, copy=True, compact=False):
+        """
+        Initialise the database cruncher
+
+        Parameters
+        ----------
+        db : IamDataFrame
+            The database to use
+
+        copy : bool
+            Should the cruncher work on a copy of ``db``? See
+            :class:`_DatabaseCruncher` for details.
+
+        compact : bool
+            Should the cruncher store the database in compact form? See
+            :class:`_DatabaseCruncher` for details.
+        """
+        super().__init__(db, copy=copy, compact=compact)
+        self._relationships = {}
+
     def derive_relationship(
         self,
         variable_follower,
@@ -52,11 +84,66 @@ class ScenarioAndModelSpecificInterpolate(_DatabaseCruncher):
             There is no data of the appropriate type in the database.
              There may be a typo in the SSP option.
         """
-        use_db = self._db.filter(scenario=required_scenario, model=required_model)
-        if use_db.data.empty:
+        cube = self._get_cube()
+        models = _match_level(cube.runs, "model", required_model)
+        scenarios = _match_level(cube.runs, "scenario", required_scenario)
+        row_mask = cube.runs.get_level_values("model").isin(models)
+        row_mask &= cube.runs.get_level_values("scenario").isin(scenarios)
+        if not row_mask.any():
             raise ValueError(
                 "There is no data of the appropriate type in the database."
                 " There may be a typo in the SSP option."
             )
-        cruncher = LinearInterpolation(use_db)
-        return cruncher.derive_relationship(variable_follower, variable_leaders)
+        if len(variable_leaders) != 1:
+            raise NotImplementedError(
+                "Having more than one `variable_leaders` is not yet implemented"
+            )
+
+        key = (
+            np.packbits(row_mask).tobytes(),
+            variable_follower,
+            tuple(variable_leaders),
+        )
+        if key not in self._relationships:
+            self._relationships[key] = self._derive_from_rows(
+                variable_follower, variable_leaders, row_mask
+            )
+        return self._relationships[key]
+
+    def _derive_from_rows(self, variable_follower, variable_leaders, row_mask):
+        cube = self._get_cube()
+        variables = [variable_leaders[0], variable_follower]
+        units = {}
+        values = {}
+        for variable in set(variables):
+            for ind in cube.key_indices(variable):
+                if cube.key_mask(ind)[row_mask].any():
+                    units.setdefault(variable, []).append(cube.keys[ind][1])
+                    values[variable] = cube.values[ind][row_mask]
+        if not units:
+            raise ValueError(
+                "There is no data of the appropriate type in the database."
+            )
+        leader_units, follower_units = _get_leader_and_follower_units(
+            units, variable_follower, variable_leaders
+        )
+        _check_unique_model_and_scenario(cube, variables, run_mask=row_mask)
+        return _make_linear_interpolation_filler(
+            variable_follower,
+            variable_leaders,
+            values[variable_leaders[0]],
+            values[variable_follower],
+            cube.times,
+            cube.time_col,
+            leader_units,
+            follower_units,
+        )
+
+
+def _match_level(index, level, values):
+    """
+    Returns the labels of the level of ``index`` which match ``values``, which may
+    contain wildcards.
+    """
+    labels = index.levels[index.names.index(level)]
+    return labels[np.asarray(pattern_match(pd.Series(labels), values), dtype=bool)]
@@ -1,11 +1,9 @@
 """
 Module for the database cruncher which uses the 'latest time ratio' technique.
 """
-import warnings
-
 import numpy as np
-from pyam import IamDataFrame
 
+from ..utils import _interpolate_time_values, _TimeIndex
 from .base import _DatabaseCruncher
 
 
@@ -74,46 +72,22 @@ class LatestTimeRatio(_DatabaseCruncher):
             database.
 
         """
-        iamdf_follower = self._get_iamdf_follower(variable_follower, variable_leaders)
-        data_follower = iamdf_follower.data
-
-        data_follower_time_col = iamdf_follower.time_col
-        data_follower_key_timepoint = max(data_follower[data_follower_time_col])
-        key_timepoint_filter = {data_follower_time_col: [data_follower_key_timepoint]}
+        self._check_leader_and_follower(variable_follower, variable_leaders)
+        cube = self._get_cube()
+        metadata = self._get_metadata()
+        data_follower_time_col = cube.time_col
+        key_time_ind = cube.times.get_loc(metadata.times(variable_follower)[-1])
         data_follower_key_year_val = np.nanmean(
-            iamdf_follower.filter(**key_timepoint_filter)["value"].values
+            cube.values[cube.key_indices(variable_follower), :, key_time_ind],
+            dtype=float,
         )
-        data_follower_unit = data_follower["unit"].values[0]
-
-        if data_follower_time_col == "time":
-            data_follower_key_timepoint = data_follower_key_timepoint.to_pydatetime()
+        data_follower_unit = metadata.units(variable_follower)[0]
+        data_follower_key_timepoint = cube.time_index.labels([key_time_ind])[0]
 
-        def filler(in_iamdf, interpolate=False):
+        def validate(in_iamdf):
             """
-            Filler function derived from :obj:`LatestTimeRatio`.
-
-            Parameters
-            ----------
-            in_iamdf : :obj:`pyam.IamDataFrame`
-                Input data to fill data in
-
-            interpolate : bool
-                If the key year for filling is not in ``in_iamdf``, should a value be
-                interpolated?
-
-            Returns
-            -------
-            :obj:`pyam.IamDataFrame`
-                Filled in data (without original source data)
-
-            Raises
-            ------
-            ValueError
-                The key year for filling is not in ``in_iamdf`` and ``interpolate is
-                False``.
+            Checks that ``in_iamdf`` can be infilled.
             """
-            lead_var = in_iamdf.filter(variable=variable_leaders)
-
             if data_follower_time_col != in_iamdf.time_col:
                 raise ValueError(
                     "`in_iamdf` time column must be the same as the time column used "
@@ -122,15 +96,25 @@ class LatestTimeRatio(_DatabaseCruncher):
                     )
                 )
 
-            def get_values_in_key_timepoint(idf):
-                # filter warning about empty data frame as we handle it ourselves
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    return idf.filter(**key_timepoint_filter)
-
-            lead_var_val_in_key_timepoint = get_values_in_key_timepoint(lead_var)
+            if not in_iamdf.data["variable"].isin(variable_leaders).any():
+                raise ValueError(
+                    "There is no data for {} so it cannot be infilled".format(
+                        variable_leaders
+                    )
+                )
 
-            if lead_var_val_in_key_timepoint.data.empty:
+        def fill_values(lead, fill_times, interpolate=False):
+            """
+            Infills ``lead``. If the key year for filling is not in ``fill_times``, a
+            value is interpolated if ``interpolate``, otherwise a ``ValueError`` is
+            raised.
+            """
+            key_ind = _TimeIndex(fill_times).get_indexer([data_follower_key_timepoint])[
+                0
+            ]
+            if key_ind != -1:
+                lead_var_val_in_key_timepoint = lead[:, key_ind]
+            else:
                 if not interpolate:
                     error_msg = (
                         "Required downscaling timepoint ({}) is not in the data for "
@@ -139,29 +123,23 @@ class LatestTimeRatio(_DatabaseCruncher):
                         )
                     )
                     raise ValueError(error_msg)
-                lead_var.interpolate(data_follower_key_timepoint)
-                lead_var_val_in_key_timepoint = get_values_in_key_timepoint(lead_var)
-                lead_var.filter(**key_timepoint_filter, keep=False, inplace=True)
-
-            lead_var_val_in_key_timepoint = lead_var_val_in_key_timepoint.timeseries()
-            if not lead_var_val_in_key_timepoint.shape[1] == 1:  # pragma: no cover
-                raise AssertionError(
-                    "How did filtering for a single timepoint result in more than "
-                    "one column?"
-                )
-
-            lead_var_val_in_key_timepoint = lead_var_val_in_key_timepoint.iloc[:, 0]
-
-            scaling = data_follower_key_year_val / lead_var_val_in_key_timepoint
-            output_ts = (lead_var.timeseries().T * scaling).T.reset_index()
-
-            output_ts["variable"] = variable_follower
-            output_ts["unit"] = data_follower_unit
-            return IamDataFrame(output_ts)
-
-        return filler
+                lead_var_val_in_key_timepoint = _interpolate_time_values(
+                    lead, fill_times, [data_follower_key_timepoint]
+                )[:, 0]
+
+            with np.errstate(divide="ignore"):
+                scaling = data_follower_key_year_val / lead_var_val_in_key_timepoint
+            return lead * scaling[:, np.newaxis]
+
+        return self._build_filler(
+            validate,
+            fill_values,
+            variable_follower,
+            variable_leaders,
+            data_follower_unit,
+        )
 
-    def _get_iamdf_follower(self, variable_follower, variable_leaders):
+    def _check_leader_and_follower(self, variable_follower, variable_leaders):
         if len(variable_leaders) > 1:
             raise ValueError(
                 "For `LatestTimeRatio`, ``variable_leaders`` should only "
@@ -169,5 +147,3 @@ class LatestTimeRatio(_DatabaseCruncher):
             )
 
         self._check_follower_and_leader_in_db(variable_follower, variable_leaders)
-
-        return self._db.filter(variable=variable_follower)
@@ -0,0 +1,141 @@
+"""
+Lightweight container for the output of filler functions.
+"""
+import pandas as pd
+from pyam import IamDataFrame
+
+
+class LazyResult:
+    """
+    Infilled timeseries, held in wide format until they are needed as a
+    :obj:`pyam.IamDataFrame`.
+
+    Building a :obj:`pyam.IamDataFrame` validates, melts and sorts the data, which is
+    often more expensive than the infilling itself. Filler functions return instances
+    of this class instead if they are called with ``lazy=True``. Many results can then
+    be cheaply combined with :meth:`concat` and converted to a
+    :obj:`pyam.IamDataFrame` only once, with :meth:`to_iamdf`.
+    """
+
+    def __init__(self, timeseries):
+        """
+        Initialise the result
+
+        Parameters
+        ----------
+        timeseries : :obj:`pd.DataFrame`
+            The data in the format returned by :meth:`pyam.IamDataFrame.timeseries`,
+            i.e. with a row per timeseries (indexed by model, scenario, region,
+            variable, unit and any extra columns) and a column per time.
+        """
+        self._timeseries = timeseries
+
+    @classmethod
+    def from_wide(cls, data):
+        """
+        Create a result from wide data, with the model, scenario, region, variable,
+        unit and any extra columns as columns rather than as the index.
+
+        Parameters
+        ----------
+        data : :obj:`pd.DataFrame`
+            The data. All columns whose names are strings are assumed to be index
+            columns, all the others are times.
+
+        Returns
+        -------
+        :obj:`LazyResult`
+            The result
+        """
+        timeseries = data.set_index([c for c in data.columns if isinstance(c, str)])
+        # Restore the type of the times, which is lost while they share an index
+        # with the other column names
+        timeseries.columns = pd.Index(timeseries.columns.tolist())
+        return cls(timeseries)
+
+    @classmethod
+    def concat(cls, results):
+        """
+        Combine several results
+
+        Timeseries which appear in more than one of ``results`` (e.g. because they
+        were infilled for different times) are combined into a single timeseries.
+
+        Parameters
+        ----------
+        results : list[:obj:`LazyResult`]
+            The results to combine
+
+        Returns
+        -------
+        :obj:`LazyResult`
+            The combined result
+        """
+        timeseries = pd.concat([r._timeseries for r in results], sort=False)
+        if not timeseries.index.is_unique:
+            timeseries = timeseries.groupby(
+                level=list(range(timeseries.index.nlevels)), sort=False
+            ).first()
+        return cls(timeseries)
+
+    @property
+    def values(self):
+        """
+        :obj:`np.ndarray`: The values, with a row per timeseries and a column per time
+        """
+        return self._timeseries.values
+
+    @property
+    def index(self):
+        """
+        :obj:`pd.MultiIndex`: The model, scenario, region, variable, unit and any extra
+        columns of each timeseries
+        """
+        return self._timeseries.index
+
+    @property
+    def columns(self):
+        """
+        :obj:`pd.Index`: The time of each column
+        """
+        return self._timeseries.columns
+
+    @property
+    def empty(self):
+        """
+        bool: Whether the result contains no data
+        """
+        return self._timeseries.empty
+
+    def timeseries(self):
+        """
+        Get the data in the format returned by :meth:`pyam.IamDataFrame.timeseries`
+
+        Returns
+        -------
+        :obj:`pd.DataFrame`
+            The data. This is not a copy, so it should not be modified.
+        """
+        return self._timeseries
+
+    def to_iamdf(self):
+        """
+        Convert to a :obj:`pyam.IamDataFrame`
+
+        Returns
+        -------
+        :obj:`pyam.IamDataFrame`
+            The data
+        """
+        return IamDataFrame(self._timeseries.reset_index())
+
+
+def _make_filler_output(data, lazy):
+    """
+    Converts the wide data built by a filler function (in the format accepted by
+    :meth:`LazyResult.from_wide`) into its output, a :obj:`LazyResult` if ``lazy`` and
+    a :obj:`pyam.IamDataFrame` otherwise.
+    """
+    if lazy:
+        return LazyResult.from_wide(data)
+    return IamDataFrame(data)
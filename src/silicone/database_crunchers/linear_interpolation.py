@@ -2,10 +2,15 @@
 Module for the database cruncher which makes a linear interpolator between known values
 """
 
-from pyam import IamDataFrame
+import numpy as np
 
-from ..utils import _get_unit_of_variable, _make_interpolator, _make_wide_db
+from ..utils import (
+    _get_time_indices,
+    _interpolate_from_table,
+    _make_interpolation_table_from_arrays,
+)
 from .base import _DatabaseCruncher
+from .cube import _MetadataIndex
 
 
 class LinearInterpolation(_DatabaseCruncher):
@@ -58,94 +63,215 @@ class LinearInterpolation(_DatabaseCruncher):
         ValueError
             There is no data of the appropriate type in the database.
         """
+        return self.derive_relationships([variable_follower], variable_leaders)[
+            variable_follower
+        ]
+
+    def derive_relationships(self, variable_followers, variable_leaders):
+        """
+        Derive the relationships between several followers and the same leader.
+
+        The leader's values are only looked up and checked once and are then shared by
+        all the followers. See :meth:`derive_relationship` for details of the errors
+        raised.
+
+        Parameters
+        ----------
+        variable_followers : list[str]
+            The variables for which we want to calculate timeseries (e.g.
+            ``["Emissions|CH4", "Emissions|N2O"]``).
+
+        variable_leaders : list[str]
+            The variable we want to use in order to infer timeseries of
+            ``variable_followers`` (e.g. ``["Emissions|CO2"]``).
+
+        Returns
+        -------
+        dict{str: :obj:`func`}
+            Dictionary mapping each of ``variable_followers`` to its filler function,
+            as returned by :meth:`derive_relationship`.
+        """
         if len(variable_leaders) != 1:
             raise NotImplementedError(
                 "Having more than one `variable_leaders` is not yet implemented"
             )
-        use_db = self._db.filter(variable=[variable_leaders[0], variable_follower])
-        if use_db.data.empty:
+        cube = self._get_cube()
+        metadata = self._get_metadata()
+        lead = None
+        fillers = {}
+        for variable_follower in variable_followers:
+            units = {
+                v: metadata.units(v)
+                for v in [variable_leaders[0], variable_follower]
+                if v in metadata
+            }
+            if not units:
+                raise ValueError(
+                    "There is no data of the appropriate type in the database."
+                )
+            leader_units, follower_units = _get_leader_and_follower_units(
+                units, variable_follower, variable_leaders
+            )
+            if lead is None:
+                _check_unique_model_and_scenario(cube, variable_leaders)
+                lead = cube.variable_values(variable_leaders[0])
+            _check_unique_model_and_scenario(cube, [variable_follower])
+            fillers[variable_follower] = _make_linear_interpolation_filler(
+                variable_follower,
+                variable_leaders,
+                lead,
+                cube.variable_values(variable_follower),
+                cube.times,
+                cube.time_col,
+                leader_units,
+                follower_units,
+            )
+
+        return fillers
+
+
+def _get_leader_and_follower_units(units, variable_follower, variable_leaders):
+    """
+    Checks that the leader and follower each have exactly one unit in ``units`` (a
+    mapping from variables to lists of their units) and returns them.
+    """
+    if variable_leaders[0] not in units:
+        raise ValueError(
+            "No data for `variable_leaders` ({}) in database".format(variable_leaders)
+        )
+    if variable_follower not in units:
+        raise ValueError(
+            "No data for `variable_follower` ({}) in database".format(variable_follower)
+        )
+    for variable in [variable_leaders[0], variable_follower]:
+        if len(units[variable]) > 1:
+            raise AssertionError("`{}` has multiple units".format(variable))
+    return units[variable_leaders[0]][0], units[variable_follower][0]
+
+
+def _check_unique_model_and_scenario(cube, variables, run_mask=None):
+    """
+    Checks that no model and scenario reports more than one value of each of
+    ``variables`` at any time, i.e. that they are not reported for several regions.
+    Only the runs selected by ``run_mask`` are checked, if it is supplied.
+    """
+    codes, n_groups = cube.group_runs(["model", "scenario"])
+    if run_mask is not None:
+        codes = codes[run_mask]
+    elif n_groups == len(cube.runs):
+        return
+    for variable in variables:
+        counts = np.zeros((n_groups, len(cube.times)), dtype=int)
+        for ind in cube.key_indices(variable):
+            present = cube.key_mask(ind)
+            if run_mask is not None:
+                present = present[run_mask]
+            np.add.at(counts, codes, present)
+        assert (
+            counts.max(initial=0) <= 1
+        ), "The table contains multiple entries with the same model and scenario"
+
+
+def _make_linear_interpolation_filler(
+    variable_follower,
+    variable_leaders,
+    lead,
+    follow,
+    times,
+    time_col,
+    leader_units,
+    follower_units,
+):
+    """
+    Constructs the filler function of :class:`LinearInterpolation` from arrays of the
+    leader and follower values (with a row per run and a column per entry of
+    ``times``). Only pairs where both values are known are used.
+    """
+    known = ~np.isnan(lead) & ~np.isnan(follow)
+    times_known = known.any(axis=0)
+    times = times[times_known]
+    known = known[:, times_known]
+    _, time_inds = np.nonzero(known)
+    xs, ys, offsets = _make_interpolation_table_from_arrays(
+        lead[:, times_known][known],
+        follow[:, times_known][known],
+        time_inds,
+        len(times),
+    )
+    tables = {
+        "cruncher": "LinearInterpolation",
+        "variable_follower": variable_follower,
+        "variable_leaders": list(variable_leaders),
+        "time_col": time_col,
+        "leader_unit": leader_units,
+        "follower_unit": follower_units,
+        "times": times,
+        "xs": xs,
+        "ys": ys,
+        "offsets": offsets,
+    }
+    return _make_linear_interpolation_filler_from_tables(tables)
+
+
+def _make_linear_interpolation_filler_from_tables(tables):
+    """
+    Constructs the filler function of :class:`LinearInterpolation` from the ``tables``
+    built by :func:`_make_linear_interpolation_filler`, without the database.
+    """
+    variable_follower = tables["variable_follower"]
+    variable_leaders = tables["variable_leaders"]
+    time_col = tables["time_col"]
+    leader_units = tables["leader_unit"]
+    follower_units = tables["follower_unit"]
+    times = tables["times"]
+    xs, ys, offsets = tables["xs"], tables["ys"], tables["offsets"]
+
+    def validate(in_iamdf):
+        """
+        Checks that ``in_iamdf`` can be infilled.
+        """
+        if time_col != in_iamdf.time_col:
             raise ValueError(
-                "There is no data of the appropriate type in the database."
+                "`in_iamdf` time column must be the same as the time column used "
+                "to generate this filler function (`{}`)".format(time_col)
             )
-        leader_units = _get_unit_of_variable(use_db, variable_leaders)
-        follower_units = _get_unit_of_variable(use_db, variable_follower)
-        if len(leader_units) == 0:
+
+        metadata = _MetadataIndex.from_data(in_iamdf.data, in_iamdf.time_col)
+        var_units = metadata.units(variable_leaders[0])
+        if not var_units:
             raise ValueError(
-                "No data for `variable_leaders` ({}) in database".format(
+                "There is no data for {} so it cannot be infilled".format(
                     variable_leaders
                 )
             )
-        if len(follower_units) == 0:
+        assert len(var_units) == 1, "There are multiple units for the lead variable."
+        if var_units[0] != leader_units:
             raise ValueError(
-                "No data for `variable_follower` ({}) in database".format(
-                    variable_follower
+                "Units of lead variable is meant to be `{}`, found `{}`".format(
+                    leader_units, var_units[0]
                 )
             )
-        leader_units = leader_units[0]
-        use_db_time_col = use_db.time_col
-        use_db = _make_wide_db(use_db)
-        interpolators = _make_interpolator(
-            variable_follower, variable_leaders, use_db, use_db_time_col
-        )
-
-        def filler(in_iamdf):
-            """
-            Filler function derived from :obj:`DatabaseCruncherSSPSpecificRelation`.
-
-            Parameters
-            ----------
-            in_iamdf : :obj:`pyam.IamDataFrame`
-                Input data to fill data in
-
-            Returns
-            -------
-            :obj:`pyam.IamDataFrame`
-                Filled in data (without original source data)
-
-            Raises
-            ------
-            ValueError
-                The key db_times for filling are not in ``in_iamdf``.
-            """
-            if use_db_time_col != in_iamdf.time_col:
-                raise ValueError(
-                    "`in_iamdf` time column must be the same as the time column used "
-                    "to generate this filler function (`{}`)".format(use_db_time_col)
+        if (times.get_indexer(metadata.all_times) == -1).any():
+            raise ValueError(
+                "Not all required timepoints are present in the database we "
+                "crunched, we crunched \n\t`{}`\nbut you passed in \n\t{}".format(
+                    times.tolist(), metadata.all_times.tolist(),
                 )
+            )
 
-            var_units = _get_unit_of_variable(in_iamdf, variable_leaders)
-            if var_units.size == 0:
-                raise ValueError(
-                    "There is no data for {} so it cannot be infilled".format(
-                        variable_leaders
-                    )
-                )
-            var_units = var_units[0]
-            lead_var = in_iamdf.filter(variable=variable_leaders)
-            assert (
-                lead_var["unit"].nunique() == 1
-            ), "There are multiple units for the lead variable."
-            if var_units != leader_units:
-                raise ValueError(
-                    "Units of lead variable is meant to be `{}`, found `{}`".format(
-                        leader_units, var_units
-                    )
-                )
-            times_needed = set(in_iamdf.data[in_iamdf.time_col])
-            if any(x not in interpolators.keys() for x in times_needed):
-                raise ValueError(
-                    "Not all required timepoints are present in the database we "
-                    "crunched, we crunched \n\t`{}`\nbut you passed in \n\t{}".format(
-                        list(interpolators.keys()),
-                        in_iamdf.timeseries().columns.tolist(),
-                    )
-                )
-            output_ts = lead_var.timeseries()
-            for time in times_needed:
-                output_ts[time] = interpolators[time](output_ts[time])
-            output_ts.reset_index(inplace=True)
-            output_ts["variable"] = variable_follower
-            output_ts["unit"] = follower_units[0]
-            return IamDataFrame(output_ts)
-
-        return filler
+    def fill_values(lead, fill_times):
+        """
+        Infills ``lead``, raising a ``ValueError`` if not all of ``fill_times`` are in
+        the database we crunched.
+        """
+        time_inds = _get_time_indices(times, fill_times)
+        return _interpolate_from_table(xs, ys, offsets, time_inds, lead)
+
+    return _DatabaseCruncher._build_filler(
+        validate,
+        fill_values,
+        variable_follower,
+        variable_leaders,
+        follower_units,
+        tables,
+    )
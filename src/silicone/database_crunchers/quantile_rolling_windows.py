@@ -6,11 +6,11 @@ import logging
 
 import numpy as np
 import scipy.interpolate
-from pyam import IamDataFrame
 
-from ..stats import rolling_window_find_quantiles
-from ..utils import _get_unit_of_variable
+from ..stats import _rolling_window_quantiles_from_weights, _rolling_window_weights
+from ..utils import _get_time_indices, _interpolate_from_table, _normalise_times
 from .base import _DatabaseCruncher
+from .cube import _MetadataIndex
 
 logger = logging.getLogger(__name__)
 
@@ -151,167 +151,269 @@ class QuantileRollingWindows(_DatabaseCruncher):
         ValueError
             ``decay_length_factor`` is 0.
         """
-        self._check_follower_and_leader_in_db(variable_follower, variable_leaders)
-
-        if not (0 <= quantile <= 1):
-            error_msg = "Invalid quantile ({}), it must be in [0, 1]".format(quantile)
-            raise ValueError(error_msg)
-
-        if int(nwindows) != nwindows or nwindows < 2:
-            error_msg = "Invalid nwindows ({}), it must be an integer > 1".format(
-                nwindows
-            )
-            raise ValueError(error_msg)
-
-        nwindows = int(nwindows)
-
-        if np.equal(decay_length_factor, 0):
-            raise ValueError("decay_length_factor must not be zero")
-
-        data_leader_unit = _get_unit_of_variable(self._db, variable_leaders)[0]
-        data_follower_unit = _get_unit_of_variable(self._db, variable_follower)[0]
-        db_time_col = self._db.time_col
-
-        columns = "variable"
-        idx = list(set(self._db.data.columns) - {columns, "value", "unit"})
-        wide_db = self._db.filter(
-            variable=[variable_follower] + variable_leaders
-        ).pivot_table(index=idx, columns=columns, aggfunc="sum")
+        return self.derive_relationships(
+            [variable_follower],
+            variable_leaders,
+            quantile=quantile,
+            nwindows=nwindows,
+            decay_length_factor=decay_length_factor,
+            use_ratio=use_ratio,
+        )[variable_follower]
+
+    def derive_relationships(
+        self,
+        variable_followers,
+        variable_leaders,
+        quantile=0.5,
+        nwindows=11,
+        decay_length_factor=1,
+        use_ratio=False,
+    ):
+        """
+        Derive the relationships between several followers and the same leaders.
 
-        # make sure we don't have empty strings floating around (pyam bug?)
-        wide_db = wide_db.applymap(lambda x: np.nan if isinstance(x, str) else x)
-        wide_db = wide_db.dropna(axis=0)
+        The weights of the points in each window only depend on the leader data, so
+        they are calculated once for each time and shared by all the followers which
+        have data for the same runs. See :meth:`derive_relationship` for details of
+        the other arguments and the errors raised.
 
-        derived_relationships = {}
-        for db_time, dbtdf in wide_db.groupby(db_time_col):
-            xs = dbtdf[variable_leaders].values.squeeze()
-            ys = dbtdf[variable_follower].values.squeeze()
+        Parameters
+        ----------
+        variable_followers : list[str]
+            The variables for which we want to calculate timeseries (e.g.
+            ``["Emissions|CH4", "Emissions|N2O"]``).
 
-            if xs.shape != ys.shape:
-                raise NotImplementedError(
-                    "Having more than one `variable_leaders` is not yet implemented"
+        Returns
+        -------
+        dict{str: :obj:`func`}
+            Dictionary mapping each of ``variable_followers`` to its filler function,
+            as returned by :meth:`derive_relationship`.
+        """
+        for variable_follower in variable_followers:
+            self._check_follower_and_leader_in_db(variable_follower, variable_leaders)
+        cube = self._get_cube()
+        weights_cache = {}
+        return {
+            variable_follower: _make_quantile_rolling_windows_filler(
+                cube,
+                self._get_metadata(),
+                np.arange(len(cube.times)),
+                variable_follower,
+                variable_leaders,
+                quantile,
+                nwindows,
+                decay_length_factor,
+                use_ratio,
+                weights_cache=weights_cache,
+            )
+            for variable_follower in variable_followers
+        }
+
+
+def _make_quantile_rolling_windows_filler(
+    cube,
+    metadata,
+    time_inds,
+    variable_follower,
+    variable_leaders,
+    quantile=0.5,
+    nwindows=11,
+    decay_length_factor=1,
+    use_ratio=False,
+    weights_cache=None,
+):
+    """
+    Derives the relationships of :class:`QuantileRollingWindows` from the data in
+    ``cube`` (with :class:`_MetadataIndex` ``metadata``) at the times with indices
+    ``time_inds`` and constructs the filler function. The weights of the windows are
+    stored in ``weights_cache``, if given, so that they can be reused for other
+    followers with the same leaders and arguments. See
+    :meth:`QuantileRollingWindows.derive_relationship` for the other arguments.
+    """
+    if weights_cache is None:
+        weights_cache = {}
+    if not (0 <= quantile <= 1):
+        error_msg = "Invalid quantile ({}), it must be in [0, 1]".format(quantile)
+        raise ValueError(error_msg)
+
+    if int(nwindows) != nwindows or nwindows < 2:
+        error_msg = "Invalid nwindows ({}), it must be an integer > 1".format(nwindows)
+        raise ValueError(error_msg)
+
+    nwindows = int(nwindows)
+
+    if np.equal(decay_length_factor, 0):
+        raise ValueError("decay_length_factor must not be zero")
+
+    data_leader_unit = _get_units_of_variables(metadata, variable_leaders)[0]
+    data_follower_unit = _get_units_of_variables(metadata, [variable_follower])[0]
+    db_time_col = cube.time_col
+    if len(variable_leaders) > 1:
+        raise NotImplementedError(
+            "Having more than one `variable_leaders` is not yet implemented"
+        )
+
+    lead = cube.variable_values(variable_leaders[0])
+    follow = cube.variable_values(variable_follower)
+    known = ~np.isnan(lead) & ~np.isnan(follow)
+    # The relationship at each time is a piecewise linear function of the leader,
+    # stored as its breakpoints. These are concatenated into ragged arrays, in the
+    # format of :func:`_make_interpolation_table_from_arrays`.
+    rel_time_inds = []
+    breakpoints = []
+    quantile_values = []
+    for time_ind in time_inds:
+        if not known[:, time_ind].any():
+            continue
+        xs = lead[known[:, time_ind], time_ind]
+        ys = follow[known[:, time_ind], time_ind]
+
+        if use_ratio:
+            # We want the ratio between x and y, not the actual values of y.
+            ys = ys / xs
+            if np.isnan(ys).any():
+                logging.warning(
+                    "Undefined values of ratio appear in the quantiles when "
+                    "infilling {}, setting some values to 0 (this may not affect "
+                    "results).".format(variable_follower)
                 )
-            if not xs.shape:
-                # 0D-array, make 1D
-                xs = np.array([xs])
-                ys = np.array([ys])
-
-            if use_ratio:
-                # We want the ratio between x and y, not the actual values of y.
-                ys = ys / xs
-                if np.isnan(ys).any():
-                    logging.warning(
-                        "Undefined values of ratio appear in the quantiles when "
-                        "infilling {}, setting some values to 0 (this may not affect "
-                        "results).".format(variable_follower)
-                    )
-                    ys[np.isnan(ys)] = 0
-
-            if np.equal(max(xs), min(xs)):
-                # We must prevent singularity behaviour if all the points are at the
-                # same x value.
-                cumsum_weights = np.array([(0.5 + x) / len(ys) for x in range(len(ys))])
-                ys.sort()
-
-                def same_x_val_workaround(
-                    _, ys=ys, cumsum_weights=cumsum_weights, quantile=quantile
-                ):
-                    if np.equal(min(ys), max(ys)):
-                        return ys[0]
-                    return scipy.interpolate.interp1d(
-                        cumsum_weights,
-                        ys,
-                        bounds_error=False,
-                        fill_value=(ys[0], ys[-1]),
-                        assume_sorted=True,
-                    )(quantile)
-
-                derived_relationships[db_time] = same_x_val_workaround
-
+                ys[np.isnan(ys)] = 0
+
+        if np.equal(max(xs), min(xs)):
+            # We must prevent singularity behaviour if all the points are at the
+            # same x value. The relationship is then a constant, which is stored as
+            # a single breakpoint.
+            ys = np.sort(ys)
+            if np.equal(min(ys), max(ys)):
+                value = ys[0]
             else:
-                db_time_table = rolling_window_find_quantiles(
-                    xs, ys, quantile, nwindows, decay_length_factor
-                )
-
-                derived_relationships[db_time] = scipy.interpolate.interp1d(
-                    db_time_table.index.values,
-                    db_time_table.loc[:, quantile].values.squeeze(),
+                cumsum_weights = (0.5 + np.arange(len(ys))) / len(ys)
+                value = scipy.interpolate.interp1d(
+                    cumsum_weights,
+                    ys,
                     bounds_error=False,
-                    fill_value=(
-                        db_time_table[quantile].iloc[0],
-                        db_time_table[quantile].iloc[-1],
-                    ),
+                    fill_value=(ys[0], ys[-1]),
+                    assume_sorted=True,
+                )(quantile)
+            time_breakpoints = xs[:1]
+            time_values = np.atleast_1d(value)
+
+        else:
+            # The weights only depend on the leader values, which are determined by
+            # the runs with data at this time
+            weights_key = (time_ind, np.packbits(known[:, time_ind]).tobytes())
+            if weights_key not in weights_cache:
+                weights_cache[weights_key] = _rolling_window_weights(
+                    xs, nwindows, decay_length_factor
                 )
+            window_centers, weights = weights_cache[weights_key]
+            db_time_table = _rolling_window_quantiles_from_weights(
+                xs, ys, window_centers, weights, [quantile]
+            )
+            time_breakpoints = db_time_table.index.values
+            time_values = db_time_table[quantile].values
+
+        rel_time_inds.append(time_ind)
+        breakpoints.append(np.asarray(time_breakpoints, dtype=float))
+        quantile_values.append(np.asarray(time_values, dtype=float))
+
+    tables = {
+        "cruncher": "QuantileRollingWindows",
+        "variable_follower": variable_follower,
+        "variable_leaders": list(variable_leaders),
+        "time_col": db_time_col,
+        "leader_unit": data_leader_unit,
+        "follower_unit": data_follower_unit,
+        "use_ratio": bool(use_ratio),
+        "times": cube.times[rel_time_inds],
+        "xs": np.concatenate([np.empty(0)] + breakpoints),
+        "ys": np.concatenate([np.empty(0)] + quantile_values),
+        "offsets": np.cumsum([0] + [len(xs) for xs in breakpoints]),
+    }
+    return _make_quantile_rolling_windows_filler_from_tables(tables)
+
+
+def _make_quantile_rolling_windows_filler_from_tables(tables):
+    """
+    Constructs the filler function of :class:`QuantileRollingWindows` from the
+    ``tables`` built by :func:`_make_quantile_rolling_windows_filler`, without the
+    database.
+    """
+    variable_follower = tables["variable_follower"]
+    variable_leaders = tables["variable_leaders"]
+    db_time_col = tables["time_col"]
+    data_leader_unit = tables["leader_unit"]
+    data_follower_unit = tables["follower_unit"]
+    use_ratio = tables["use_ratio"]
+    times = tables["times"]
+    xs, ys, offsets = tables["xs"], tables["ys"], tables["offsets"]
+
+    def validate(in_iamdf):
+        """
+        Checks that ``in_iamdf`` can be infilled.
+        """
+        if db_time_col != in_iamdf.time_col:
+            raise ValueError(
+                "`in_iamdf` time column must be the same as the time column used "
+                "to generate this filler function (`{}`)".format(db_time_col)
+            )
 
-        def filler(in_iamdf):
-            """
-            Filler function derived from :class:`QuantileRollingWindows`.
-
-            Parameters
-            ----------
-            in_iamdf : :obj:`pyam.IamDataFrame`
-                Input data to fill data in
-
-            Returns
-            -------
-            :obj:`pyam.IamDataFrame`
-                Filled in data (without original source data)
-
-            Raises
-            ------
-            ValueError
-                The key db_times for filling are not in ``in_iamdf``.
-            """
-            if db_time_col != in_iamdf.time_col:
-                raise ValueError(
-                    "`in_iamdf` time column must be the same as the time column used "
-                    "to generate this filler function (`{}`)".format(db_time_col)
+        in_metadata = _MetadataIndex.from_data(in_iamdf.data, in_iamdf.time_col)
+        var_units = _get_units_of_variables(in_metadata, variable_leaders)
+        if not var_units:
+            raise ValueError(
+                "There is no data for {} so it cannot be infilled".format(
+                    variable_leaders
                 )
+            )
+        var_units = var_units[0]
 
-            var_units = _get_unit_of_variable(in_iamdf, variable_leaders)
-            if var_units.size == 0:
-                raise ValueError(
-                    "There is no data for {} so it cannot be infilled".format(
-                        variable_leaders
-                    )
+        if var_units != data_leader_unit:
+            raise ValueError(
+                "Units of lead variable is meant to be `{}`, found `{}`".format(
+                    data_leader_unit, var_units
                 )
-            var_units = var_units[0]
+            )
 
-            if var_units != data_leader_unit:
-                raise ValueError(
-                    "Units of lead variable is meant to be `{}`, found `{}`".format(
-                        data_leader_unit, var_units
-                    )
+        # check whether we have all the required timepoints or not
+        if (times.get_indexer(_normalise_times(in_metadata.all_times)) == -1).any():
+            raise ValueError(
+                "Not all required timepoints are present in the database we "
+                "crunched, we crunched \n\t`{}`\nbut you passed in \n\t{}".format(
+                    list(times), in_metadata.all_times.tolist(),
                 )
-
-            # check whether we have all the required timepoints or not
-            have_all_timepoints = all(
-                [c in derived_relationships for c in in_iamdf.timeseries()]
             )
 
-            if not have_all_timepoints:
-                raise ValueError(
-                    "Not all required timepoints are present in the database we "
-                    "crunched, we crunched \n\t`{}`\nbut you passed in \n\t{}".format(
-                        list(derived_relationships.keys()),
-                        in_iamdf.timeseries().columns.tolist(),
-                    )
-                )
+    def fill_values(lead, fill_times):
+        """
+        Infills ``lead``, raising a ``ValueError`` if not all of ``fill_times`` are in
+        the database we crunched.
+        """
+        time_inds = _get_time_indices(times, fill_times)
+        filled = _interpolate_from_table(xs, ys, offsets, time_inds, lead)
+        if use_ratio:
+            filled *= lead
 
-            # do infilling here
-            infilled_ts = in_iamdf.filter(variable=variable_leaders).timeseries()
-            for col in infilled_ts:
-                if use_ratio:
-                    infilled_ts[col] = (
-                        derived_relationships[col](infilled_ts[col]) * infilled_ts[col]
-                    )
-                else:
-                    infilled_ts[col] = derived_relationships[col](infilled_ts[col])
+        return filled
 
-            infilled_ts = infilled_ts.reset_index()
-            infilled_ts["variable"] = variable_follower
-            infilled_ts["unit"] = data_follower_unit
+    return _DatabaseCruncher._build_filler(
+        validate,
+        fill_values,
+        variable_follower,
+        variable_leaders,
+        data_follower_unit,
+        tables,
+    )
 
-            return IamDataFrame(infilled_ts)
 
-        return filler
+def _get_units_of_variables(metadata, variables):
+    """
+    Get the units of ``variables`` from a :class:`_MetadataIndex`, raising an
+    ``AssertionError`` if there is more than one.
+    """
+    units = []
+    for variable in variables:
+        units += [u for u in metadata.units(variable) if u not in units]
+    if len(units) > 1:
+        raise AssertionError("`{}` has multiple units".format(variables))
+    return units
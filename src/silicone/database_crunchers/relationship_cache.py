@@ -0,0 +1,154 @@
+"""
+Cache of derived relationships, held in memory and optionally on disk.
+"""
+import hashlib
+import os.path
+from collections import OrderedDict, namedtuple
+
+from .. import __version__
+from .relationship_tables import _filler_from_tables, _load_tables, _save_tables
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class RelationshipCache:
+    """
+    Least-recently-used cache of the filler functions returned by crunchers.
+
+    Deriving relationships is often the most expensive part of infilling, so when the
+    same relationships are needed repeatedly (e.g. when infilling many batches of
+    scenarios against the same database) they can be kept here rather than derived
+    again. Entries are keyed by everything which determines a relationship, i.e. a
+    fingerprint of the database's content, the cruncher and its settings, the
+    follower, the leaders and the keyword arguments used to derive it (see
+    :func:`silicone.multiple_infillers.infill_all_required_variables`, which builds
+    these keys itself). Like :func:`functools.lru_cache`, it records how many lookups
+    hit and missed, see :meth:`cache_info`.
+
+    If a ``directory`` is given, relationships are also saved there, so that they
+    survive restarts and can be shared between processes. Each is saved as a ``.npz``
+    file of the arrays which determine it (its filler's ``tables``), named by a hash
+    of its key and the version of silicone, so that a relationship is derived again
+    whenever anything it depends on changes. Only the relationships of crunchers
+    whose fillers have tables (:class:`LinearInterpolation`,
+    :class:`QuantileRollingWindows`, :class:`ScenarioAndModelSpecificInterpolate` and
+    :class:`TimeDepRatio`) are saved, the others are only kept in memory.
+    """
+
+    def __init__(self, maxsize=128, directory=None):
+        """
+        Initialise the cache
+
+        Parameters
+        ----------
+        maxsize : int
+            The maximum number of relationships to keep. Once it is reached, the
+            least recently used relationship is dropped whenever a new one is added.
+            This does not limit the number of relationships saved in ``directory``.
+
+        directory : str
+            If supplied, the directory in which to save relationships (it is created
+            if it does not exist). Relationships which are not in memory are looked
+            up here before being counted as misses.
+        """
+        if maxsize < 1:
+            raise ValueError("`maxsize` must be at least 1")
+        self.maxsize = maxsize
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._relationships = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        return len(self._relationships)
+
+    def get(self, key):
+        """
+        Look up a relationship
+
+        Parameters
+        ----------
+        key : hashable
+            The key of the relationship
+
+        Returns
+        -------
+        :obj:`func`
+            The filler function of the relationship, or ``None`` if it is not in the
+            cache
+        """
+        if key in self._relationships:
+            self._hits += 1
+            self._relationships.move_to_end(key)
+            return self._relationships[key]
+        path = self._get_path(key)
+        if path is None or not os.path.isfile(path):
+            self._misses += 1
+            return None
+        self._hits += 1
+        filler = _filler_from_tables(_load_tables(path))
+        self._keep(key, filler)
+        return filler
+
+    def put(self, key, filler):
+        """
+        Add a relationship, dropping the least recently used one if the cache is full
+
+        Parameters
+        ----------
+        key : hashable
+            The key of the relationship
+
+        filler : :obj:`func`
+            The filler function of the relationship
+        """
+        self._keep(key, filler)
+        path = self._get_path(key)
+        tables = getattr(filler, "tables", None)
+        if path is not None and tables is not None and not os.path.isfile(path):
+            _save_tables(path, tables)
+
+    def cache_info(self):
+        """
+        Get statistics about the cache
+
+        Returns
+        -------
+        :obj:`CacheInfo`
+            The number of hits and misses, the maximum size and the current size of
+            the cache
+        """
+        return CacheInfo(self._hits, self._misses, self.maxsize, len(self))
+
+    def clear(self):
+        """
+        Remove all the relationships from memory and reset the statistics. Any saved
+        in ``directory`` are kept.
+        """
+        self._relationships.clear()
+        self._hits = 0
+        self._misses = 0
+
+    def _keep(self, key, filler):
+        """
+        Keeps a relationship in memory, dropping the least recently used one if the
+        cache is full
+        """
+        self._relationships[key] = filler
+        self._relationships.move_to_end(key)
+        if len(self._relationships) > self.maxsize:
+            self._relationships.popitem(last=False)
+
+    def _get_path(self, key):
+        """
+        Get the path of the file in which the relationship with ``key`` is saved, or
+        ``None`` if relationships are not saved. The key must have the same
+        :func:`repr` in every process, which is the case for the keys built by
+        :func:`silicone.multiple_infillers.infill_all_required_variables`.
+        """
+        if self.directory is None:
+            return None
+        digest = hashlib.sha1(repr((__version__, key)).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".npz")
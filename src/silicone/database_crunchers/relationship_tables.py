@@ -0,0 +1,105 @@
+"""
+Conversion of derived relationships to and from arrays, so that they can be stored
+without the database they were derived from.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .linear_interpolation import _make_linear_interpolation_filler_from_tables
+from .quantile_rolling_windows import _make_quantile_rolling_windows_filler_from_tables
+from .time_dep_ratio import _make_time_dep_ratio_filler_from_tables
+
+# The functions which rebuild fillers from their tables, keyed by the cruncher which
+# built the tables
+_FILLER_BUILDERS = {
+    "LinearInterpolation": _make_linear_interpolation_filler_from_tables,
+    "QuantileRollingWindows": _make_quantile_rolling_windows_filler_from_tables,
+    "TimeDepRatio": _make_time_dep_ratio_filler_from_tables,
+}
+
+# Tables which are not stored as they are used, i.e. which are times (held in a
+# :obj:`pd.Index`) or lists
+_INDEX_TABLES = ("times", "follower_times")
+_LIST_TABLES = ("variable_leaders",)
+
+
+def _filler_from_tables(tables):
+    """
+    Rebuilds a filler function from its ``tables`` attribute.
+
+    Raises
+    ------
+    ValueError
+        The tables were built by a cruncher whose fillers cannot be rebuilt.
+    """
+    if tables["cruncher"] not in _FILLER_BUILDERS:
+        raise ValueError(
+            "Fillers derived by `{}` cannot be rebuilt from tables".format(
+                tables["cruncher"]
+            )
+        )
+    return _FILLER_BUILDERS[tables["cruncher"]](tables)
+
+
+def _tables_to_arrays(tables, prefix=""):
+    """
+    Converts ``tables`` into a dictionary of arrays which can be saved with
+    :func:`np.savez` (without pickling), with ``prefix`` added to each key.
+    """
+    return {prefix + name: np.asarray(value) for name, value in tables.items()}
+
+
+def _tables_from_arrays(arrays, prefix=""):
+    """
+    Reverses :func:`_tables_to_arrays` for the keys of ``arrays`` (e.g. an opened
+    ``.npz`` file) starting with ``prefix``.
+    """
+    tables = {}
+    for key in arrays.keys():
+        if not key.startswith(prefix):
+            continue
+        name = key[len(prefix) :]
+        value = arrays[key]
+        if name in _INDEX_TABLES:
+            value = pd.Index(value)
+        elif name in _LIST_TABLES:
+            value = value.tolist()
+        elif value.ndim == 0:
+            value = value.item()
+        tables[name] = value
+    return tables
+
+
+def _save_arrays(path, arrays):
+    """
+    Saves ``arrays`` to the ``.npz`` file ``path``. The file is written under a
+    temporary name and then moved into place, so other processes never see a partly
+    written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, tmp_path = tempfile.mkstemp(suffix=".npz", dir=directory)
+    try:
+        with os.fdopen(handle, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _save_tables(path, tables):
+    """
+    Saves the ``tables`` of a filler to the ``.npz`` file ``path``.
+    """
+    _save_arrays(path, _tables_to_arrays(tables))
+
+
+def _load_tables(path):
+    """
+    Loads the tables of a filler saved with :func:`_save_tables`.
+    """
+    with np.load(path, allow_pickle=False) as arrays:
+        return _tables_from_arrays(arrays)
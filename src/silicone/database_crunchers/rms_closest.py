@@ -3,10 +3,14 @@ Module for the database cruncher which uses the 'closest RMS' technique.
 """
 import warnings
 
-import pyam
+import numpy as np
+import pandas as pd
 
-from ..utils import _get_unit_of_variable
 from .base import _DatabaseCruncher
+from .cube import _MetadataIndex
+from .lazy_result import _make_filler_output
+
+_MAX_BLOCK_SIZE = 2 ** 22
 
 
 class RMSClosest(_DatabaseCruncher):
@@ -61,40 +65,50 @@ class RMSClosest(_DatabaseCruncher):
             database.
         """
         self._check_iamdf_lead(variable_leaders)
-        iamdf_follower = self._get_iamdf_section(variable_follower)
-        data_follower_time_col = iamdf_follower.time_col
-        iamdf_lead = self._db.filter(variable=variable_leaders)
-        iamdf_lead, iamdf_follower = _filter_for_overlap(
-            iamdf_lead, iamdf_follower, ["scenario", "model", data_follower_time_col]
+        cube = self._get_cube()
+        metadata = self._get_metadata()
+        if variable_follower not in metadata:
+            error_msg = "No data for `variable_follower` ({}) in database".format(
+                variable_follower
+            )
+            raise ValueError(error_msg)
+        data_follower_time_col = cube.time_col
+        lead_values, follower_values = _filter_for_overlap(
+            cube, variable_leaders[0], variable_follower
+        )
+        leader_units = [
+            unit
+            for unit, values in zip(metadata.units(variable_leaders[0]), lead_values)
+            if not np.isnan(values).all()
+        ]
+        if len(leader_units) > 1:
+            raise AssertionError("`{}` has multiple units".format(variable_leaders))
+        leader_unit = leader_units[0]
+        lead_ts = cube.timeseries(variable_leaders[0], lead_values)
+        follower_ts = cube.timeseries(variable_follower, follower_values)
+        follower_models = follower_ts.index.get_level_values("model")
+        follower_scenarios = follower_ts.index.get_level_values("scenario")
+        # The row of the follower data from the same model and scenario as each row
+        # of the leader data
+        follower_rows = {}
+        for i, model_scenario in enumerate(zip(follower_models, follower_scenarios)):
+            follower_rows.setdefault(model_scenario, i)
+        follower_rows = np.array(
+            [
+                follower_rows[model_scenario]
+                for model_scenario in zip(
+                    lead_ts.index.get_level_values("model"),
+                    lead_ts.index.get_level_values("scenario"),
+                )
+            ]
         )
 
-        leader_unit = _get_unit_of_variable(iamdf_lead, variable_leaders)
-        leader_unit = leader_unit[0]
-
-        def filler(in_iamdf):
+        def validate(in_iamdf):
             """
-            Filler function derived from :obj:`RMSClosest`.
-
-            Parameters
-            ----------
-            in_iamdf : :obj:`pyam.IamDataFrame`
-                Input data to fill data in
-
-            Returns
-            -------
-            :obj:`pyam.IamDataFrame`
-                Filled in data (without original source data)
-
-            Raises
-            ------
-            ValueError
-                If there are any inconsistencies between the timeseries, units or
-                expectations of the program and ``in_iamdf``, compared to the database
-                used to generate this ``filler`` function.
+            Checks that ``in_iamdf`` can be infilled.
             """
-            lead_var = in_iamdf.filter(variable=variable_leaders)
-
-            var_units = lead_var["unit"].unique()
+            in_metadata = _MetadataIndex.from_data(in_iamdf.data, in_iamdf.time_col)
+            var_units = in_metadata.units(variable_leaders[0])
             if len(var_units) != 1:
                 raise ValueError("More than one unit detected for input timeseries")
 
@@ -114,38 +128,36 @@ class RMSClosest(_DatabaseCruncher):
                     )
                 )
 
-            key_timepoints_filter_iamdf = {
-                data_follower_time_col: list(set(lead_var[data_follower_time_col]))
-            }
-            key_timepoints_filter_lead = {
-                data_follower_time_col: list(set(iamdf_lead[data_follower_time_col]))
-            }
-
-            def get_values_at_key_timepoints(idf, time_filter):
-                # filter warning about empty data frame as we handle it ourselves
-                to_return = idf.filter(**time_filter)
-                if to_return.data.empty:
-                    raise ValueError(
-                        "No time series overlap between the original and unfilled data"
-                    )
-                return to_return
-
-            lead_var_timeseries = get_values_at_key_timepoints(
-                lead_var, key_timepoints_filter_lead
-            ).timeseries()
-            iamdf_lead_timeseries = get_values_at_key_timepoints(
-                iamdf_lead, key_timepoints_filter_iamdf
+        def trusted_filler(in_iamdf, lazy=False):
+            """
+            Infills ``in_iamdf`` without validating it. Each timeseries is infilled
+            with the whole of the closest follower timeseries.
+            """
+            lead_var_timeseries = in_iamdf.filter(
+                variable=variable_leaders
             ).timeseries()
+            lead_var_timeseries = _drop_empty(
+                lead_var_timeseries.loc[
+                    :, lead_var_timeseries.columns.isin(lead_ts.columns)
+                ]
+            )
+            iamdf_lead_timeseries = _drop_empty(
+                lead_ts.loc[:, lead_ts.columns.isin(lead_var_timeseries.columns)]
+            )
+            if lead_var_timeseries.empty or iamdf_lead_timeseries.empty:
+                raise ValueError(
+                    "No time series overlap between the original and unfilled data"
+                )
 
             output_ts_list = []
             for label, row in lead_var_timeseries.iterrows():
                 closest_ts = _select_closest(iamdf_lead_timeseries, row)
 
-                # Filter to find the matching follow data for the same model, scenario
-                # and region
-                tmp = iamdf_follower.filter(
-                    model=closest_ts["model"], scenario=closest_ts["scenario"]
-                ).data
+                # Find the matching follow data for the same model and scenario
+                tmp = follower_ts[
+                    (follower_models == closest_ts["model"])
+                    & (follower_scenarios == closest_ts["scenario"])
+                ].reset_index()
 
                 # Update the model and scenario to match the elements of the input.
                 tmp["model"] = label[lead_var_timeseries.index.names.index("model")]
@@ -156,9 +168,39 @@ class RMSClosest(_DatabaseCruncher):
                 if in_iamdf.extra_cols:
                     for col in in_iamdf.extra_cols:
                         tmp[col] = label[lead_var_timeseries.index.names.index(col)]
-            return pyam.concat(output_ts_list)
+            return _make_filler_output(pd.concat(output_ts_list, sort=False), lazy)
 
-        return filler
+        def fill_values(lead, fill_times):
+            """
+            Infills ``lead``. Unlike the filler function, which returns the whole of
+            the closest follower timeseries, this only returns the follower values at
+            ``fill_times`` (which are ``nan`` where the follower has no data). If the
+            database reports several follower timeseries for the closest model and
+            scenario, the first is used. A ``ValueError`` is raised if none of
+            ``fill_times`` are in the leader data of the database we crunched.
+            """
+            search_inds = lead_ts.columns.get_indexer(fill_times)
+            overlap = search_inds != -1
+            if not overlap.any():
+                raise ValueError(
+                    "No time series overlap between the original and unfilled data"
+                )
+            closest = _find_closest_rows(
+                lead_ts.values[:, search_inds[overlap]], lead[:, overlap]
+            )
+            time_inds = follower_ts.columns.get_indexer(fill_times)
+            filled = follower_ts.values[follower_rows[closest]][:, time_inds]
+            filled[:, time_inds == -1] = np.nan
+            return filled
+
+        return self._build_filler(
+            validate,
+            fill_values,
+            variable_follower,
+            variable_leaders,
+            None,
+            trusted_filler=trusted_filler,
+        )
 
     def _check_iamdf_lead(self, variable_leaders):
         if len(variable_leaders) > 1:
@@ -167,27 +209,12 @@ class RMSClosest(_DatabaseCruncher):
                 "contain one variable"
             )
 
-        if not all([v in self._db.variables().tolist() for v in variable_leaders]):
+        if not all([v in self._get_metadata() for v in variable_leaders]):
             error_msg = "No data for `variable_leaders` ({}) in database".format(
                 variable_leaders
             )
             raise ValueError(error_msg)
 
-    def _get_iamdf_section(self, variables):
-        # filter warning about empty data frame as we handle it ourselves
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            iamdf_section = self._db.filter(variable=variables)
-
-        data_section = iamdf_section.data
-        if data_section.empty:
-            error_msg = "No data for `variable_follower` ({}) in database".format(
-                variables
-            )
-            raise ValueError(error_msg)
-
-        return iamdf_section
-
 
 def _select_closest(to_search_df, target_series):
     """
@@ -217,39 +244,79 @@ def _select_closest(to_search_df, target_series):
             "Target array does not match the size of the searchable arrays"
         )
 
-    closeness = []
-    for label, row in to_search_df.iterrows():
-        rms = (((target_series - row) ** 2).mean()) ** 0.5
-        closeness.append((label, rms))
+    rmss = ((to_search_df - target_series) ** 2).mean(axis=1) ** 0.5
 
     # Find the minimum closeness and return the index of it
-    labels, rmss = list(zip(*closeness))
-    to_return = rmss.index(min(rmss))
-    return dict(zip(to_search_df.index.names, labels[to_return]))
+    return dict(zip(to_search_df.index.names, rmss.idxmin()))
 
 
-def _filter_for_overlap(df1, df2, cols):
+def _find_closest_rows(to_search, targets):
     """
-    Returns rows in the two input dataframes which have the same columns
+    Find the row of ``to_search`` which is closest to each row of ``targets``.
+
+    As in :func:`_select_closest`, 'closest' is in the root-mean squared sense
+    (ignoring nans) and ties are resolved by returning the first row.
+
     Parameters
     ----------
-    df1 : :obj:`pd.DataFrame`
-        The first dataframe (order is irrelevant)
-    df2 : :obj:`pd.DataFrame`
-        The second dataframe (order is irrelevant)
-    cols: list[str]
-        List of columns that should be identical between the two dataframes.
+    to_search : :obj:`np.ndarray`
+        The rows of this array are the candidate closest vectors
+
+    targets : :obj:`np.ndarray`
+        The vectors to which we want to be close, with the same number of columns as
+        ``to_search``
+
     Returns
     -------
-    (:obj:`pd.DataFrame`, :obj:`pd.DataFrame`)
-        The two dataframes in the order they were put in, now filtered for some columns
-        being identical.
+    :obj:`np.ndarray`
+        The index of the closest row of ``to_search`` to each row of ``targets``
     """
-    lead_data = df1.data.set_index(cols)
-    follow_data = df2.data.set_index(cols)
-    shared_indices = [ind for ind in lead_data.index if ind in follow_data.index]
-    if shared_indices:
-        lead_data = lead_data.loc[shared_indices]
-        follow_data = follow_data.loc[shared_indices]
-        return pyam.IamDataFrame(lead_data), pyam.IamDataFrame(follow_data)
-    raise ValueError("No model/scenario overlap between leader and follower data")
+    # The targets are compared in blocks, so that the differences held in memory at
+    # once have at most about ``_MAX_BLOCK_SIZE`` values
+    block = max(_MAX_BLOCK_SIZE // max(to_search.size, 1), 1)
+    closest = np.zeros(len(targets), dtype=np.int64)
+    for start in range(0, len(targets), block):
+        block_targets = targets[start : start + block]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            mean_squares = np.nanmean(
+                (to_search[np.newaxis, :, :] - block_targets[:, np.newaxis, :]) ** 2,
+                axis=2,
+            )
+        closest[start : start + block] = np.nanargmin(mean_squares, axis=1)
+    return closest
+
+
+def _filter_for_overlap(cube, variable_leader, variable_follower):
+    """
+    Returns the values of the leader and follower in ``cube`` for which both variables
+    have data from the same model and scenario at the same time (other values are
+    masked with nan)
+
+    Returns
+    -------
+    (:obj:`np.ndarray`, :obj:`np.ndarray`)
+        The leader and follower values, in the format of
+        ``cube.values[cube.key_indices(variable)]``
+    """
+    codes, n_groups = cube.group_runs(["model", "scenario"])
+    present = []
+    for variable in [variable_leader, variable_follower]:
+        variable_present = np.zeros((n_groups, len(cube.times)), dtype=bool)
+        np.logical_or.at(
+            variable_present,
+            codes,
+            cube.key_mask(cube.key_indices(variable)).any(axis=0),
+        )
+        present.append(variable_present)
+    shared = (present[0] & present[1])[codes]
+    if not shared.any():
+        raise ValueError("No model/scenario overlap between leader and follower data")
+    return [
+        np.where(shared, cube.values[cube.key_indices(variable)], np.nan)
+        for variable in [variable_leader, variable_follower]
+    ]
+
+
+def _drop_empty(ts):
+    return ts.dropna(axis=0, how="all").dropna(axis=1, how="all")
@@ -2,12 +2,11 @@
 Module for the database cruncher which uses the 'rolling windows' technique with
 different quantiles in different years.
 """
-from datetime import datetime
-
 import numpy as np
 
-from . import QuantileRollingWindows
+from ..utils import _filter_times, _TimeIndex
 from .base import _DatabaseCruncher
+from .quantile_rolling_windows import _make_quantile_rolling_windows_filler
 
 
 class TimeDepQuantileRollingWindows(_DatabaseCruncher):
@@ -58,79 +57,76 @@ class TimeDepQuantileRollingWindows(_DatabaseCruncher):
         ValueError
             Not all times in ``time_quantile_dict`` have data in the database.
         """
-        if self._db.time_col == "year" and all(
-            [isinstance(k, int) for k in time_quantile_dict]
-        ):
-            time_quantile_dict = {np.int64(k): v for k, v in time_quantile_dict.items()}
-
-        times_known = list(self._db[self._db.time_col].unique())
+        cube = self._get_cube()
+        # Work with the positions of the times in the database, so that times may be
+        # given in any style
+        time_inds = cube.time_index.get_indexer(list(time_quantile_dict.keys()))
 
         # This check implicitly checks for date type agreement
-        if any(time not in times_known for time in time_quantile_dict.keys()):
+        if (time_inds == -1).any():
             raise ValueError(
                 "Not all required times in the dictionary have data in the database."
             )
 
+        self._check_follower_and_leader_in_db(variable_follower, variable_leaders)
+        data_follower_unit = self._get_metadata().units(variable_follower)[0]
         filler_fns = {}
-        for time, quantile in time_quantile_dict.items():
-            # TODO: this section can be rewritten to avoid conversions when the pyam
-            # bug is fixed
-            if self._db.time_col == "year":
-                cruncher = QuantileRollingWindows(self._db.filter(year=int(time)))
-            else:
-                cruncher = QuantileRollingWindows(
-                    self._db.filter(time=self._convert_dt64_todt(time))
-                )
-            filler_fns[time] = cruncher.derive_relationship(
-                variable_follower, variable_leaders, quantile, **kwargs
+        for time_ind, quantile in zip(time_inds, time_quantile_dict.values()):
+            filler_fns[time_ind] = _make_quantile_rolling_windows_filler(
+                cube,
+                self._get_metadata(),
+                [time_ind],
+                variable_follower,
+                variable_leaders,
+                quantile,
+                **kwargs,
             )
 
-        def filler(in_iamdf):
+        def validate(in_iamdf):
             """
-            Filler function derived from :class:`TimeDepQuantileRollingWindows`.
-
-            Parameters
-            ----------
-            in_iamdf : :obj:`pyam.IamDataFrame`
-                Input data to fill data in
-
-            Returns
-            -------
-            :obj:`pyam.IamDataFrame`
-                Filled in data (without original source data)
-
-            Raises
-            ------
-            ValueError
-                Not all required times in the infillee database have had an
-                available interpolation.
+            Checks that ``in_iamdf`` can be infilled, including by the fillers for each
+            time.
             """
-            iamdf_times_known = in_iamdf[in_iamdf.time_col]
-            if any(
-                time not in list(time_quantile_dict.keys())
-                for time in iamdf_times_known
-            ):
+            in_time_inds = cube.time_index.get_indexer(
+                in_iamdf.data[in_iamdf.time_col].unique()
+            )
+            if any(time_ind not in filler_fns for time_ind in in_time_inds):
                 raise ValueError(
                     "Not all required times in the infillee database can be found in "
                     "the dictionary."
                 )
 
-            for time in time_quantile_dict.keys():
-                if in_iamdf.time_col == "year":
-                    # TODO: remove int specification from here when pyam bug is fixed
-                    tmp = filler_fns[time](in_iamdf.filter(year=int(time)))
-                else:
-                    tmp = filler_fns[time](
-                        in_iamdf.filter(time=self._convert_dt64_todt(time))
-                    )
+            for time_ind, time_filler in filler_fns.items():
+                time_filler.trusted(
+                    _filter_times(in_iamdf, cube.time_index.labels([time_ind]))
+                )
+
+        def fill_values(lead, fill_times):
+            """
+            Infills ``lead`` with the fillers for each time, raising a ``ValueError``
+            if not all of ``fill_times`` are in the dictionary of quantiles.
+            """
+            fill_time_inds = cube.time_index.get_indexer(fill_times)
+            if any(time_ind not in filler_fns for time_ind in fill_time_inds):
+                raise ValueError(
+                    "Not all required times in the infillee database can be found in "
+                    "the dictionary."
+                )
+            filled = np.empty_like(lead)
+            for i, (time, time_ind) in enumerate(zip(fill_times, fill_time_inds)):
+                filler_fns[time_ind].fill_array(
+                    lead[:, i : i + 1], [time], out=filled[:, i : i + 1]
+                )
 
-                try:
-                    to_return.append(tmp, inplace=True)
-                except NameError:
-                    to_return = tmp.copy()
-            return to_return
+            return filled
 
-        return filler
+        return self._build_filler(
+            validate,
+            fill_values,
+            variable_follower,
+            variable_leaders,
+            data_follower_unit,
+        )
 
     def _convert_dt64_todt(self, time):
-        return time.astype("M8[m]").astype(datetime)
+        return _TimeIndex([time]).labels()[0]
@@ -5,10 +5,10 @@ Module for the database cruncher which uses the 'time-dependent ratio' technique
 import warnings
 
 import numpy as np
-import pandas as pd
-from pyam import IamDataFrame
 
+from ..utils import _get_time_indices
 from .base import _DatabaseCruncher
+from .cube import _MetadataIndex
 
 
 class TimeDepRatio(_DatabaseCruncher):
@@ -81,120 +81,149 @@ class TimeDepRatio(_DatabaseCruncher):
             There is no data for ``variable_leaders`` or ``variable_follower`` in the
             database.
         """
-        iamdf_follower, data_follower = self._get_iamdf_followers(
-            variable_follower, variable_leaders
-        )
+        return self.derive_relationships(
+            [variable_follower], variable_leaders, same_sign=same_sign
+        )[variable_follower]
 
-        data_follower_unit = np.unique(iamdf_follower.data["unit"].values)
-        if data_follower_unit.size == 1:
-            data_follower_unit = data_follower_unit[0]
-        else:
-            raise ValueError("There are multiple/no units in follower data")
-        data_follower_time_col = iamdf_follower.time_col
-        iamdf_leader = self._db.filter(variable=variable_leaders[0])
-        data_leader = iamdf_leader.timeseries()
-        if iamdf_leader["unit"].nunique() != 1:
+    def derive_relationships(
+        self, variable_followers, variable_leaders, same_sign=True
+    ):
+        """
+        Derive the relationships between several followers and the same leader.
+
+        The leader's values, and the means of them used in the ratios, are only
+        calculated once and are then shared by all the followers. See
+        :meth:`derive_relationship` for details of the other arguments and the errors
+        raised.
+
+        Parameters
+        ----------
+        variable_followers : list[str]
+            The variables for which we want to calculate timeseries (e.g.
+            ``["Emissions|C5F12", "Emissions|C6F14"]``).
+
+        Returns
+        -------
+        dict{str: :obj:`func`}
+            Dictionary mapping each of ``variable_followers`` to its filler function,
+            as returned by :meth:`derive_relationship`.
+        """
+        leader_terms = None
+        fillers = {}
+        for variable_follower in variable_followers:
+            self._check_leader_and_follower(variable_follower, variable_leaders)
+            follower_units = self._get_metadata().units(variable_follower)
+            if len(follower_units) != 1:
+                raise ValueError("There are multiple/no units in follower data")
+            if leader_terms is None:
+                leader_terms = self._get_leader_terms(variable_leaders, same_sign)
+            fillers[variable_follower] = self._make_filler(
+                variable_follower,
+                variable_leaders,
+                follower_units[0],
+                same_sign,
+                *leader_terms
+            )
+
+        return fillers
+
+    def _get_leader_terms(self, variable_leaders, same_sign):
+        """
+        Get the leader's values (with a row per run) and the parts of the ratios which
+        only depend on them, i.e. the runs and times with data and, if ``same_sign``,
+        which values are positive and the means of the positive and other values at
+        each of these times.
+        """
+        metadata = self._get_metadata()
+        if len(metadata.units(variable_leaders[0])) != 1:
             raise ValueError("There are multiple/no units for the leader data.")
-        if data_follower.size != data_leader.size:
+        data_leader = self._get_cube().variable_values(variable_leaders[0])
+        leader_mask = ~np.isnan(data_leader)
+        leader_runs = leader_mask.any(axis=1)
+        leader_times = leader_mask.any(axis=0)
+        if not same_sign:
+            return data_leader, leader_runs, leader_times, None, None, None
+        # Runs without leader data do not contribute to the means, so these can be
+        # calculated from all runs
+        leader_at_times = data_leader[:, leader_times].T
+        pos_inds = leader_at_times > 0
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            mean_pos = np.nanmean(
+                np.where(pos_inds, leader_at_times, np.nan), axis=1, dtype=float
+            )
+            mean_neg = np.nanmean(
+                np.where(~pos_inds, leader_at_times, np.nan), axis=1, dtype=float
+            )
+        return data_leader, leader_runs, leader_times, pos_inds, mean_pos, mean_neg
+
+    def _make_filler(
+        self,
+        variable_follower,
+        variable_leaders,
+        data_follower_unit,
+        same_sign,
+        data_leader,
+        leader_runs,
+        leader_times,
+        pos_inds,
+        mean_pos,
+        mean_neg,
+    ):
+        cube = self._get_cube()
+        metadata = self._get_metadata()
+        data_follower_time_col = cube.time_col
+        data_follower = cube.variable_values(variable_follower)
+        follower_runs = ~np.isnan(data_follower).all(axis=1)
+        if leader_runs.sum() * len(metadata.times(variable_leaders[0])) != (
+            follower_runs.sum() * len(metadata.times(variable_follower))
+        ):
             error_msg = "The follower and leader data have different sizes"
             raise ValueError(error_msg)
-        # Calculate the ratios to use
-        all_times = np.unique(iamdf_leader.data[iamdf_leader.time_col])
-        scaling = pd.DataFrame(index=all_times, columns=["pos", "neg"])
+        # Calculate the ratios to use. We work with arrays of times by runs.
+        runs = leader_runs | follower_runs
+        data_follower = data_follower[:, leader_times].T
         if same_sign:
-            # We want to have separate positive and negative answers. We calculate a
-            # tuple, first for positive and then negative values.
+            # We want to have separate positive and negative answers. We calculate
+            # separate arrays for positive and negative values.
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
-                for year in all_times:
-                    pos_inds = data_leader[year].values > 0
-                    scaling["pos"][year] = np.nanmean(
-                        data_follower[year].iloc[pos_inds].values
-                    ) / np.nanmean(data_leader[year].iloc[pos_inds].values)
-                    scaling["neg"][year] = np.nanmean(
-                        data_follower[year].iloc[~pos_inds].values
-                    ) / np.nanmean(data_leader[year].iloc[~pos_inds].values)
-        else:
-            # The tuple is the same in both cases
-            for year in all_times:
-                scaling["pos"][year] = np.mean(data_follower[year].values) / np.mean(
-                    data_leader[year].values
-                )
-            scaling["neg"] = scaling["pos"]
-
-        def filler(in_iamdf):
-            """
-            Filler function derived from :obj:`TimeDepRatio`.
-
-            Parameters
-            ----------
-            in_iamdf : :obj:`pyam.IamDataFrame`
-                Input data to fill data in
-
-            Returns
-            -------
-            :obj:`pyam.IamDataFrame`
-                Filled-in data (without original source data)
-
-            Raises
-            ------
-            ValueError
-                The key year for filling is not in ``in_iamdf``.
-            """
-            lead_var = in_iamdf.filter(variable=variable_leaders)
-            assert (
-                lead_var["unit"].nunique() == 1
-            ), "There are multiple units for the lead variable."
-            if data_follower_time_col != in_iamdf.time_col:
-                raise ValueError(
-                    "`in_iamdf` time column must be the same as the time column used "
-                    "to generate this filler function (`{}`)".format(
-                        data_follower_time_col
+                scaling_pos = (
+                    np.nanmean(
+                        np.where(pos_inds, data_follower, np.nan)[:, runs],
+                        axis=1,
+                        dtype=float,
                     )
+                    / mean_pos
                 )
-            times_needed = set(in_iamdf.data[in_iamdf.time_col])
-            if any(
-                [
-                    k not in set(iamdf_follower[data_follower_time_col])
-                    for k in times_needed
-                ]
-            ):
-                error_msg = (
-                    "Not all required timepoints are in the data for "
-                    "the lead gas ({})".format(variable_leaders[0])
-                )
-                raise ValueError(error_msg)
-            output_ts = lead_var.timeseries()
-
-            for year in times_needed:
-                if (
-                    scaling.loc[year][
-                        output_ts[year].map(lambda x: "neg" if x < 0 else "pos")
-                    ]
-                    .isnull()
-                    .values.any()
-                ):
-                    raise ValueError(
-                        "Attempt to infill {} data using the time_dep_ratio cruncher "
-                        "where the infillee data has a sign not seen in the infiller "
-                        "database for year "
-                        "{}.".format(variable_leaders, year)
+                scaling_neg = (
+                    np.nanmean(
+                        np.where(~pos_inds, data_follower, np.nan)[:, runs],
+                        axis=1,
+                        dtype=float,
                     )
-                output_ts[year] = (
-                    output_ts[year].values
-                    * scaling.loc[year][
-                        output_ts[year].map(lambda x: "pos" if x > 0 else "neg")
-                    ].values
+                    / mean_neg
                 )
-            output_ts.reset_index(inplace=True)
-            output_ts["variable"] = variable_follower
-            output_ts["unit"] = data_follower_unit
-
-            return IamDataFrame(output_ts)
-
-        return filler
+        else:
+            # The ratios are the same in both cases
+            scaling_pos = np.mean(
+                data_follower[:, runs], axis=1, dtype=float
+            ) / np.mean(data_leader[runs][:, leader_times].T, axis=1, dtype=float)
+            scaling_neg = scaling_pos
+        tables = {
+            "cruncher": "TimeDepRatio",
+            "variable_follower": variable_follower,
+            "variable_leaders": list(variable_leaders),
+            "time_col": data_follower_time_col,
+            "follower_unit": data_follower_unit,
+            "times": cube.times[leader_times],
+            "follower_times": metadata.times(variable_follower),
+            "scaling_pos": scaling_pos,
+            "scaling_neg": scaling_neg,
+        }
+        return _make_time_dep_ratio_filler_from_tables(tables)
 
-    def _get_iamdf_followers(self, variable_follower, variable_leaders):
+    def _check_leader_and_follower(self, variable_follower, variable_leaders):
         if len(variable_leaders) > 1:
             raise ValueError(
                 "For `TimeDepRatio`, ``variable_leaders`` should only "
@@ -203,7 +232,66 @@ class TimeDepRatio(_DatabaseCruncher):
 
         self._check_follower_and_leader_in_db(variable_follower, variable_leaders)
 
-        iamdf_follower = self._db.filter(variable=variable_follower)
-        data_follower = iamdf_follower.timeseries()
 
-        return iamdf_follower, data_follower
+def _make_time_dep_ratio_filler_from_tables(tables):
+    """
+    Constructs the filler function of :class:`TimeDepRatio` from the ``tables`` built
+    by :meth:`TimeDepRatio.derive_relationships`, without the database.
+    """
+    variable_follower = tables["variable_follower"]
+    variable_leaders = tables["variable_leaders"]
+    data_follower_time_col = tables["time_col"]
+    data_follower_unit = tables["follower_unit"]
+    all_times = tables["times"]
+    follower_times = tables["follower_times"]
+    scaling_pos = tables["scaling_pos"]
+    scaling_neg = tables["scaling_neg"]
+
+    def validate(in_iamdf):
+        """
+        Checks that ``in_iamdf`` can be infilled.
+        """
+        in_metadata = _MetadataIndex.from_data(in_iamdf.data, in_iamdf.time_col)
+        assert (
+            len(in_metadata.units(variable_leaders[0])) == 1
+        ), "There are multiple units for the lead variable."
+        if data_follower_time_col != in_iamdf.time_col:
+            raise ValueError(
+                "`in_iamdf` time column must be the same as the time column used "
+                "to generate this filler function (`{}`)".format(data_follower_time_col)
+            )
+        if (follower_times.get_indexer(in_metadata.all_times) == -1).any():
+            error_msg = (
+                "Not all required timepoints are in the data for "
+                "the lead gas ({})".format(variable_leaders[0])
+            )
+            raise ValueError(error_msg)
+
+    def fill_values(lead, fill_times):
+        """
+        Infills ``lead``, raising a ``ValueError`` if not all of ``fill_times`` are in
+        the database we crunched or the leader has a sign at some time which was not
+        seen in the database.
+        """
+        time_inds = _get_time_indices(all_times, fill_times)
+        pos = scaling_pos[time_inds]
+        neg = scaling_neg[time_inds]
+
+        sign_unseen = np.isnan(np.where(lead < 0, neg, pos)).any(axis=0)
+        if sign_unseen.any():
+            raise ValueError(
+                "Attempt to infill {} data using the time_dep_ratio cruncher "
+                "where the infillee data has a sign not seen in the infiller "
+                "database for year "
+                "{}.".format(variable_leaders, list(fill_times)[sign_unseen.argmax()])
+            )
+        return np.where(lead > 0, pos, neg) * lead
+
+    return _DatabaseCruncher._build_filler(
+        validate,
+        fill_values,
+        variable_follower,
+        variable_leaders,
+        data_follower_unit,
+        tables,
+    )
@@ -9,5 +9,7 @@ from .decompose_collection_with_time_dep_ratio import (  # noqa: F401
 )
 from .infill_all_required_emissions_for_openscm import (  # noqa: F401
     infill_all_required_variables,
+    infill_all_required_variables_in_chunks,
 )
 from .infill_composite_values import infill_composite_values  # noqa: F401
+from .infilling_plan import InfillingPlan, compile_infilling_plan  # noqa: F401
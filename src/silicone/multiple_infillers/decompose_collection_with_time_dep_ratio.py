@@ -6,6 +6,10 @@ aggregate variable and breaking this mix into its constituents.
 import pyam
 
 from silicone.database_crunchers import TimeDepRatio
+from silicone.database_crunchers.cube import (
+    _check_database_unchanged,
+    _fingerprint_database,
+)
 from silicone.utils import convert_units_to_MtCO2_equiv
 
 
@@ -15,7 +19,7 @@ class DecomposeCollectionTimeDepRatio:
     calculate what this predicts for our database.
     """
 
-    def __init__(self, db):
+    def __init__(self, db, copy=True):
         """
         Initialises the database to use for infilling.
 
@@ -23,8 +27,20 @@ class DecomposeCollectionTimeDepRatio:
         ----------
         db : IamDataFrame
             The database for infilling.
+
+        copy : bool
+            If ``True``, a copy of ``db`` is used. If ``False``, only a reference to
+            ``db`` is kept, which avoids duplicating large databases in memory. ``db``
+            must then not be modified while it is in use, which is checked in the same
+            way as for crunchers created with ``copy=False`` (see
+            :class:`silicone.database_crunchers.base._DatabaseCruncher`).
         """
-        self._db = db.copy()
+        if copy:
+            self._db = db.copy()
+            self._db_fingerprint = None
+        else:
+            self._db = db
+            self._db_fingerprint = _fingerprint_database(db)
 
     def _construct_consistent_values(self, aggregate_name, components, db_to_generate):
         """
@@ -123,8 +139,11 @@ class DecomposeCollectionTimeDepRatio:
         ------
         ValueError
             There is no data for ``variable_leaders`` or ``variable_follower`` in the
-            database.
+            database, or the database has been modified since this was created with
+            ``copy=False``.
         """
+        if self._db_fingerprint is not None:
+            _check_database_unchanged(self._db, self._db_fingerprint)
         assert (
             aggregate in to_infill_df.variables().values
         ), "The database to infill does not have the aggregate variable"
@@ -137,29 +156,25 @@ class DecomposeCollectionTimeDepRatio:
             "The database and to_infill_db fed into this have inconsistent columns, "
             "which will prevent adding the data together properly."
         )
-        self._db.filter(variable=components, inplace=True)
+        db = self._db.filter(variable=components)
         # We only want to reference cases where all the required components are found
-        combinations = self._db.data[["model", "scenario", "region"]].drop_duplicates()
+        combinations = db.data[["model", "scenario", "region"]].drop_duplicates()
         for ind in range(len(combinations)):
             model, scenario, region = combinations.iloc[ind]
-            found_vars = self._db.filter(
+            found_vars = db.filter(
                 model=model, scenario=scenario, region=region
             ).variables()
             if any(comp not in found_vars.values for comp in components):
-                self._db.filter(
-                    model=model, scenario=scenario, keep=False, inplace=True
-                )
-        if len(self._set_of_units_without_equiv(self._db)) > 1:
-            db_to_generate = convert_units_to_MtCO2_equiv(
-                self._db, use_ar4_data=use_ar4_data
-            )
+                db = db.filter(model=model, scenario=scenario, keep=False)
+        if len(self._set_of_units_without_equiv(db)) > 1:
+            db_to_generate = convert_units_to_MtCO2_equiv(db, use_ar4_data=use_ar4_data)
         else:
-            db_to_generate = self._db
+            db_to_generate = db
         consistent_composite = self._construct_consistent_values(
             aggregate, components, db_to_generate
         )
-        self._db.append(consistent_composite, inplace=True)
-        cruncher = TimeDepRatio(self._db)
+        db = db.append(consistent_composite)
+        cruncher = TimeDepRatio(db, copy=False)
         if self._set_of_units_without_equiv(
             to_infill_df
         ) != self._set_of_units_without_equiv(consistent_composite):
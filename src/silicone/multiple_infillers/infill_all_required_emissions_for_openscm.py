@@ -1,12 +1,22 @@
+import concurrent.futures
+import inspect
 import logging
 import re
 import warnings
 
+import numpy as np
 import pandas as pd
 import pyam
 import tqdm
 
-from silicone.database_crunchers import ConstantRatio, QuantileRollingWindows
+from silicone.database_crunchers import (
+    ConstantRatio,
+    LazyResult,
+    QuantileRollingWindows,
+)
+from silicone.database_crunchers.cube import _fingerprint_content
+from silicone.database_crunchers.relationship_tables import _filler_from_tables
+from silicone.utils import _interpolate_onto_times, _TimeIndex
 
 
 """
@@ -24,6 +34,11 @@ def infill_all_required_variables(
     infilled_data_prefix=None,
     to_fill_old_prefix=None,
     check_data_returned=False,
+    compact=False,
+    n_jobs=1,
+    pool_regions=False,
+    relationship_cache=None,
+    executor=None,
     **kwargs,
 ):
     """
@@ -71,6 +86,40 @@ def infill_all_required_variables(
         reasons for failing this include requesting results at times outside our input
         time range, as well as code bugs.
 
+    compact : bool
+        If true, the cruncher stores the database in compact form, with ``float32``
+        values, which roughly halves the memory it needs for large databases at the
+        cost of their precision. See the ``compact`` argument of the crunchers for
+        details.
+
+    n_jobs : int
+        The number of processes to use. If greater than 1, the relationships are
+        derived in this process and the required variables are then infilled by a
+        pool of processes, which are only sent the arrays which determine the
+        relationships rather than the database. Each process is sent the leader data
+        of each region about once. Variables whose relationships cannot be rebuilt
+        from arrays (see the ``tables`` attribute of filler functions) are infilled
+        in this process, with a warning. The results are the same as those of a
+        single process.
+
+    pool_regions : bool
+        If false, each region of ``to_fill`` is infilled using relationships derived
+        from the same region of ``database``. If true, the relationships are derived
+        from all the regions of ``database`` together, and used for all regions.
+
+    relationship_cache : :obj:`silicone.database_crunchers.RelationshipCache`
+        If supplied, derived relationships are looked up in (and added to) this cache,
+        so that later calls with the same database, cruncher, leaders and keyword
+        arguments reuse them rather than deriving them again. The database is
+        identified by its content, so it need not be the same object. If the cache
+        has a ``directory``, the relationships are also kept between runs.
+
+    executor : :obj:`concurrent.futures.Executor`
+        If supplied, the required variables are infilled by this executor (e.g. a
+        :obj:`concurrent.futures.ProcessPoolExecutor` which is reused between calls)
+        in the same way as by the pool of processes of ``n_jobs``, which is then
+        ignored.
+
     ** kwargs :
         An optional dictionary of keyword : arguments to be used with the cruncher.
 
@@ -80,9 +129,261 @@ def infill_all_required_variables(
         The infilled dataframe (including input data) at requested times. All variables
         now begin with infilled_data_prefix instead of to_fill_old_prefix.
     """
-    # Use default arguments for unfilled options:
+    return _infill_all_required_variables(
+        {},
+        to_fill,
+        database,
+        variable_leaders,
+        required_variables_list,
+        cruncher,
+        output_timesteps,
+        infilled_data_prefix,
+        to_fill_old_prefix,
+        check_data_returned,
+        compact,
+        n_jobs,
+        pool_regions,
+        relationship_cache,
+        executor,
+        **kwargs,
+    )
+
+
+def infill_all_required_variables_in_chunks(
+    to_fill_chunks, database, variable_leaders, output, chunksize=10000, **kwargs
+):
+    """
+    Infills scenarios chunk by chunk, writing out each chunk before the next is read.
+
+    This does the same as :func:`infill_all_required_variables` for each chunk of
+    scenarios, but the database is only prepared, and the relationships are only
+    derived, once. Only one chunk is held in memory at a time, so this can
+    be used for sets of scenarios which are too large to infill in one go.
+
+    Parameters
+    ----------
+    to_fill_chunks : iterable of :obj:`pyam.IamDataFrame` or str
+        The scenarios to infill, in chunks. Each scenario must be entirely within one
+        chunk. If a string, this is the path of a csv file in the wide IAMC format
+        (as written by :meth:`pyam.IamDataFrame.to_csv`), which is read in chunks of
+        about ``chunksize`` rows. Its rows must be grouped by model and scenario.
+
+    database: :obj:`pyam.IamDataFrame`
+        The dataframe containing all information to be used in the infilling process.
+
+    variable_leaders: list[str]
+        The name of the variable(s) found in to_fill which should be used to determine
+        the values of the other variables.
+
+    output : str or func
+        Where to write the infilled chunks. If a string, this is the path of a csv
+        file, to which each chunk is appended in the wide IAMC format. Otherwise,
+        this is called with each infilled chunk (a :obj:`pyam.IamDataFrame`), e.g. to
+        write it to a database or a Parquet file.
+
+    chunksize : int
+        The number of rows to read at a time if ``to_fill_chunks`` is a path
+
+    **kwargs
+        Any other arguments of :func:`infill_all_required_variables`, which are used
+        for every chunk.
+
+    Returns
+    -------
+    int
+        The number of chunks infilled
+    """
+    if isinstance(to_fill_chunks, str):
+        to_fill_chunks = _read_scenario_chunks(to_fill_chunks, chunksize)
+    if isinstance(output, str):
+        # Every chunk is written under the same times, whichever of them it has
+        times = _TimeIndex(
+            _get_default_arguments(
+                database.time_col, kwargs.get("output_timesteps"), None
+            )[0]
+        ).labels()
+    cache = {}
+    n_chunks = 0
+    for to_fill in to_fill_chunks:
+        infilled = _infill_all_required_variables(
+            cache, to_fill, database, variable_leaders, **kwargs
+        )
+        if isinstance(output, str):
+            wide = infilled.timeseries().reindex(columns=times)
+            if not n_chunks:
+                columns = list(wide.index.names) + times
+            wide.reset_index().reindex(columns=columns).to_csv(
+                output, mode="a" if n_chunks else "w", header=not n_chunks, index=False
+            )
+        else:
+            output(infilled)
+        n_chunks += 1
+    return n_chunks
+
+
+def _read_scenario_chunks(path, chunksize):
+    """
+    Reads a csv file in the wide IAMC format in chunks of about ``chunksize`` rows,
+    without splitting any scenario between chunks. The rows must be grouped by model
+    and scenario.
+
+    Returns
+    -------
+    generator of :obj:`pyam.IamDataFrame`
+        The chunks
+    """
+    carried = None
+    for rows in pd.read_csv(path, chunksize=chunksize):
+        if carried is not None:
+            rows = pd.concat([carried, rows], ignore_index=True)
+        ms_cols = [c for c in rows.columns if c.lower() in ["model", "scenario"]]
+        # The last scenario may continue in the next rows, so is carried over
+        in_last = (rows[ms_cols] == rows[ms_cols].iloc[-1]).all(axis=1)
+        carried = rows.loc[in_last]
+        if not in_last.all():
+            yield pyam.IamDataFrame(rows.loc[~in_last])
+    if carried is not None:
+        yield pyam.IamDataFrame(carried)
+
+
+def _infill_all_required_variables(
+    cache,
+    to_fill,
+    database,
+    variable_leaders,
+    required_variables_list=None,
+    cruncher=QuantileRollingWindows,
+    output_timesteps=None,
+    infilled_data_prefix=None,
+    to_fill_old_prefix=None,
+    check_data_returned=False,
+    compact=False,
+    n_jobs=1,
+    pool_regions=False,
+    relationship_cache=None,
+    executor=None,
+    **kwargs,
+):
+    """
+    Does the work of :func:`infill_all_required_variables`.
+
+    ``cache`` is a dictionary in which the prepared database, crunchers and derived
+    relationships are kept, so that they can be reused when infilling several sets of
+    scenarios with the same arguments (see
+    :func:`infill_all_required_variables_in_chunks`). Otherwise, the arguments are the
+    same as those of :func:`infill_all_required_variables`.
+    """
+    output_timesteps, required_variables_list = _get_default_arguments(
+        to_fill.time_col, output_timesteps, required_variables_list
+    )
+    if not pool_regions:
+        assert set(to_fill.regions()) <= set(
+            database.regions()
+        ), "The cruncher data and the infilled data have different regions."
+    assert database.time_col == to_fill.time_col
+    if "variables" not in cache:
+        _prepare_database(
+            cache,
+            database,
+            cruncher,
+            output_timesteps,
+            compact,
+            pool_regions,
+            relationship_cache is not None,
+        )
+    unavailable_variables = [
+        variab for variab in required_variables_list if variab not in cache["variables"]
+    ]
+    return _infill_required_variables(
+        to_fill,
+        variable_leaders,
+        required_variables_list,
+        unavailable_variables,
+        output_timesteps,
+        infilled_data_prefix,
+        to_fill_old_prefix,
+        check_data_returned,
+        database=cache["database"],
+        cruncher=cruncher,
+        compact=compact,
+        n_jobs=n_jobs,
+        pool_regions=pool_regions,
+        relationship_cache=relationship_cache,
+        executor=executor,
+        cache=cache,
+        **kwargs,
+    )
+
+
+def _prepare_database(
+    cache, database, cruncher, output_timesteps, compact, pool_regions, fingerprint
+):
+    """
+    Puts ``database`` onto ``output_timesteps`` and keeps what is needed to derive
+    relationships from it in ``cache``: its variables, the fingerprint of its content
+    (if ``fingerprint``) and the database itself.
+
+    If ``compact``, the compact crunchers of each region of the database (or of all of
+    it if ``pool_regions``) are kept instead of the database. Each region is put onto
+    the times and converted in turn, so the database is never held at full size a
+    second time.
+    """
+    # Nans in additional columns break pyam, so we overwrite them. Then put all the
+    # data onto the desired times in one step.
+    database.data[database.extra_cols] = database.data[database.extra_cols].fillna(0)
+    if not compact:
+        cache["database"] = _interpolate_onto_times(database, output_timesteps)
+        assert not cache["database"].data.isnull().any().any()
+        cache["variables"] = set(cache["database"].variables())
+        if fingerprint:
+            cache["fingerprint"] = _fingerprint_content(cache["database"].data)
+        return
+
+    crunchers = cache.setdefault("crunchers", {})
+    cache["database"] = None
+    cache["variables"] = set()
+    fingerprints = []
+    for region in [None] if pool_regions else database.regions():
+        region_db = database if region is None else database.filter(region=region)
+        region_db = _interpolate_onto_times(region_db, output_timesteps)
+        assert not region_db.data.isnull().any().any()
+        cache["variables"].update(region_db.variables())
+        if fingerprint:
+            fingerprints.append(_fingerprint_content(region_db.data))
+        crunchers[region] = _make_cruncher(cruncher, region_db, compact)
+    if fingerprint:
+        cache["fingerprint"] = tuple(fingerprints)
+
+
+def _make_cruncher(cruncher, database, compact):
+    """
+    Creates a ``cruncher`` for ``database``.
+
+    ``database`` is never modified, so need not be copied. However, ``copy`` is only
+    passed to crunchers which accept it, and ``compact`` only if it is true, so that
+    crunchers which only take the database can be used.
+    """
+    kwargs = {}
+    if "copy" in inspect.signature(cruncher).parameters:
+        kwargs["copy"] = False
+    if compact:
+        kwargs["compact"] = True
+    return cruncher(database, **kwargs)
+
+
+def _get_default_arguments(time_col, output_timesteps, required_variables_list):
+    """
+    Gets the default values of the ``output_timesteps`` and
+    ``required_variables_list`` arguments of :func:`infill_all_required_variables`,
+    if they are ``None``, for data with time column ``time_col``.
+
+    Returns
+    -------
+    (list[int or datetime], list[str])
+        The output timesteps and required variables
+    """
     if output_timesteps is None:
-        if to_fill.time_col == "time":
+        if time_col == "time":
             raise ValueError(
                 "No default behaviour for output_timesteps when dataframe has time "
                 "column instead of years"
@@ -115,7 +416,32 @@ def infill_all_required_variables(
             "Emissions|Sulfur",
             "Emissions|VOC",
         ]
+    return output_timesteps, required_variables_list
+
 
+def _infill_required_variables(
+    to_fill,
+    variable_leaders,
+    required_variables_list,
+    unavailable_variables,
+    output_timesteps,
+    infilled_data_prefix=None,
+    to_fill_old_prefix=None,
+    check_data_returned=False,
+    database=None,
+    cruncher=None,
+    **kwargs,
+):
+    """
+    Infills ``to_fill`` once the variables which ``database`` has no data for (the
+    ``unavailable_variables``, which are infilled with zeros) are known.
+
+    ``database`` (already put onto ``output_timesteps``) and ``cruncher`` are only
+    used to derive relationships, so need not be supplied if all the fillers are
+    already in the ``cache``, which is passed to :func:`_perform_crunch_and_check`
+    with the other ``kwargs``. The other arguments are the same as those of
+    :func:`infill_all_required_variables`.
+    """
     # Check that the input is valid
     if to_fill_old_prefix:
         if any(
@@ -135,45 +461,14 @@ def infill_all_required_variables(
                 "This data already contains values with the expected final "
                 "prefix. This suggests that some of it has already been infilled."
             )
-    assert len(to_fill.regions()) == 1, "There are {} regions in the data.".format(
-        len(to_fill.regions())
-    )
-    assert len(database.regions()) == 1
-    assert (
-        to_fill.data["region"].iloc[0] == database.data["region"].iloc[0]
-    ), "The cruncher data and the infilled data have different regions."
-    # Perform any interpolations required here
-    to_fill_orig = to_fill.copy()
-    timecol = database.time_col
-    assert timecol == to_fill.time_col
-    df_times_missing = database.timeseries().isna().sum() > 0
-    to_fill_times_missing = to_fill.timeseries().isna().sum() > 0
-    for time in output_timesteps:
-        if time not in database[timecol].tolist() or df_times_missing[time]:
-            database.interpolate(time)
-        if time not in to_fill[timecol].tolist() or to_fill_times_missing[time]:
-            to_fill.interpolate(time)
-    # Nans in additional columns break pyam, so we overwrite them
-    database.data[database.extra_cols] = database.data[database.extra_cols].fillna(0)
+    # Perform any interpolations required here. Nans in additional columns break
+    # pyam, so we overwrite them, before keeping the original data to check against.
+    # Then put all the data onto the desired times in one step.
     to_fill.data[to_fill.extra_cols] = to_fill.data[to_fill.extra_cols].fillna(0)
-    # Filter for desired times
-    if timecol == "year":
-        database = database.filter(year=output_timesteps)
-        to_fill = to_fill.filter(year=output_timesteps)
-    else:
-        # TODO: this filter switchup is needed because of a problem with filter.
-        #  If the pyam bug clears we can remove it.
-        output_timesteps_datetime = pd.to_datetime(output_timesteps)
-        database = database.filter(time=output_timesteps_datetime)
-        to_fill = to_fill.filter(time=output_timesteps_datetime)
+    to_fill_orig = to_fill.copy()
+    to_fill = _interpolate_onto_times(to_fill, output_timesteps)
     # Infill unavailable data
-    assert not database.data.isnull().any().any()
     assert not to_fill.data.isnull().any().any()
-    unavailable_variables = [
-        variab
-        for variab in required_variables_list
-        if variab not in database.variables().values
-    ]
     if unavailable_variables:
         warnings.warn(
             UserWarning(
@@ -182,19 +477,20 @@ def infill_all_required_variables(
                 )
             )
         )
-        # Infill the required variables with 0s.
-        kwarg_dict = {"ratio": 0, "units": "Mt CO2-equiv/yr"}
-        to_fill = _perform_crunch_and_check(
-            unavailable_variables,
+        # Infill the required variables with 0s. These are all calculated together,
+        # then we remove any which the scenarios already have.
+        filler = ConstantRatio().derive_relationship(
+            {variab: (0, "Mt CO2-equiv/yr") for variab in unavailable_variables},
             variable_leaders,
-            to_fill,
-            database,
-            ConstantRatio,
-            output_timesteps,
-            to_fill_orig,
-            check_data_returned=False,
-            **kwarg_dict,
         )
+        zeros = filler(to_fill)
+        run_var_cols = ["model", "scenario", "region", "variable"]
+        already_reported = zeros.data.set_index(run_var_cols).index.isin(
+            to_fill.data.set_index(run_var_cols).index
+        )
+        if not already_reported.all():
+            zeros.data = zeros.data.loc[~already_reported]
+            to_fill = to_fill.append(zeros)
     available_variables = [
         variab
         for variab in required_variables_list
@@ -226,6 +522,12 @@ def _perform_crunch_and_check(
     output_timesteps,
     to_fill_orig,
     check_data_returned=False,
+    compact=False,
+    n_jobs=1,
+    pool_regions=False,
+    relationship_cache=None,
+    executor=None,
+    cache=None,
     **kwargs,
 ):
     """
@@ -258,6 +560,29 @@ def _perform_crunch_and_check(
             The original, unfiltered and unaltered data input. We use this for
             performing checks.
 
+        check_data_returned : bool
+            Whether to check that all the required data has been returned
+
+        compact : bool
+            Whether the cruncher should store ``df`` in compact form
+
+        n_jobs : int
+            The number of processes to use
+
+        pool_regions : bool
+            Whether to derive the relationships from all the regions of ``df``
+            together, rather than separately for each region
+
+        relationship_cache : :obj:`RelationshipCache`
+            If supplied, derived relationships are looked up in and added to this cache
+
+        executor : :obj:`concurrent.futures.Executor`
+            If supplied, the executor which infills the variables
+
+        cache : dict
+            If supplied, the crunchers and derived relationships are kept in this
+            dictionary and reused by later calls with the same dictionary
+
         kwargs : Dict
             Any key word arguments to include in the cruncher calculation
 
@@ -266,99 +591,418 @@ def _perform_crunch_and_check(
         :obj:IamDataFrame
             The infilled dataframe
         """
-    cruncher = type_of_cruncher(df)
-    for req_var in tqdm.tqdm(required_variables, desc="Filling required variables"):
-        interpolated = _infill_variable(cruncher, req_var, leaders, to_fill, **kwargs)
-        if interpolated:
-            to_fill = to_fill.append(interpolated)
+    # The fillers only use the leaders, so these are selected once and shared by all
+    # the variables. The results are collected and only added to ``to_fill`` (and
+    # converted to an IamDataFrame) once they are all calculated, so the work for
+    # each variable does not grow with the number already infilled.
+    leader_block = to_fill.filter(variable=leaders)
+    # Index the model, scenario and region of each leader row, and the runs which
+    # already report each required variable, once so that the runs to infill for each
+    # variable can be found by an anti-join
+    run_cols = ["model", "scenario", "region"]
+    reported = to_fill.data.loc[to_fill.data["variable"].isin(required_variables)]
+    reported_runs = {
+        variable: group.set_index(run_cols).index
+        for variable, group in reported.groupby("variable")
+    }
+    leader_blocks = {}
+    for region in to_fill.regions():
+        region_block = leader_block.filter(region=region)
+        leader_blocks[region] = (
+            region_block,
+            region_block.data.set_index(run_cols).index,
+        )
+    if cache is None:
+        cache = {}
+    state = {
+        "database": df,
+        "cruncher_class": type_of_cruncher,
+        "compact": compact,
+        "crunchers": cache.setdefault("crunchers", {}),
+        "fillers": cache.setdefault("fillers", {}),
+        "relationship_cache": relationship_cache,
+        "fingerprint": cache.get("fingerprint"),
+        "leaders": leaders,
+        "kwargs": kwargs,
+    }
+    # The relationships are derived once, in this process, for each region of the
+    # database which is used (or once for all of them if they are pooled). Deriving
+    # all the relationships together lets crunchers share the work which only depends
+    # on the leaders.
+    region_fillers = {}
+    for region in leader_blocks:
+        cruncher_region = None if pool_regions else region
+        fillers_key = (cruncher_region, tuple(required_variables))
+        if fillers_key not in state["fillers"]:
+            state["fillers"][fillers_key] = _derive_fillers(
+                state, cruncher_region, required_variables
+            )
+        region_fillers[region] = state["fillers"][fillers_key]
+    # Each task infills all the variables in one region
+    tasks = [
+        (
+            leader_blocks[region],
+            [
+                (
+                    variable,
+                    region_fillers[region][variable],
+                    {variable: reported_runs[variable]}
+                    if variable in reported_runs
+                    else {},
+                )
+                for variable in required_variables
+            ],
+        )
+        for region in leader_blocks
+    ]
+    task_results = _infill_tasks(tasks, n_jobs, executor)
+    filled = [
+        task_res[i] for i in range(len(required_variables)) for task_res in task_results
+    ]
+    results = [
+        interpolated
+        for interpolated in filled
+        if interpolated is not None and not interpolated.empty
+    ]
+    if results:
+        to_fill = to_fill.append(LazyResult.concat(results).to_iamdf())
     # Optionally check we have added all the required data
     if not check_data_returned:
         return to_fill
-    for _, (model, scenario) in (
-        to_fill[["model", "scenario"]].drop_duplicates().iterrows()
-    ):
-        msdf = to_fill.filter(model=model, scenario=scenario)
-        for v in required_variables:
-            msvdf = msdf.filter(variable=v)
-            msvdf_data = msvdf.data
-            assert not msvdf_data.isnull().any().any()
-            assert not msvdf_data.empty
-            if df.time_col == "year":
-                assert all(
-                    [y in msvdf_data[df.time_col].values for y in output_timesteps]
-                ), "We do not have data for all required timesteps"
-            else:
-                output_timesteps_datetime = pd.to_datetime(output_timesteps)
-                assert all(
-                    [
-                        y in msvdf_data[df.time_col].values
-                        for y in output_timesteps_datetime.values
-                    ]
-                ), "We do not have data for all required timesteps"
-
-    # Check no data was overwritten by accident
-    for model in tqdm.tqdm(
-        to_fill_orig.models(), desc="Consistency with original model data checks"
-    ):
-        mdf = to_fill_orig.filter(model=model, variable=leaders + required_variables)
-        for scenario in mdf.scenarios():
-            msdf = mdf.filter(scenario=scenario)
-            msdf_filled = to_fill.filter(
-                model=model, scenario=scenario, variable=msdf["variable"].unique()
-            )
-
-            common_times = set(msdf_filled[msdf.time_col]).intersection(
-                msdf[msdf.time_col]
-            )
-            if common_times:
-                if msdf.time_col == "year":
-                    msdf = msdf.filter(year=list(common_times))
-                    msdf_filled = msdf_filled.filter(year=list(common_times))
-                else:
-                    msdf = msdf.filter(time=list(common_times))
-                    msdf_filled = msdf_filled.filter(time=list(common_times))
-                assert pyam.compare(msdf, msdf_filled).empty
+    report = _check_infilled_data(
+        to_fill, to_fill_orig, leaders, required_variables, output_timesteps
+    )
+    assert report["missing"].empty, (
+        "We do not have data for all required timesteps. Missing:\n"
+        "{}".format(report["missing"])
+    )
+    assert report["overwritten"].empty, (
+        "Some of the original data has been overwritten. Changed values:\n"
+        "{}".format(report["overwritten"])
+    )
     return to_fill
 
 
-def _infill_variable(cruncher_i, req_variable, leader_i, to_fill_i, **kwargs):
+def _check_infilled_data(to_fill, to_fill_orig, leaders, required_variables, times):
+    """
+    Checks the result of infilling in a single pass over all the scenarios.
+
+    Parameters
+    ----------
+    to_fill : IamDataFrame
+        The infilled data
+
+    to_fill_orig : IamDataFrame
+        The original data, before infilling
+
+    leaders : list[str]
+        The leaders used to guide the infilling
+
+    required_variables : list[str]
+        The variables which should have been infilled
+
+    times : list[int or datetime]
+        The times at which every scenario should have data for every required
+        variable
+
+    Returns
+    -------
+    dict{str: :obj:`pd.DataFrame`}
+        The failures of each check, which are all empty if the infilling succeeded:
+
+        - ``"missing"``: the model, scenario, region, variable and time of each
+          required value which is either not in ``to_fill`` or is nan
+        - ``"overwritten"``: each value of ``to_fill_orig`` (for ``leaders`` and
+          ``required_variables``) which differs from the value at the same time in
+          ``to_fill``, with both values. Only the times which both have data for the
+          same model, scenario and region are compared. A value which is only in one of them
+          at these times counts as changed, with a nan for the other.
+    """
+    time_col = to_fill.time_col
+    data = to_fill.data
+    run_cols = ["model", "scenario", "region"]
+    key_cols = run_cols + ["variable", time_col]
+
+    # Every model, scenario and region should have a value for every required
+    # variable at every time
+    runs = data[run_cols].drop_duplicates()
+    time_labels = _TimeIndex(times).labels()
+    n_per_run = len(required_variables) * len(time_labels)
+    expected = pd.DataFrame(
+        {col: np.repeat(runs[col].values, n_per_run) for col in run_cols}
+    )
+    expected["variable"] = np.tile(
+        np.repeat(required_variables, len(time_labels)), len(runs)
+    )
+    expected[time_col] = np.tile(time_labels, len(runs) * len(required_variables))
+
+    present = data.loc[
+        data["variable"].isin(required_variables) & data.notnull().all(axis=1)
+    ]
+    present_index = present.set_index(key_cols).index
+    missing = expected.loc[~expected.set_index(key_cols).index.isin(present_index)]
+
+    # The original values of the leaders and required variables must be unchanged
+    orig = to_fill_orig.data
+    orig = orig.loc[orig["variable"].isin(leaders + required_variables)]
+    filled = data.merge(orig[run_cols + ["variable"]].drop_duplicates())
+    common_times = (
+        orig[run_cols + [time_col]]
+        .drop_duplicates()
+        .merge(filled[run_cols + [time_col]].drop_duplicates())
+    )
+    value_key_cols = [c for c in orig.columns if c != "value"]
+    compared = orig.merge(common_times).merge(
+        filled.merge(common_times),
+        on=value_key_cols,
+        how="outer",
+        suffixes=("_original", "_infilled"),
+    )
+    changed = ~np.isclose(compared["value_original"], compared["value_infilled"])
+    overwritten = compared.loc[changed]
+
+    return {
+        "missing": missing.reset_index(drop=True),
+        "overwritten": overwritten.reset_index(drop=True),
+    }
+
+
+def _infill_variable(filler, req_variable, to_fill_i, to_fill_runs, reported_runs):
     """
     A function used to iterate the actual crunching if the data doesn't already
     exist.
     Parameters
     ----------
-    cruncher_i : :obj: silicone cruncher
-        the initiated silicone cruncher to use for the infilling
+    filler : :obj:`func`
+        The filler function derived by a silicone cruncher for ``req_variable``
 
     req_variable : str
         The follower variable to infill.
 
-    leader_i : list[str]
-        The leader variable to guide the infilling.
-
     to_fill_i : IamDataFrame
-        The dataframe to infill.
+        The dataframe to infill, which must contain the leader timeseries. It is not
+        modified.
 
-    kwargs : Dict
-        Any key word arguments to include in the cruncher calculation
+    to_fill_runs : :obj:`pd.MultiIndex`
+        The model and scenario of each row of ``to_fill_i.data``
+
+    reported_runs : dict{str: :obj:`pd.MultiIndex`}
+        The models and scenarios which already report each variable. Scenarios
+        which already report ``req_variable`` are not infilled.
 
     Returns
     -------
-    :obj:IamDataFrame
+    :obj:`LazyResult`
         The infilled component of the dataframe (or None if no infilling done)
     """
-    filler = cruncher_i.derive_relationship(req_variable, leader_i, **kwargs)
     # only fill for scenarios who don't have that variable
     # quieten logging about empty data frame as it doesn't matter here
     logging.getLogger("pyam.core").setLevel(logging.CRITICAL)
-    not_to_fill = to_fill_i.filter(variable=req_variable)
-
-    to_fill_var = to_fill_i.copy()
-    if not not_to_fill.data.empty:
-        for (model, scenario), _ in not_to_fill.data.groupby(["model", "scenario"]):
-            to_fill_var = to_fill_var.filter(model=model, scenario=scenario, keep=False)
+    to_fill_var = to_fill_i
+    if req_variable in reported_runs:
+        already_reported = to_fill_runs.isin(reported_runs[req_variable])
+        if already_reported.any():
+            to_fill_var = to_fill_i.copy()
+            to_fill_var.data = to_fill_var.data.loc[~already_reported]
     if not to_fill_var.data.empty:
-        interpolated = filler(to_fill_var)
+        interpolated = filler(to_fill_var, lazy=True)
         return interpolated
     logging.getLogger("pyam.core").setLevel(logging.WARNING)
     return None
+
+
+def _derive_fillers(state, cruncher_region, variables):
+    """
+    Derives the fillers of ``variables`` from ``cruncher_region`` of the database (or
+    all of it if ``cruncher_region`` is ``None``).
+
+    Fillers already in ``state["relationship_cache"]`` are taken from it, and only the
+    others are derived (all together) and added to it. The cruncher is only created
+    if some fillers need to be derived.
+
+    Returns
+    -------
+    dict{str: :obj:`func`}
+        The filler of each of ``variables``
+    """
+    relationship_cache = state["relationship_cache"]
+    fillers = {}
+    if relationship_cache is not None:
+        cache_keys = {
+            variable: (
+                state["fingerprint"],
+                state["cruncher_class"],
+                state["compact"],
+                cruncher_region,
+                variable,
+                tuple(state["leaders"]),
+                _freeze(state["kwargs"]),
+            )
+            for variable in variables
+        }
+        for variable in variables:
+            filler = relationship_cache.get(cache_keys[variable])
+            if filler is not None:
+                fillers[variable] = filler
+    missing = [variable for variable in variables if variable not in fillers]
+    if not missing:
+        return fillers
+    crunchers = state["crunchers"]
+    if cruncher_region not in crunchers:
+        database = state["database"]
+        # Filtering copies the database, so is skipped if it has no other regions
+        other_regions = set(database.regions()) - {cruncher_region}
+        if cruncher_region is not None and other_regions:
+            database = database.filter(region=cruncher_region)
+        crunchers[cruncher_region] = _make_cruncher(
+            state["cruncher_class"], database, state["compact"]
+        )
+    derived = crunchers[cruncher_region].derive_relationships(
+        missing, state["leaders"], **state["kwargs"]
+    )
+    if relationship_cache is not None:
+        for variable in missing:
+            relationship_cache.put(cache_keys[variable], derived[variable])
+    fillers.update(derived)
+    return fillers
+
+
+def _freeze(value):
+    """
+    Converts ``value`` (e.g. the keyword arguments of a cruncher) into a hashable
+    equivalent, for use in the keys of a :obj:`RelationshipCache`.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(val)) for key, val in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(val) for val in value)
+    if isinstance(value, np.ndarray):
+        return (value.dtype.str, value.shape, value.tobytes())
+    return value
+
+
+def _infill_tasks(tasks, n_jobs=1, executor=None):
+    """
+    Runs :func:`_infill_region_task` for each of ``tasks``, with ``executor`` if
+    supplied or otherwise a pool of ``n_jobs`` processes if ``n_jobs > 1``.
+
+    Filler functions are closures, so cannot be sent to other processes. Instead, the
+    tables of each filler are sent, from which it is rebuilt (see
+    :func:`_filler_from_tables`), so the database is never sent. The variables of each
+    task are split into one batch for each worker of the executor (or ``n_jobs``
+    batches if its number of workers is not known), so the leader data of each region
+    is sent to each worker about once, rather than once for each variable. Variables
+    whose fillers cannot be rebuilt from tables are infilled in this process, with a
+    warning. The results are the same as running the tasks one after another.
+
+    Parameters
+    ----------
+    tasks : list[tuple]
+        The leader data of each region, with the model, scenario and region of each
+        of its rows, and the variables to infill in it, each with its filler and the
+        runs which already report it (see :func:`_infill_variable`)
+
+    n_jobs : int
+        The number of processes to use if ``executor`` is not supplied
+
+    executor : :obj:`concurrent.futures.Executor`
+        If supplied, the executor which infills the variables
+
+    Returns
+    -------
+    list[list[:obj:`LazyResult`]]
+        The result of each variable of each task
+    """
+    n_variables = sum(len(variables) for _, variables in tasks)
+    if executor is None and n_jobs > 1:
+        with concurrent.futures.ProcessPoolExecutor(min(n_jobs, n_variables)) as pool:
+            return _infill_tasks(tasks, n_jobs, executor=pool)
+
+    batches = []
+    local = []
+    for i, (_, variables) in enumerate(tasks):
+        remote = []
+        for j, (_, filler, _) in enumerate(variables):
+            if executor is not None and getattr(filler, "tables", None) is not None:
+                remote.append(j)
+            else:
+                local.append((i, j))
+        n_batches = min(getattr(executor, "_max_workers", n_jobs), len(remote))
+        batches.extend(
+            (i, batch.tolist())
+            for batch in np.array_split(remote, n_batches or 1)
+            if len(batch)
+        )
+    if executor is not None and local:
+        warnings.warn(
+            "The fillers of {} cannot be sent to other processes, so these variables "
+            "are infilled in this process".format(
+                sorted({tasks[i][1][j][0] for i, j in local})
+            )
+        )
+
+    results = [[None] * len(variables) for _, variables in tasks]
+    with tqdm.tqdm(total=n_variables, desc="Filling required variables") as progress:
+        # The batches are submitted first, so that the workers run while the other
+        # variables are infilled here
+        remote_results = []
+        if batches:
+            remote_results = executor.map(
+                _infill_region_task,
+                [_with_filler_tables(tasks[i], batch) for i, batch in batches],
+            )
+        for i, j in local:
+            leader_block, variables = tasks[i]
+            results[i][j] = _infill_region_task((leader_block, [variables[j]]))[0]
+            progress.update()
+        for (i, batch), batch_results in zip(batches, remote_results):
+            for j, res in zip(batch, batch_results):
+                results[i][j] = res
+            progress.update(len(batch))
+
+    return results
+
+
+def _with_filler_tables(task, batch):
+    """
+    Selects the variables at positions ``batch`` of ``task``, with their fillers
+    replaced by their tables, so that they can be sent to another process.
+    """
+    leader_block, variables = task
+    return (
+        leader_block,
+        [
+            (variable, filler.tables, reported_runs)
+            for variable, filler, reported_runs in (variables[j] for j in batch)
+        ],
+    )
+
+
+def _infill_region_task(task):
+    """
+    Infills some variables in one region of the data to infill.
+
+    Parameters
+    ----------
+    task : tuple
+        The leader data of the region, with the model, scenario and region of each of
+        its rows, and the variables to infill, each with its filler (or the tables
+        from which to rebuild it) and the runs which already report it (see
+        :func:`_infill_variable`)
+
+    Returns
+    -------
+    list[:obj:`LazyResult`]
+        The result of :func:`_infill_variable` for each variable
+    """
+    (to_fill_i, to_fill_runs), variables = task
+    return [
+        _infill_variable(
+            filler if callable(filler) else _filler_from_tables(filler),
+            variable,
+            to_fill_i,
+            to_fill_runs,
+            reported_runs,
+        )
+        for variable, filler, reported_runs in variables
+    ]
@@ -0,0 +1,341 @@
+"""
+Compiles the relationships used by
+:func:`silicone.multiple_infillers.infill_all_required_variables` into a plan which
+can infill scenarios without the database.
+"""
+import numpy as np
+
+from silicone.database_crunchers import QuantileRollingWindows
+from silicone.database_crunchers.relationship_tables import (
+    _filler_from_tables,
+    _save_arrays,
+    _tables_from_arrays,
+    _tables_to_arrays,
+)
+from silicone.multiple_infillers.infill_all_required_emissions_for_openscm import (
+    _get_default_arguments,
+    _infill_required_variables,
+    _make_cruncher,
+)
+from silicone.utils import _interpolate_onto_times, _TimeIndex
+
+
+def compile_infilling_plan(
+    database,
+    variable_leaders,
+    required_variables_list=None,
+    cruncher=QuantileRollingWindows,
+    output_timesteps=None,
+    compact=False,
+    pool_regions=False,
+    **kwargs,
+):
+    """
+    Derives all the relationships which :func:`infill_all_required_variables` would
+    use with these arguments and compiles them into an :class:`InfillingPlan`.
+
+    The plan holds only the arrays which determine the relationships (e.g. the
+    quantiles at each time, or the ratios), so can be saved, loaded and used to
+    infill scenarios without the database. Only crunchers whose fillers can be
+    rebuilt from these arrays (:class:`LinearInterpolation`,
+    :class:`QuantileRollingWindows`, :class:`ScenarioAndModelSpecificInterpolate` and
+    :class:`TimeDepRatio`) can be compiled.
+
+    Parameters
+    ----------
+    database : :obj:`pyam.IamDataFrame`
+        The dataframe containing all information to be used in the infilling process.
+        This is not modified.
+
+    variable_leaders : list[str]
+        The name of the variable(s) which will be used to determine the values of
+        the other variables.
+
+    required_variables_list : list[str]
+        The list of variables to infill. The default (None) is the complete list of
+        required emissions.
+
+    cruncher : :class:
+        The class of cruncher to use to derive the relationships.
+
+    output_timesteps : list[int or datetime]
+        List of times at which the plan returns infilled values.
+
+    compact : bool
+        If true, the cruncher stores the database in compact form while the
+        relationships are derived.
+
+    pool_regions : bool
+        If false, separate relationships are derived for each region of
+        ``database``, and each region of the scenarios is infilled using those of the
+        same region. If true, the relationships are derived from all the regions
+        together, and used for all regions.
+
+    ** kwargs :
+        An optional dictionary of keyword : arguments to be used with the cruncher.
+
+    Returns
+    -------
+    :obj:`InfillingPlan`
+        The plan
+
+    Raises
+    ------
+    ValueError
+        The relationships derived by ``cruncher`` cannot be compiled.
+    """
+    output_timesteps, required_variables_list = _get_default_arguments(
+        database.time_col, output_timesteps, required_variables_list
+    )
+    database = database.copy()
+    database.data[database.extra_cols] = database.data[database.extra_cols].fillna(0)
+    database = _interpolate_onto_times(database, output_timesteps)
+    unavailable_variables = [
+        variab
+        for variab in required_variables_list
+        if variab not in database.variables().values
+    ]
+    available_variables = [
+        variab
+        for variab in required_variables_list
+        if variab not in unavailable_variables
+    ]
+    regions = [None] if pool_regions else database.regions().tolist()
+    fillers = {}
+    for region in regions:
+        region_db = database if region is None else database.filter(region=region)
+        fillers[region] = {}
+        if not available_variables:
+            continue
+        fillers[region] = _make_cruncher(
+            cruncher, region_db, compact
+        ).derive_relationships(available_variables, variable_leaders, **kwargs)
+        if any(
+            getattr(filler, "tables", None) is None
+            for filler in fillers[region].values()
+        ):
+            raise ValueError(
+                "The relationships derived by `{}` cannot be compiled into an "
+                "infilling plan".format(cruncher.__name__)
+            )
+
+    return InfillingPlan(
+        variable_leaders,
+        required_variables_list,
+        unavailable_variables,
+        output_timesteps,
+        database.time_col,
+        fillers,
+    )
+
+
+class InfillingPlan:
+    """
+    The relationships needed to infill scenarios in the same way as
+    :func:`infill_all_required_variables`, held without the database they were
+    derived from.
+
+    Plans are created with :func:`compile_infilling_plan`, and can be saved to a
+    single ``.npz`` file with :meth:`save` and loaded with :meth:`load`. Loading a
+    plan only reads the arrays which determine its relationships, so is much quicker
+    than loading the database and deriving them again.
+    """
+
+    def __init__(
+        self,
+        variable_leaders,
+        required_variables,
+        unavailable_variables,
+        output_timesteps,
+        time_col,
+        fillers,
+    ):
+        """
+        Initialise the plan
+
+        Parameters
+        ----------
+        variable_leaders : list[str]
+            The variable(s) used to determine the values of the other variables
+
+        required_variables : list[str]
+            The variables to infill
+
+        unavailable_variables : list[str]
+            The required variables which the database had no data for, which are
+            infilled with zeros
+
+        output_timesteps : list[int or datetime]
+            The times at which infilled values are returned
+
+        time_col : str
+            The time column of the data the plan can infill
+
+        fillers : dict{str: dict{str: :obj:`func`}}
+            The filler function of each of the other required variables in each
+            region. If the relationships are used for all regions, this has a single
+            entry, with key ``None``.
+        """
+        self.variable_leaders = list(variable_leaders)
+        self.required_variables = list(required_variables)
+        self.unavailable_variables = list(unavailable_variables)
+        self.output_timesteps = _TimeIndex(output_timesteps).labels()
+        self.time_col = time_col
+        self._fillers = fillers
+
+    @property
+    def pool_regions(self):
+        """
+        bool: Whether the same relationships are used for all regions
+        """
+        return None in self._fillers
+
+    @property
+    def regions(self):
+        """
+        list[str]: The regions which the plan can infill, empty if it can infill
+        any region (see :attr:`pool_regions`)
+        """
+        return [region for region in self._fillers if region is not None]
+
+    def infill(
+        self,
+        to_fill,
+        infilled_data_prefix=None,
+        to_fill_old_prefix=None,
+        check_data_returned=False,
+    ):
+        """
+        Infill scenarios
+
+        The result is the same as that of :func:`infill_all_required_variables` with
+        the arguments the plan was compiled with.
+
+        Parameters
+        ----------
+        to_fill : :obj:`pyam.IamDataFrame`
+            The dataframe which is to be infilled
+
+        infilled_data_prefix : str
+            A string that should be prefixed on all the variable names of the results
+            returned.
+
+        to_fill_old_prefix : str
+            Any string already found at the beginning of the variables names of
+            ``to_fill``, which will be removed.
+
+        check_data_returned : bool
+            If true, we perform checks that all desired data has been returned.
+
+        Returns
+        -------
+        :obj:`pyam.IamDataFrame`
+            The infilled dataframe (including input data) at the plan's
+            ``output_timesteps``.
+        """
+        assert to_fill.time_col == self.time_col
+        if not self.pool_regions:
+            assert set(to_fill.regions()) <= set(
+                self.regions
+            ), "The cruncher data and the infilled data have different regions."
+        available_variables = tuple(self._available_variables())
+        # The fillers are given in the format in which derived fillers are cached, so
+        # none are derived
+        cache = {
+            "fillers": {
+                (region, available_variables): fillers
+                for region, fillers in self._fillers.items()
+            }
+        }
+        return _infill_required_variables(
+            to_fill,
+            self.variable_leaders,
+            self.required_variables,
+            self.unavailable_variables,
+            self.output_timesteps,
+            infilled_data_prefix,
+            to_fill_old_prefix,
+            check_data_returned,
+            pool_regions=self.pool_regions,
+            cache=cache,
+        )
+
+    def save(self, path):
+        """
+        Save the plan
+
+        Parameters
+        ----------
+        path : str
+            The ``.npz`` file to save the plan to. Any existing file is replaced.
+        """
+        arrays = {
+            "variable_leaders": np.asarray(self.variable_leaders, dtype=str),
+            "required_variables": np.asarray(self.required_variables, dtype=str),
+            "unavailable_variables": np.asarray(self.unavailable_variables, dtype=str),
+            "output_timesteps": np.asarray(_TimeIndex(self.output_timesteps).times),
+            "time_col": np.asarray(self.time_col),
+            "pool_regions": np.asarray(self.pool_regions),
+            "regions": np.asarray(self.regions, dtype=str),
+        }
+        for i, fillers in enumerate(self._fillers.values()):
+            for j, variable in enumerate(self._available_variables()):
+                arrays.update(
+                    _tables_to_arrays(
+                        fillers[variable].tables, prefix="{}/{}/".format(i, j)
+                    )
+                )
+        _save_arrays(path, arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a plan saved with :meth:`save`
+
+        Parameters
+        ----------
+        path : str
+            The file the plan was saved to
+
+        Returns
+        -------
+        :obj:`InfillingPlan`
+            The plan
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            # Reading the arrays from the file once is quicker than looking each up
+            arrays = {key: arrays[key] for key in arrays.files}
+        required_variables = arrays["required_variables"].tolist()
+        unavailable_variables = arrays["unavailable_variables"].tolist()
+        available_variables = [
+            variab
+            for variab in required_variables
+            if variab not in unavailable_variables
+        ]
+        regions = (
+            [None] if arrays["pool_regions"].item() else arrays["regions"].tolist()
+        )
+        fillers = {
+            region: {
+                variable: _filler_from_tables(
+                    _tables_from_arrays(arrays, prefix="{}/{}/".format(i, j))
+                )
+                for j, variable in enumerate(available_variables)
+            }
+            for i, region in enumerate(regions)
+        }
+        return cls(
+            arrays["variable_leaders"].tolist(),
+            required_variables,
+            unavailable_variables,
+            arrays["output_timesteps"],
+            arrays["time_col"].item(),
+            fillers,
+        )
+
+    def _available_variables(self):
+        return [
+            variab
+            for variab in self.required_variables
+            if variab not in self.unavailable_variables
+        ]
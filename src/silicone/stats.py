@@ -5,7 +5,6 @@ import os
 
 import numpy as np
 import pandas as pd
-import scipy.interpolate
 
 
 def rolling_window_find_quantiles(
@@ -62,15 +61,38 @@ def rolling_window_find_quantiles(
     if isinstance(quantiles, (float, np.float64)):
         quantiles = [quantiles]
 
+    xs = np.asarray(xs)
+    ys = np.asarray(ys)
     # min(xs) == max(xs) cannot be accessed via QRW cruncher, as a short-circuit appears
     # earlier in the code.
+    if np.equal(max(xs), min(xs)) and np.equal(max(ys), min(ys)):
+        return pd.DataFrame(index=np.array([xs[0]]), columns=quantiles, data=ys[0])
+
+    window_centers, weights = _rolling_window_weights(xs, nwindows, decay_length_factor)
+    return _rolling_window_quantiles_from_weights(
+        xs, ys, window_centers, weights, quantiles
+    )
+
+
+def _rolling_window_weights(xs, nwindows, decay_length_factor):
+    """
+    Calculates the window centres used by :func:`rolling_window_find_quantiles` and
+    the normalised weight of each point in each window. These only depend on the x
+    co-ordinates, so can be shared by several sets of y co-ordinates.
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        The window centres and the weights, with a row per window and a column per
+        element of ``xs``.
+    """
+    # The weights are always calculated in double precision, even for ``float32``
+    # co-ordinates
+    xs = np.asarray(xs, dtype=float)
     if np.equal(max(xs), min(xs)):
         # We must prevent singularity behaviour if all the points have the same x.
         window_centers = np.array([xs[0]])
         decay_length = 1
-        if np.equal(max(ys), min(ys)):
-            return pd.DataFrame(index=window_centers, columns=quantiles, data=ys[0])
-
     else:
         # We want to include the max x point, but not any point above it.
         # The 0.99 factor prevents rounding error inclusion.
@@ -78,25 +100,32 @@ def rolling_window_find_quantiles(
         decay_length = step / 2 * decay_length_factor
         window_centers = np.arange(min(xs), max(xs) + step * 0.99, step)
 
-    ys, xs = map(np.array, zip(*sorted(zip(ys, xs))))
+    weights = 1.0 / (
+        1.0 + ((xs[np.newaxis, :] - window_centers[:, np.newaxis]) / decay_length) ** 2
+    )
+    weights /= weights.sum(axis=1, keepdims=True)
+    return window_centers, weights
+
+
+def _rolling_window_quantiles_from_weights(xs, ys, window_centers, weights, quantiles):
+    """
+    Calculates the quantiles of :func:`rolling_window_find_quantiles` from the weights
+    calculated by :func:`_rolling_window_weights`.
+    """
+    # Sort by y, then x
+    order = np.lexsort((xs, ys))
+    ys = ys[order]
+    weights = weights[:, order]
+    # We want to calculate the weights at the midpoint of step
+    # corresponding to the y-value.
+    cumsum_weights = np.cumsum(weights, axis=1, dtype=float) - 0.5 * weights
 
     results = pd.DataFrame(index=window_centers, columns=quantiles)
     results.columns.name = "window_centers"
-
-    for window_center in window_centers:
-        weights = 1.0 / (1.0 + ((xs - window_center) / decay_length) ** 2)
-        weights /= sum(weights)
-
-        # We want to calculate the weights at the midpoint of step
-        # corresponding to the y-value.
-        cumsum_weights = np.cumsum(weights) - 0.5 * weights
-        results.loc[window_center, quantiles] = scipy.interpolate.interp1d(
-            cumsum_weights,
-            ys,
-            bounds_error=False,
-            fill_value=(ys[0], ys[-1]),
-            assume_sorted=True,
-        )(quantiles)
+    for window_center, window_cumsum_weights in zip(window_centers, cumsum_weights):
+        results.loc[window_center, quantiles] = np.interp(
+            quantiles, window_cumsum_weights, ys
+        )
 
     return results
 
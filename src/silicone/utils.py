@@ -217,6 +217,320 @@ def _make_interpolator(variable_follower, variable_leader, wide_db, time_col):
     return derived_relationships
 
 
+def _make_interpolation_table_from_arrays(xs, ys, time_codes, n_times):
+    """
+    Constructs the breakpoints of a linear interpolator of the follower as a function
+    of (one) leader for every timestep, packed into ragged arrays so that all
+    timesteps can be evaluated in a single pass by :func:`_interpolate_from_table`.
+    The inputs are matching arrays of leader values, follower values and the integer
+    index of the timestep of each pair, where there are ``n_times`` timesteps. As in
+    :func:`_make_interpolator`, duplicate leader values are replaced by the average
+    of their follower values.
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray, np.ndarray)
+        The sorted leader breakpoints, the matching follower values and the offsets
+        such that the breakpoints of the ith timestep are
+        ``xs[offsets[i]:offsets[i + 1]]``.
+    """
+    order = np.lexsort((xs, time_codes))
+    time_codes, xs, ys = time_codes[order], xs[order], ys[order]
+    # Average the follower values wherever a leader value is repeated within a time
+    starts = np.flatnonzero(
+        np.concatenate(
+            ([True], (time_codes[1:] != time_codes[:-1]) | (xs[1:] != xs[:-1]))
+        )
+    )
+    counts = np.diff(np.append(starts, len(xs)))
+    ys = np.add.reduceat(ys, starts) / counts
+    xs = xs[starts]
+    offsets = np.searchsorted(time_codes[starts], np.arange(n_times + 1))
+    return xs, ys, offsets
+
+
+def _interpolate_from_table(xs, ys, offsets, time_inds, values):
+    """
+    Evaluates the ragged linear interpolators made by
+    :func:`_make_interpolation_table_from_arrays` in a single vectorised pass.
+
+    Each value is interpolated using the breakpoints of the timestep given by the
+    matching entry of ``time_inds`` (which is broadcast against ``values``). The result
+    is identical to calling :func:`np.interp` separately for each timestep, i.e. the
+    interpolation is held constant beyond the bounds of the data and nans propagate.
+
+    Returns
+    -------
+    np.ndarray
+        The interpolated values, with the same shape as ``values``.
+    """
+    values = np.asarray(values, dtype=float)
+    shape = values.shape
+    values = values.ravel()
+    time_inds = np.broadcast_to(time_inds, shape).ravel()
+    # Sort breakpoints and values together by (timestep, value), placing breakpoints
+    # first on ties, so that we can count the breakpoints at or below each value.
+    n_points = len(xs)
+    point_times = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    is_value = np.concatenate((np.zeros(n_points, bool), np.ones(len(values), bool)))
+    order = np.lexsort(
+        (
+            is_value,
+            np.concatenate((xs, values)),
+            np.concatenate((point_times, time_inds)),
+        )
+    )
+    n_points_below = np.cumsum(~is_value[order])
+    value_order = order[is_value[order]]
+    upper = np.empty(len(values), dtype=int)
+    upper[value_order - n_points] = n_points_below[is_value[order]]
+
+    start = offsets[time_inds]
+    end = offsets[time_inds + 1] - 1
+    lower = np.clip(upper - 1, start, np.maximum(end - 1, start))
+    upper = np.minimum(lower + 1, end)
+    x_lo, x_hi = xs[lower], xs[upper]
+    y_lo, y_hi = ys[lower], ys[upper]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interpolated = (y_hi - y_lo) / (x_hi - x_lo) * (values - x_lo) + y_lo
+    interpolated = np.where(values == x_lo, y_lo, interpolated)
+    interpolated = np.where(values < xs[start], ys[start], interpolated)
+    interpolated = np.where(values >= xs[end], ys[end], interpolated)
+    interpolated[np.isnan(values)] = np.nan
+    return interpolated.reshape(shape)
+
+
+def _interpolate_time_values(values, times, new_times):
+    """
+    Linearly interpolates each row of ``values`` onto ``new_times``.
+
+    This follows the interpolation done by :meth:`pyam.IamDataFrame.interpolate`: nans
+    are ignored, known values are returned unchanged and there is no extrapolation,
+    i.e. times which are not between two known values of a row are nan.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Array of values with a row per timeseries and a column per time.
+
+    times : list-like
+        The (sorted) times of the columns of ``values``. These may be years or
+        datetimes.
+
+    new_times : list-like
+        The times at which we want values.
+
+    Returns
+    -------
+    np.ndarray
+        Array of values with a row per timeseries and a column per time in
+        ``new_times``.
+    """
+    values = np.asarray(values, dtype=float)
+    times = _times_as_numbers(times)
+    new_times = _times_as_numbers(new_times)
+    n_times = len(times)
+    cols = np.arange(n_times)
+    valid = ~np.isnan(values)
+    # The last valid column at or before, and first valid column at or after, each time
+    last_valid = np.maximum.accumulate(np.where(valid, cols, -1), axis=1)
+    next_valid = np.minimum.accumulate(np.where(valid, cols, n_times)[:, ::-1], axis=1)
+    next_valid = next_valid[:, ::-1]
+    last_valid = np.concatenate((np.full((len(values), 1), -1), last_valid), axis=1)
+    next_valid = np.concatenate(
+        (next_valid, np.full((len(values), 1), n_times)), axis=1
+    )
+    prev = last_valid[:, np.searchsorted(times, new_times, side="left")]
+    nxt = next_valid[:, np.searchsorted(times, new_times, side="right")]
+    has_both = (prev >= 0) & (nxt < n_times)
+    prev = np.where(has_both, prev, 0)
+    nxt = np.where(has_both, nxt, 0)
+    rows = np.arange(len(values))[:, np.newaxis]
+    with np.errstate(invalid="ignore"):
+        interpolated = (
+            (times[nxt] - new_times) * values[rows, prev]
+            + (new_times - times[prev]) * values[rows, nxt]
+        ) / (times[nxt] - times[prev])
+    interpolated[~has_both] = np.nan
+
+    # Use known values where they exist
+    exact = np.searchsorted(times, new_times).clip(max=max(n_times - 1, 0))
+    is_known = (times[exact] == new_times) & valid[:, exact]
+    return np.where(is_known, values[:, exact], interpolated)
+
+
+def _times_as_numbers(times):
+    """
+    Converts years or datetimes to an array of numbers which can be used in arithmetic
+    """
+    times = pd.Index(np.atleast_1d(times))
+    if isinstance(times, pd.DatetimeIndex) or times.dtype == object:
+        times = pd.to_datetime(times).asi8
+    return np.asarray(times, dtype=float)
+
+
+class _TimeIndex:
+    """
+    Integer index of a time axis of either years or datetimes.
+
+    Times can be given in any of the styles used by pyam, pandas and numpy (e.g.
+    ``int`` or ``np.int64`` years, :obj:`datetime.datetime`, :obj:`np.datetime64` or
+    :obj:`pd.Timestamp`) and are mapped to their position in the index, so code using
+    it does not need separate paths for year and datetime data. Times are only
+    converted back to the labels which pyam expects for output, by :meth:`labels`.
+    """
+
+    def __init__(self, times):
+        """
+        Initialise the index
+
+        Parameters
+        ----------
+        times : list-like
+            The times in the index, in any style. Duplicates are dropped and the
+            times are sorted.
+        """
+        self.times = _normalise_times(times).unique().sort_values()
+        self.is_datetime = isinstance(self.times, pd.DatetimeIndex)
+
+    def __len__(self):
+        return len(self.times)
+
+    def get_indexer(self, times):
+        """
+        Get the positions of some times in the index
+
+        Parameters
+        ----------
+        times : list-like
+            The times of interest, in any style
+
+        Returns
+        -------
+        np.ndarray
+            The position of each entry of ``times`` in the index (-1 if it is not in
+            the index)
+        """
+        return self.times.get_indexer(_normalise_times(times))
+
+    def labels(self, positions=None):
+        """
+        Get the labels of times in the style used by pyam
+
+        Parameters
+        ----------
+        positions : list-like of int
+            The positions of the times of interest. If not supplied, the labels of
+            all the times are returned.
+
+        Returns
+        -------
+        list
+            The times, as ``int`` years or :obj:`datetime.datetime`
+        """
+        times = self.times if positions is None else self.times[positions]
+        if self.is_datetime:
+            return list(times.to_pydatetime())
+        return [int(t) for t in times]
+
+
+def _normalise_times(times):
+    """
+    Converts years or datetimes in any style to a :obj:`pd.Index` of ``int64`` or
+    ``datetime64`` values.
+    """
+    times = pd.Index(np.atleast_1d(np.asarray(times)))
+    if times.dtype == object:
+        times = pd.to_datetime(times)
+    return times
+
+
+def _filter_times(df, times):
+    """
+    Filters a :obj:`pyam.IamDataFrame` for ``times``, which may be given in any style
+    (see :class:`_TimeIndex`).
+    """
+    return df.filter(**{df.time_col: _TimeIndex(times).labels()})
+
+
+def _interpolate_onto_times(df, times):
+    """
+    Linearly interpolates every timeseries in a :obj:`pyam.IamDataFrame` onto
+    ``times`` (see :func:`_interpolate_time_values`) in a single array operation.
+
+    Known values are unchanged, there is no extrapolation and all other times are
+    dropped, so the result only contains data at ``times`` which lie between two known
+    values of a timeseries (or at which it was already known).
+
+    Parameters
+    ----------
+    df : :obj:`pyam.IamDataFrame`
+        The data to interpolate
+
+    times : list-like
+        The times (in any style, see :class:`_TimeIndex`) onto which to interpolate
+
+    Returns
+    -------
+    :obj:`pyam.IamDataFrame`
+        The interpolated data
+    """
+    if df.data.empty:
+        return _filter_times(df, times)
+    ts = df.timeseries()
+    labels = _TimeIndex(times).labels()
+    wide = pd.DataFrame(
+        _interpolate_time_values(ts.values, ts.columns, labels),
+        index=ts.index,
+        columns=pd.Index(labels, name=df.time_col),
+    )
+    data = wide.stack().rename("value").reset_index()
+    ret = pyam.IamDataFrame(data[df.data.columns])
+    ret.meta = df.meta.loc[ret.meta.index]
+    return ret
+
+
+def _get_time_indices(known_times, times):
+    """
+    Gets the indices of ``times`` in ``known_times``, the times for which a filler has
+    a relationship, raising a ``ValueError`` if any of them are missing.
+
+    Parameters
+    ----------
+    known_times : :obj:`pd.Index`
+        The times at which a relationship is known.
+
+    times : list-like
+        The times of interest, in the same style (years or datetimes) as
+        ``known_times``.
+
+    Returns
+    -------
+    np.ndarray
+        The index in ``known_times`` of each entry of ``times``.
+    """
+    inds = known_times.get_indexer(_normalise_times(times))
+    if (inds == -1).any():
+        raise ValueError(
+            "Not all required timepoints are present in the database we "
+            "crunched, we crunched \n\t`{}`\nbut you passed in \n\t{}".format(
+                known_times.tolist(), list(times)
+            )
+        )
+    return inds
+
+
+def _write_output(values, out=None):
+    """
+    Writes ``values`` into the array ``out``, if it is supplied, and returns the array
+    holding the values. This is used by the ``fill_array`` methods of fillers.
+    """
+    if out is None:
+        return values
+    out[...] = values
+    return out
+
+
 def _make_wide_db(use_db):
     """
     Converts an IamDataFrame into a pandas DataFrame that describes the timeseries
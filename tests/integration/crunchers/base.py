@@ -2,9 +2,21 @@ import datetime as dt
 import re
 from abc import ABCMeta, abstractmethod
 
+import numpy as np
+import pandas as pd
 import pytest
 from pyam import IamDataFrame
 
+from silicone.database_crunchers import (
+    LazyResult,
+    load_database_store,
+    save_database_store,
+)
+from silicone.database_crunchers.relationship_tables import (
+    _filler_from_tables,
+    _load_tables,
+    _save_tables,
+)
 from silicone.utils import _adjust_time_style_to_match
 
 
@@ -58,3 +70,126 @@ class _DataBaseCruncherTester(metaclass=ABCMeta):
         )
         with pytest.raises(ValueError, match=error_msg):
             filler(test_downscale_df)
+        with pytest.raises(ValueError, match=error_msg):
+            filler.trusted(test_downscale_df)
+
+    @pytest.fixture
+    def shared_setup(self, test_db):
+        """
+        A cruncher sharing ``test_db``, with the first variable of ``test_db`` as the
+        leader, the others as followers and the leader data to infill
+        """
+        variables = test_db.variables().tolist()
+        leaders = variables[:1]
+        followers = variables[1:]
+        to_fill = test_db.filter(variable=leaders)
+        return self.tclass(test_db, copy=False), leaders, followers, to_fill
+
+    def test_shared_database(self, test_db, shared_setup):
+        tcruncher, leaders, followers, to_fill = shared_setup
+        other_cruncher = self.tclass(test_db, copy=False)
+
+        # The array representation of the database is built once and shared
+        assert tcruncher._get_cube() is other_cruncher._get_cube()
+        assert not tcruncher._get_cube().values.flags.writeable
+        res = tcruncher.derive_relationship(followers[0], leaders)(to_fill)
+        exp = self.tclass(test_db).derive_relationship(followers[0], leaders)(to_fill)
+        pd.testing.assert_frame_equal(res.data, exp.data)
+
+    @pytest.mark.parametrize("column", ["value", "unit", "region", "rows"])
+    def test_shared_database_modified(self, test_db, shared_setup, column):
+        tcruncher, leaders, followers, _ = shared_setup
+
+        # Changes to the labels must be detected as well as changes to the values
+        if column == "value":
+            test_db.data = test_db.data.assign(value=test_db.data["value"] * 2)
+        elif column == "rows":
+            test_db.filter(variable=followers[0], keep=False, inplace=True)
+        else:
+            test_db.data = test_db.data.replace({column: {test_db[column][0]: "x"}})
+        error_msg = re.escape(
+            "The database has been modified since the cruncher was created. "
+            "Databases used by crunchers created with `copy=False` must not be "
+            "modified."
+        )
+        with pytest.raises(ValueError, match=error_msg):
+            tcruncher.derive_relationship(followers[0], leaders)
+
+    def test_derive_relationships(self, shared_setup):
+        tcruncher, leaders, followers, to_fill = shared_setup
+        fillers = tcruncher.derive_relationships(followers, leaders)
+        assert list(fillers.keys()) == followers
+        for follower in followers:
+            exp = tcruncher.derive_relationship(follower, leaders)(to_fill)
+            res = fillers[follower](to_fill)
+            pd.testing.assert_frame_equal(res.data, exp.data)
+
+    def test_fill_array(self, shared_setup):
+        tcruncher, leaders, followers, to_fill = shared_setup
+        filler = tcruncher.derive_relationship(followers[0], leaders)
+        lead_ts = to_fill.timeseries()
+        exp = filler(to_fill).timeseries().reindex(columns=lead_ts.columns).values
+
+        np.testing.assert_allclose(
+            filler.fill_array(lead_ts.values, lead_ts.columns), exp
+        )
+        out = np.zeros(lead_ts.shape)
+        res = filler.fill_array(lead_ts.values, lead_ts.columns, out=out)
+        assert res is out
+        np.testing.assert_allclose(out, exp)
+
+    def test_lazy_output(self, shared_setup):
+        tcruncher, leaders, followers, to_fill = shared_setup
+        filler = tcruncher.derive_relationship(followers[0], leaders)
+        res = filler(to_fill, lazy=True)
+
+        assert isinstance(res, LazyResult)
+        exp = filler(to_fill)
+        pd.testing.assert_frame_equal(res.to_iamdf().data, exp.data)
+        pd.testing.assert_frame_equal(
+            res.timeseries(), exp.timeseries(), check_names=False
+        )
+
+    def test_trusted_filler(self, shared_setup):
+        tcruncher, leaders, followers, to_fill = shared_setup
+        filler = tcruncher.derive_relationship(followers[0], leaders)
+        trusted_filler = filler.trusted(to_fill)
+
+        exp = filler(to_fill)
+        pd.testing.assert_frame_equal(trusted_filler(to_fill).data, exp.data)
+        scaled = to_fill.copy()
+        scaled.data["value"] *= 1.1
+        pd.testing.assert_frame_equal(trusted_filler(scaled).data, filler(scaled).data)
+
+    def test_compact(self, test_db, shared_setup):
+        tcruncher, leaders, followers, to_fill = shared_setup
+        exp = tcruncher.derive_relationship(followers[0], leaders)(to_fill)
+        compact_cruncher = self.tclass(test_db, compact=True)
+        # The compact cruncher keeps no reference to the database, so is not affected
+        # by changes to it
+        test_db.data["value"] *= 2
+        res = compact_cruncher.derive_relationship(followers[0], leaders)(to_fill)
+
+        cols = [c for c in exp.data.columns if c != "value"]
+        pd.testing.assert_frame_equal(res.data[cols], exp.data[cols])
+        np.testing.assert_allclose(res.data["value"], exp.data["value"], rtol=1e-5)
+
+    def test_database_store(self, test_db, shared_setup, tmpdir):
+        tcruncher, leaders, followers, to_fill = shared_setup
+        exp = tcruncher.derive_relationship(followers[0], leaders)(to_fill)
+        save_database_store(test_db, str(tmpdir))
+        stored_cruncher = self.tclass(load_database_store(str(tmpdir)))
+        test_db.data["value"] *= 2
+        res = stored_cruncher.derive_relationship(followers[0], leaders)(to_fill)
+        pd.testing.assert_frame_equal(res.data, exp.data)
+
+    def test_tables(self, shared_setup, tmpdir):
+        tcruncher, leaders, followers, to_fill = shared_setup
+        filler = tcruncher.derive_relationship(followers[0], leaders)
+        if filler.tables is None:
+            pytest.skip("The relationships of {} have no tables".format(self.tclass))
+
+        path = str(tmpdir.join("tables.npz"))
+        _save_tables(path, filler.tables)
+        loaded = _filler_from_tables(_load_tables(path))
+        pd.testing.assert_frame_equal(loaded(to_fill).data, filler(to_fill).data)
@@ -6,7 +6,7 @@ import pandas as pd
 import pytest
 from pyam import IamDataFrame
 
-from silicone.database_crunchers import ConstantRatio
+from silicone.database_crunchers import ConstantRatio, LazyResult
 
 _msa = ["model_a", "scen_a"]
 _msb = ["model_a", "scen_b"]
@@ -158,6 +158,84 @@ class TestDatabaseCruncherTimeDepRatio:
             test_downscale_df.timeseries().columns.values.squeeze(),
         )
 
+    def test_relationship_usage_multiple_followers(self, test_downscale_df):
+        tcruncher = self.tclass()
+        lead = ["Emissions|HFC|C2F6"]
+        followers = {
+            "Emissions|HFC|C5F12": (2, "kt C5F12/yr"),
+            "Emissions|HFC|C3F8": (0, "kt C3F8/yr"),
+            "Emissions|SF6": (-0.5, "kt SF6/yr"),
+        }
+        filler = tcruncher.derive_relationship(followers, lead)
+        res = filler(test_downscale_df)
+
+        # The results are the same as for each follower separately
+        for follow, (ratio, units) in followers.items():
+            exp = tcruncher.derive_relationship(follow, lead, ratio, units)(
+                test_downscale_df
+            )
+            pd.testing.assert_frame_equal(
+                res.filter(variable=follow).timeseries(), exp.timeseries()
+            )
+        assert sorted(res.variables().tolist()) == sorted(followers.keys())
+
+        # Test we can append the results correctly
+        append_df = test_downscale_df.append(res)
+        assert append_df.filter(variable=list(followers.keys())).equals(res)
+
+    def test_fill_array_multiple_followers(self, test_downscale_df):
+        tcruncher = self.tclass()
+        lead = ["Emissions|HFC|C2F6"]
+        followers = {
+            "Emissions|HFC|C5F12": (2, "kt C5F12/yr"),
+            "Emissions|SF6": (-0.5, "kt SF6/yr"),
+        }
+        lead_ts = test_downscale_df.timeseries()
+        res = tcruncher.derive_relationship(followers, lead).fill_array(
+            lead_ts.values, lead_ts.columns
+        )
+        assert res.shape == (2,) + lead_ts.shape
+        np.testing.assert_allclose(res[0], 2 * lead_ts.values)
+        np.testing.assert_allclose(res[1], -0.5 * lead_ts.values)
+
+        filler = tcruncher.derive_relationship("Emissions|SF6", lead, 3, "kt SF6/yr")
+        out = np.empty(lead_ts.shape)
+        filler.fill_array(lead_ts.values, lead_ts.columns, out=out)
+        np.testing.assert_allclose(out, 3 * lead_ts.values)
+
+    def test_lazy_output_multiple_followers(self, test_downscale_df):
+        tcruncher = self.tclass()
+        followers = {
+            "Emissions|HFC|C5F12": (2, "kt C5F12/yr"),
+            "Emissions|SF6": (-0.5, "kt SF6/yr"),
+        }
+        filler = tcruncher.derive_relationship(followers, ["Emissions|HFC|C2F6"])
+        res = filler(test_downscale_df, lazy=True)
+
+        assert isinstance(res, LazyResult)
+        assert res.to_iamdf().equals(filler(test_downscale_df))
+
+    def test_derive_relationship_error_ratio_and_dict(self):
+        tcruncher = self.tclass()
+        error_msg = re.escape(
+            "`ratio` and `units` must be given in the dictionary of followers "
+            "rather than as arguments"
+        )
+        with pytest.raises(ValueError, match=error_msg):
+            tcruncher.derive_relationship(
+                {"Emissions|HFC|C5F12": (0, "Some_unit")},
+                ["Emissions|HFC|C2F6"],
+                ratio=0.5,
+            )
+
+    def test_derive_relationship_error_no_ratio(self):
+        tcruncher = self.tclass()
+        error_msg = re.escape("`ratio` and `units` must be given")
+        with pytest.raises(ValueError, match=error_msg):
+            tcruncher.derive_relationship(
+                "Emissions|HFC|C5F12", ["Emissions|HFC|C2F6"], units="Some_unit"
+            )
+
     def test_multiple_units_breaks_infillee(self, test_downscale_df):
         tcruncher = self.tclass()
 
@@ -114,6 +114,34 @@ class TestDatabaseCruncherScenarioAndModelSpecificInterpolate(_DataBaseCruncherT
         )
         assert callable(res)
 
+    def test_derive_relationship_is_cached(self, test_db, test_downscale_df):
+        tcruncher = self.tclass(test_db)
+        res = tcruncher.derive_relationship(
+            "Emissions|CH4", ["Emissions|CO2"], required_scenario="scen_a"
+        )
+        # Patterns which select the same scenarios share the derived relationship
+        assert res is tcruncher.derive_relationship(
+            "Emissions|CH4", ["Emissions|CO2"], required_scenario=["scen_a"]
+        )
+        assert res is tcruncher.derive_relationship(
+            "Emissions|CH4", ["Emissions|CO2"], required_scenario="*_a"
+        )
+        assert res is not tcruncher.derive_relationship(
+            "Emissions|CH4", ["Emissions|CO2"], required_scenario="scen_*"
+        )
+        assert res is not tcruncher.derive_relationship(
+            "Emissions|CO2", ["Emissions|CH4"], required_scenario="scen_a"
+        )
+
+        # The results agree with crunching a filtered database
+        test_downscale_df = self._adjust_time_style_to_match(test_downscale_df, test_db)
+        linear_res = LinearInterpolation(
+            test_db.filter(scenario="scen_a")
+        ).derive_relationship("Emissions|CH4", ["Emissions|CO2"])
+        pd.testing.assert_frame_equal(
+            res(test_downscale_df).data, linear_res(test_downscale_df).data
+        )
+
     def test_derive_relationship_bad_ssp(self, test_db):
         tcruncher = self.tclass(test_db)
         error_msg = (
@@ -241,3 +241,17 @@ class TestDatabaseCruncherLatestTimeRatio(_DataBaseCruncherTester):
             res.timeseries().columns.values.squeeze(),
             test_downscale_df.timeseries().columns.values.squeeze(),
         )
+
+    def test_relationship_usage_no_lead_data(self, test_db, test_downscale_df):
+        tcruncher = self.tclass(test_db)
+        lead = ["Emissions|HFC|C2F6"]
+        filler = tcruncher.derive_relationship("Emissions|HFC|C5F12", lead)
+        test_downscale_df = self._adjust_time_style_to_match(test_downscale_df, test_db)
+        test_downscale_df.data["variable"] = "Emissions|HFC|C3F8"
+        test_downscale_df = IamDataFrame(test_downscale_df.data)
+
+        error_msg = re.escape(
+            "There is no data for {} so it cannot be infilled".format(lead)
+        )
+        with pytest.raises(ValueError, match=error_msg):
+            filler(test_downscale_df, interpolate=True)
@@ -7,8 +7,8 @@ import pytest
 from base import _DataBaseCruncherTester
 from pyam import IamDataFrame, concat
 
-from silicone.database_crunchers import RMSClosest
-from silicone.database_crunchers.rms_closest import _select_closest
+from silicone.database_crunchers import RMSClosest, rms_closest
+from silicone.database_crunchers.rms_closest import _find_closest_rows, _select_closest
 
 _msa = ["model_a", "scen_a"]
 
@@ -434,3 +434,13 @@ def test_select_closest_wrong_shape_error():
         match="Target array does not match the size of the searchable arrays",
     ):
         _select_closest(to_search, target)
+
+
+@pytest.mark.parametrize("max_block_size", [1, 8, 2 ** 22])
+def test_find_closest_rows_in_blocks(monkeypatch, max_block_size):
+    monkeypatch.setattr(rms_closest, "_MAX_BLOCK_SIZE", max_block_size)
+    to_search = np.array([[1, 1, 1], [1, 2, 3.5], [1, 2, 3.5], [1, 2, 4]])
+    targets = np.array([[1, 2, 3], [1, 1, np.nan], [1, 2, 5], [0, 2, 3.6], [1, 1, 1]])
+    np.testing.assert_array_equal(
+        _find_closest_rows(to_search, targets), [1, 0, 3, 1, 0]
+    )
@@ -147,6 +147,14 @@ class TestDatabaseTimeDepCruncherRollingWindows:
                 ]
             assert np.allclose(filtered_ans, 11 * (quantile - 1 / 22))
 
+        assert res(to_infill, lazy=True).to_iamdf().equals(returned)
+        assert res.trusted(to_infill)(to_infill).equals(returned)
+        lead_ts = to_infill.timeseries()
+        np.testing.assert_allclose(
+            res.fill_array(lead_ts.values, lead_ts.columns),
+            returned.timeseries().values,
+        )
+
     def test_derive_relationship_same_gas(self, test_db):
         # Given only a single data series, we recreate the original pattern for any
         # quantile
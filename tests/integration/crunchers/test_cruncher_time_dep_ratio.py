@@ -223,6 +223,37 @@ class TestDatabaseCruncherTimeDepRatio(_DataBaseCruncherTester):
             # so we have have a multiplier of infinity.
             assert all(res.data["value"] == -np.inf)
 
+    def test_relationship_usage_mixed_signs(self, unequal_df, test_downscale_df):
+        # Test that positive and negative infillee values in the same year each use
+        # the ratio calculated from the database values of their sign.
+        follow = "Emissions|HFC|C5F12"
+        lead = ["Emissions|HFC|C2F6"]
+        equal_df = unequal_df.filter(model="model_a")
+        invert_sign = equal_df.copy()
+        invert_sign.data.loc[invert_sign.data["variable"] == lead[0], "value"] *= -2
+        invert_sign.data["model"] = "negative_model"
+        equal_df = IamDataFrame(equal_df.data.append(invert_sign.data))
+        tcruncher = self.tclass(equal_df)
+
+        test_downscale_df = self._adjust_time_style_to_match(
+            test_downscale_df, equal_df
+        ).filter(year=[2010, 2015])
+        test_downscale_df.data.loc[
+            test_downscale_df.data["scenario"] == "scen_c", "value"
+        ] *= -1
+        filler = tcruncher.derive_relationship(follow, lead)
+        res = filler(test_downscale_df)
+
+        lead_ts = test_downscale_df.filter(variable=lead).timeseries()
+        # The positive data have a ratio of 5 then 1, the negative data have the same
+        # followers and leaders twice as large, with the opposite sign.
+        exp = lead_ts * np.where(lead_ts > 0, [5, 1], [-2.5, -0.5])
+        pd.testing.assert_frame_equal(
+            res.timeseries().reset_index(drop=True),
+            exp.reset_index(drop=True),
+            check_like=True,
+        )
+
     @pytest.mark.parametrize("match_sign", [True, False])
     def test_relationship_usage_nans(
         self, unequal_df, test_downscale_df, match_sign, caplog
@@ -159,6 +159,37 @@ class TestGasDecomposeTimeDepRatio:
         assert all(y == components[0] for y in filled.variables())
         assert np.allclose(filled.data["value"], test_downscale_df.data["value"])
 
+    def _get_copy_inputs(self, test_db, test_downscale_df):
+        test_db.data["unit"] = "kt C2F6-equiv/yr"
+        test_downscale_df = _adjust_time_style_to_match(test_downscale_df, test_db)
+        test_downscale_df.filter(
+            **{test_db.time_col: list(test_db[test_db.time_col])}, inplace=True
+        )
+        return test_db, test_downscale_df
+
+    @pytest.mark.parametrize("copy", [True, False])
+    def test_relationship_usage_copy(self, test_db, test_downscale_df, copy):
+        test_db, to_infill = self._get_copy_inputs(test_db, test_downscale_df)
+        aggregate = "Emissions|HFC|C2F6"
+        components = ["Emissions|HFC|C5F12"]
+        exp = self.tclass(test_db).infill_components(aggregate, components, to_infill)
+        tcruncher = self.tclass(test_db, copy=copy)
+        assert (tcruncher._db is test_db) != copy
+        res = tcruncher.infill_components(aggregate, components, to_infill)
+        pd.testing.assert_frame_equal(res.data, exp.data)
+
+    def test_relationship_usage_database_modified(self, test_db, test_downscale_df):
+        test_db, to_infill = self._get_copy_inputs(test_db, test_downscale_df)
+        tcruncher = self.tclass(test_db, copy=False)
+        test_db.data = test_db.data.assign(value=test_db.data["value"] * 2)
+        error_msg = re.escape(
+            "The database has been modified since the cruncher was created."
+        )
+        with pytest.raises(ValueError, match=error_msg):
+            tcruncher.infill_components(
+                "Emissions|HFC|C2F6", ["Emissions|HFC|C5F12"], to_infill
+            )
+
     def test_relationship_usage_works_multiple(self, test_db, test_downscale_df):
         # Test that the decomposer function works for slightly more complicated data
         # (two components).
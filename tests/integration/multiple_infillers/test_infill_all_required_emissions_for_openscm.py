@@ -1,3 +1,5 @@
+import concurrent.futures
+import contextlib
 import datetime
 import re
 
@@ -6,13 +8,34 @@ import pandas as pd
 import pyam
 import pytest
 
+from silicone.database_crunchers import (
+    QuantileRollingWindows,
+    RelationshipCache,
+    RMSClosest,
+)
 from silicone.database_crunchers.constant_ratio import ConstantRatio
 from silicone.multiple_infillers.infill_all_required_emissions_for_openscm import (
+    _check_infilled_data,
+    _derive_fillers,
     infill_all_required_variables,
+    infill_all_required_variables_in_chunks,
 )
 from silicone.utils import _adjust_time_style_to_match
 
 
+class _CountingCruncher(QuantileRollingWindows):
+    n_derived = 0
+
+    def derive_relationships(self, *args, **kwargs):
+        type(self).n_derived += 1
+        return super().derive_relationships(*args, **kwargs)
+
+
+class _DatabaseOnlyCruncher(QuantileRollingWindows):
+    def __init__(self, db):
+        super().__init__(db)
+
+
 class TestGasDecomposeTimeDepRatio:
     _msa = ["model_a", "scen_a"]
     _msb = ["model_a", "scen_b"]
@@ -64,6 +87,343 @@ class TestGasDecomposeTimeDepRatio:
         )
         assert infilled.data.equals(test_db.data)
 
+    def test_infillallrequiredvariables_partially_reported(self, test_db, larger_df):
+        output_times = list(set(test_db[test_db.time_col]))
+        correct_time_large_df = _adjust_time_style_to_match(larger_df, test_db)
+        required_variables_list = ["Emissions|HFC|C5F12"]
+        # Only scen_a needs infilling
+        to_fill = correct_time_large_df.filter(
+            scenario="scen_a", variable=required_variables_list, keep=False
+        )
+        infilled = infill_all_required_variables(
+            to_fill.copy(),
+            correct_time_large_df,
+            variable_leaders=["Emissions|HFC|C2F6"],
+            output_timesteps=output_times,
+            required_variables_list=required_variables_list,
+        )
+        follower = infilled.filter(variable=required_variables_list)
+        assert sorted(follower.scenarios()) == ["scen_a", "scen_b"]
+        pd.testing.assert_frame_equal(
+            follower.filter(scenario="scen_b").data.reset_index(drop=True),
+            to_fill.filter(variable=required_variables_list).data.reset_index(
+                drop=True
+            ),
+        )
+
+    def _make_regional_db(self, test_db, larger_df):
+        database = _adjust_time_style_to_match(larger_df, test_db)
+        regional = database.copy()
+        regional.data["region"] = "R5ASIA"
+        # Give the region a different relationship
+        regional.data.loc[
+            regional.data["variable"] == "Emissions|HFC|C5F12", "value"
+        ] *= 3
+        return database.append(regional)
+
+    @pytest.mark.parametrize("n_jobs", [1, 2])
+    def test_infillallrequiredvariables_multiple_regions(
+        self, test_db, larger_df, n_jobs
+    ):
+        database = self._make_regional_db(test_db, larger_df)
+        required_variables_list = ["Emissions|HFC|C5F12"]
+        leader = ["Emissions|HFC|C2F6"]
+        output_times = list(set(test_db[test_db.time_col]))
+        to_fill = database.filter(variable=leader)
+        res = infill_all_required_variables(
+            to_fill.copy(),
+            database.copy(),
+            leader,
+            required_variables_list,
+            output_timesteps=output_times,
+            check_data_returned=True,
+            n_jobs=n_jobs,
+        )
+        assert set(res.regions()) == {"World", "R5ASIA"}
+        for region in ["World", "R5ASIA"]:
+            exp = infill_all_required_variables(
+                to_fill.filter(region=region),
+                database.filter(region=region),
+                leader,
+                required_variables_list,
+                output_timesteps=output_times,
+            )
+            pd.testing.assert_frame_equal(
+                res.filter(region=region).data.reset_index(drop=True),
+                exp.data.reset_index(drop=True),
+            )
+
+    def test_infillallrequiredvariables_zeros_multiple_regions(
+        self, test_db, larger_df
+    ):
+        database = self._make_regional_db(test_db, larger_df)
+        leader = ["Emissions|HFC|C2F6"]
+        output_times = list(set(test_db[test_db.time_col]))
+        to_fill = database.filter(variable=leader)
+        # One region already reports the variable which is not in the database
+        reported = to_fill.filter(region="World")
+        reported.data["variable"] = "Emissions|SF6"
+        reported.data["value"] = 1.0
+        to_fill = to_fill.append(reported)
+        with pytest.warns(UserWarning, match="No data for"):
+            res = infill_all_required_variables(
+                to_fill.copy(),
+                database.copy(),
+                leader,
+                ["Emissions|SF6"],
+                output_timesteps=output_times,
+            )
+        sf6 = res.filter(variable="Emissions|SF6").data
+        assert set(sf6["region"]) == {"World", "R5ASIA"}
+        assert (sf6.loc[sf6["region"] == "World", "value"] == 1).all()
+        assert (sf6.loc[sf6["region"] == "R5ASIA", "value"] == 0).all()
+        assert len(sf6) == 2 * len(reported.data)
+
+    def test_infillallrequiredvariables_pool_regions(self, test_db, larger_df):
+        database = self._make_regional_db(test_db, larger_df)
+        required_variables_list = ["Emissions|HFC|C5F12"]
+        leader = ["Emissions|HFC|C2F6"]
+        output_times = list(set(test_db[test_db.time_col]))
+        to_fill = database.filter(variable=leader)
+        to_fill.data["region"] = "R5LAM"
+        error_msg = "The cruncher data and the infilled data have different regions."
+        with pytest.raises(AssertionError, match=error_msg):
+            infill_all_required_variables(
+                to_fill.copy(),
+                database.copy(),
+                leader,
+                required_variables_list,
+                output_timesteps=output_times,
+            )
+
+        res = infill_all_required_variables(
+            to_fill.copy(),
+            database.copy(),
+            leader,
+            required_variables_list,
+            output_timesteps=output_times,
+            pool_regions=True,
+        )
+        assert res.regions().tolist() == ["R5LAM"]
+        # The relationships are derived from the data of all regions
+        pooled = database.data.copy()
+        pooled["model"] = pooled["model"] + pooled["region"]
+        pooled["region"] = "R5LAM"
+        exp = infill_all_required_variables(
+            to_fill.copy(),
+            pyam.IamDataFrame(pooled),
+            leader,
+            required_variables_list,
+            output_timesteps=output_times,
+        )
+        pd.testing.assert_frame_equal(res.data, exp.data)
+
+    def _get_chunk_inputs(self, test_db, larger_df):
+        database = _adjust_time_style_to_match(larger_df, test_db)
+        leader = ["Emissions|HFC|C2F6"]
+        to_fill = database.filter(variable=leader)
+        kwargs = dict(
+            required_variables_list=["Emissions|HFC|C5F12"],
+            output_timesteps=list(set(test_db[test_db.time_col])),
+        )
+        exp = infill_all_required_variables(
+            to_fill.copy(), database.copy(), leader, **kwargs
+        )
+        return database, leader, to_fill, kwargs, exp
+
+    @pytest.mark.parametrize("n_jobs", [1, 2])
+    def test_infillallrequiredvariables_in_chunks(self, test_db, larger_df, n_jobs):
+        database, leader, to_fill, kwargs, exp = self._get_chunk_inputs(
+            test_db, larger_df
+        )
+        chunks = [to_fill.filter(scenario=s) for s in to_fill.scenarios()]
+        results = []
+        _CountingCruncher.n_derived = 0
+        n_chunks = infill_all_required_variables_in_chunks(
+            iter(chunks),
+            database,
+            leader,
+            results.append,
+            cruncher=_CountingCruncher,
+            n_jobs=n_jobs,
+            **kwargs,
+        )
+        assert n_chunks == len(chunks) == len(results)
+        # The relationships are only derived once
+        assert _CountingCruncher.n_derived == 1
+        for chunk, res in zip(chunks, results):
+            assert res.scenarios().tolist() == chunk.scenarios().tolist()
+        res = results[0].append(results[1])
+        pd.testing.assert_frame_equal(res.timeseries(), exp.timeseries())
+
+    def test_infillallrequiredvariables_relationship_cache(self, test_db, larger_df):
+        database, leader, to_fill, kwargs, exp = self._get_chunk_inputs(
+            test_db, larger_df
+        )
+        relationship_cache = RelationshipCache()
+        _CountingCruncher.n_derived = 0
+        for _ in range(2):
+            # The database is identified by its content, so copies share relationships
+            res = infill_all_required_variables(
+                to_fill.copy(),
+                database.copy(),
+                leader,
+                cruncher=_CountingCruncher,
+                relationship_cache=relationship_cache,
+                **kwargs,
+            )
+            pd.testing.assert_frame_equal(res.timeseries(), exp.timeseries())
+        assert _CountingCruncher.n_derived == 1
+        assert relationship_cache.cache_info() == (1, 1, 128, 1)
+
+        # Different keyword arguments need a different relationship
+        infill_all_required_variables(
+            to_fill.copy(),
+            database.copy(),
+            leader,
+            cruncher=_CountingCruncher,
+            relationship_cache=relationship_cache,
+            quantile=0.4,
+            **kwargs,
+        )
+        assert _CountingCruncher.n_derived == 2
+        assert len(relationship_cache) == 2
+
+        # The relationships are derived in this process, so the cache is also used
+        # when infilling with a pool of processes
+        res = infill_all_required_variables(
+            to_fill.copy(),
+            database.copy(),
+            leader,
+            cruncher=_CountingCruncher,
+            relationship_cache=relationship_cache,
+            n_jobs=2,
+            **kwargs,
+        )
+        pd.testing.assert_frame_equal(res.timeseries(), exp.timeseries())
+        assert _CountingCruncher.n_derived == 2
+
+    def test_infillallrequiredvariables_relationship_cache_directory(
+        self, test_db, larger_df, tmpdir
+    ):
+        database, leader, to_fill, kwargs, exp = self._get_chunk_inputs(
+            test_db, larger_df
+        )
+        _CountingCruncher.n_derived = 0
+        for _ in range(2):
+            # Each call has a new cache, as if the process had been restarted
+            res = infill_all_required_variables(
+                to_fill.copy(),
+                database.copy(),
+                leader,
+                cruncher=_CountingCruncher,
+                relationship_cache=RelationshipCache(directory=str(tmpdir)),
+                **kwargs,
+            )
+            pd.testing.assert_frame_equal(res.timeseries(), exp.timeseries())
+        assert _CountingCruncher.n_derived == 1
+        assert len(tmpdir.listdir()) == 1
+
+    def test_infillallrequiredvariables_in_chunks_csv(self, test_db, larger_df, tmpdir):
+        database, leader, to_fill, kwargs, exp = self._get_chunk_inputs(
+            test_db, larger_df
+        )
+        in_path = str(tmpdir.join("in.csv"))
+        out_path = str(tmpdir.join("out.csv"))
+        # Each chunk of rows only holds part of a scenario, so the reader must join
+        # them up
+        extra = to_fill.copy()
+        extra.data["variable"] = "Emissions|CO2"
+        to_fill.append(extra).to_csv(in_path)
+        n_chunks = infill_all_required_variables_in_chunks(
+            in_path, database, leader, out_path, chunksize=1, **kwargs
+        )
+        assert n_chunks == 2
+        res = pyam.IamDataFrame(out_path)
+        pd.testing.assert_frame_equal(
+            res.filter(variable="Emissions|CO2", keep=False).timeseries(),
+            exp.timeseries(),
+            check_column_type=False,
+        )
+
+    def test_infillallrequiredvariables_in_chunks_csv_different_times(
+        self, test_db, larger_df, tmpdir
+    ):
+        database, leader, to_fill, kwargs, _ = self._get_chunk_inputs(
+            test_db, larger_df
+        )
+        out_path = str(tmpdir.join("out.csv"))
+        # The first chunk starts later than the second, so has fewer columns
+        scenarios = to_fill.scenarios()
+        first = to_fill.filter(scenario=scenarios[0])
+        first = first.filter(**{first.time_col: min(first[first.time_col])}, keep=False)
+        chunks = [first, to_fill.filter(scenario=scenarios[1:])]
+        exp = infill_all_required_variables(
+            chunks[0].append(chunks[1]), database.copy(), leader, **kwargs
+        )
+        n_chunks = infill_all_required_variables_in_chunks(
+            iter(chunks), database, leader, out_path, **kwargs
+        )
+        assert n_chunks == 2
+        res = pyam.IamDataFrame(out_path)
+        pd.testing.assert_frame_equal(
+            res.timeseries(), exp.timeseries(), check_column_type=False
+        )
+
+    @pytest.mark.parametrize("regional", [False, True])
+    def test_derive_fillers_region(self, test_db, larger_df, regional):
+        database = _adjust_time_style_to_match(larger_df, test_db)
+        if regional:
+            database = self._make_regional_db(test_db, larger_df)
+        state = {
+            "database": database,
+            "cruncher_class": QuantileRollingWindows,
+            "compact": False,
+            "crunchers": {},
+            "relationship_cache": None,
+            "leaders": ["Emissions|HFC|C2F6"],
+            "kwargs": {},
+        }
+        fillers = _derive_fillers(state, "World", ["Emissions|HFC|C5F12"])
+        assert list(fillers) == ["Emissions|HFC|C5F12"]
+        cruncher_db = state["crunchers"]["World"]._db
+        # The database is only filtered (and so copied) if it has other regions
+        assert (cruncher_db is database) != regional
+        assert list(cruncher_db.regions()) == ["World"]
+
+    def test_check_infilled_data(self, test_db, larger_df):
+        orig = _adjust_time_style_to_match(larger_df, test_db)
+        times = list(set(test_db[test_db.time_col]))
+        leaders = ["Emissions|HFC|C2F6"]
+        required_variables = ["Emissions|HFC|C5F12"]
+        report = _check_infilled_data(
+            orig, orig.filter(variable=leaders), leaders, required_variables, times
+        )
+        assert report["missing"].empty
+        assert report["overwritten"].empty
+
+        infilled = orig.filter(
+            scenario="scen_b", variable=required_variables, keep=False
+        )
+        infilled.data.loc[infilled.data["scenario"] == "scen_a", "value"] += 1
+        report = _check_infilled_data(
+            infilled, orig, leaders, required_variables, times
+        )
+        missing = report["missing"]
+        assert (missing["scenario"] == "scen_b").all()
+        assert (missing["variable"] == required_variables[0]).all()
+        assert len(missing) == len(times)
+        # All of scen_a's values have changed and scen_b's follower values are gone
+        overwritten = report["overwritten"]
+        changed = overwritten["scenario"] == "scen_a"
+        assert changed.sum() == 2 * len(times)
+        np.testing.assert_allclose(
+            overwritten.loc[changed, "value_infilled"],
+            overwritten.loc[changed, "value_original"] + 1,
+        )
+        assert overwritten.loc[~changed, "value_infilled"].isnull().all()
+        assert len(overwritten) == 3 * len(times)
+
     def test_infillallrequiredvariables_warning(self, test_db):
         output_times = list(set(test_db[test_db.time_col]))
         required_variables_list = ["Emissions|HFC|C5F12"]
@@ -140,6 +500,182 @@ class TestGasDecomposeTimeDepRatio:
         ).data.equals(to_fill.data)
         assert output_df.data.equals(test_db.data)
 
+    def test_infillallrequiredvariables_check_results_nan_extra_cols(self, test_db):
+        required_variables_list = ["Emissions|HFC|C5F12"]
+        data = test_db.data.copy()
+        data["source"] = "survey"
+        database = pyam.IamDataFrame(data)
+        to_fill = database.filter(variable=required_variables_list, keep=False)
+        # pyam does not accept nans in extra columns, so these are added afterwards
+        to_fill.data["source"] = np.nan
+        output_df = infill_all_required_variables(
+            to_fill,
+            database,
+            ["Emissions|HFC|C2F6"],
+            required_variables_list,
+            output_timesteps=to_fill[to_fill.time_col].unique(),
+            check_data_returned=True,
+        )
+        assert set(output_df.variables()) == {
+            "Emissions|HFC|C2F6",
+            "Emissions|HFC|C5F12",
+        }
+
+    def test_infillallrequiredvariables_compact(self, test_db):
+        required_variables_list = ["Emissions|HFC|C5F12"]
+        to_fill = test_db.filter(variable=required_variables_list, keep=False)
+        output_times = to_fill[to_fill.time_col].unique()
+        kwargs = dict(output_timesteps=output_times, check_data_returned=True)
+        res = infill_all_required_variables(
+            to_fill.copy(),
+            test_db.copy(),
+            ["Emissions|HFC|C2F6"],
+            required_variables_list,
+            compact=True,
+            **kwargs,
+        )
+        exp = infill_all_required_variables(
+            to_fill.copy(),
+            test_db.copy(),
+            ["Emissions|HFC|C2F6"],
+            required_variables_list,
+            **kwargs,
+        )
+        cols = [c for c in exp.data.columns if c != "value"]
+        pd.testing.assert_frame_equal(res.data[cols], exp.data[cols])
+        np.testing.assert_allclose(res.data["value"], exp.data["value"], rtol=1e-5)
+
+    @pytest.mark.parametrize("pool_regions", [False, True])
+    def test_infillallrequiredvariables_compact_multiple_regions(
+        self, test_db, larger_df, pool_regions
+    ):
+        database = self._make_regional_db(test_db, larger_df)
+        leader = ["Emissions|HFC|C2F6"]
+        to_fill = database.filter(variable=leader)
+        kwargs = dict(
+            output_timesteps=list(set(test_db[test_db.time_col])),
+            pool_regions=pool_regions,
+        )
+        res = infill_all_required_variables(
+            to_fill.copy(),
+            database.copy(),
+            leader,
+            ["Emissions|HFC|C5F12"],
+            compact=True,
+            **kwargs,
+        )
+        exp = infill_all_required_variables(
+            to_fill.copy(), database.copy(), leader, ["Emissions|HFC|C5F12"], **kwargs
+        )
+        cols = [c for c in exp.data.columns if c != "value"]
+        pd.testing.assert_frame_equal(res.data[cols], exp.data[cols])
+        np.testing.assert_allclose(res.data["value"], exp.data["value"], rtol=1e-5)
+
+    def test_infillallrequiredvariables_cruncher_only_takes_database(self, test_db):
+        required_variables_list = ["Emissions|HFC|C5F12"]
+        to_fill = test_db.filter(variable=required_variables_list, keep=False)
+        kwargs = dict(output_timesteps=to_fill[to_fill.time_col].unique())
+        res = infill_all_required_variables(
+            to_fill.copy(),
+            test_db.copy(),
+            ["Emissions|HFC|C2F6"],
+            required_variables_list,
+            cruncher=_DatabaseOnlyCruncher,
+            **kwargs,
+        )
+        exp = infill_all_required_variables(
+            to_fill.copy(),
+            test_db.copy(),
+            ["Emissions|HFC|C2F6"],
+            required_variables_list,
+            **kwargs,
+        )
+        pd.testing.assert_frame_equal(res.data, exp.data)
+
+    @pytest.mark.parametrize("cruncher", [QuantileRollingWindows, RMSClosest])
+    @pytest.mark.parametrize("use_executor", [False, True])
+    def test_infillallrequiredvariables_n_jobs(
+        self, test_db, larger_df, cruncher, use_executor, capsys
+    ):
+        database = _adjust_time_style_to_match(larger_df, test_db)
+        extra = database.filter(variable="Emissions|HFC|C5F12")
+        for variable in ["Emissions|HFC|C6F14", "Emissions|SF6"]:
+            extra.data["variable"] = variable
+            database = database.append(extra)
+        required_variables_list = [
+            "Emissions|HFC|C5F12",
+            "Emissions|HFC|C6F14",
+            "Emissions|SF6",
+        ]
+        leader = ["Emissions|HFC|C2F6"]
+        to_fill = database.filter(variable=leader)
+        output_times = list(set(test_db[test_db.time_col]))
+        kwargs = dict(output_timesteps=output_times, cruncher=cruncher)
+        # RMSClosest fillers cannot be sent to other processes
+        warning = pytest.warns(UserWarning, match="infilled in this process")
+        with warning if cruncher == RMSClosest else contextlib.suppress():
+            if use_executor:
+                with concurrent.futures.ProcessPoolExecutor(2) as executor:
+                    res = infill_all_required_variables(
+                        to_fill.copy(),
+                        database.copy(),
+                        leader,
+                        required_variables_list,
+                        executor=executor,
+                        **kwargs,
+                    )
+            else:
+                res = infill_all_required_variables(
+                    to_fill.copy(),
+                    database.copy(),
+                    leader,
+                    required_variables_list,
+                    n_jobs=2,
+                    **kwargs,
+                )
+        # The progress is shown for each variable
+        assert "3/3" in capsys.readouterr().err
+        exp = infill_all_required_variables(
+            to_fill.copy(), database.copy(), leader, required_variables_list, **kwargs,
+        )
+        assert set(res.variables()) == set(leader + required_variables_list)
+        pd.testing.assert_frame_equal(res.data, exp.data)
+
+    def test_infillallrequiredvariables_executor_batches(self, test_db, larger_df):
+        database = _adjust_time_style_to_match(larger_df, test_db)
+        extra = database.filter(variable="Emissions|HFC|C5F12")
+        required_variables_list = ["Emissions|HFC|C5F12"]
+        for i in range(4):
+            extra.data["variable"] = "Emissions|HFC|C5F12|{}".format(i)
+            database = database.append(extra)
+            required_variables_list.append("Emissions|HFC|C5F12|{}".format(i))
+        leader = ["Emissions|HFC|C2F6"]
+        to_fill = database.filter(variable=leader)
+        kwargs = dict(output_timesteps=list(set(test_db[test_db.time_col])))
+        payloads = []
+
+        class _RecordingExecutor(concurrent.futures.ThreadPoolExecutor):
+            def map(self, fn, *iterables):
+                payloads.extend(iterables[0])
+                return super().map(fn, *iterables)
+
+        with _RecordingExecutor(2) as executor:
+            res = infill_all_required_variables(
+                to_fill.copy(),
+                database.copy(),
+                leader,
+                required_variables_list,
+                executor=executor,
+                **kwargs,
+            )
+        # The leader data is sent once to each worker, not once for each variable
+        assert len(payloads) == 2
+        assert sorted(len(variables) for _, variables in payloads) == [2, 3]
+        exp = infill_all_required_variables(
+            to_fill.copy(), database.copy(), leader, required_variables_list, **kwargs,
+        )
+        pd.testing.assert_frame_equal(res.data, exp.data)
+
     def test_infillallrequiredvariables_check_results_use_old_prefix(self, test_db):
         required_variables_list = ["HFC|C5F12"]
         infilled_data_prefix = "Emissions"
@@ -0,0 +1,118 @@
+import pandas as pd
+import pytest
+
+from silicone.database_crunchers import (
+    EqualQuantileWalk,
+    LinearInterpolation,
+    QuantileRollingWindows,
+    TimeDepRatio,
+)
+from silicone.multiple_infillers import (
+    InfillingPlan,
+    compile_infilling_plan,
+    infill_all_required_variables,
+)
+from silicone.utils import _adjust_time_style_to_match
+
+
+class TestInfillingPlan:
+    _msa = ["model_a", "scen_a"]
+    _msb = ["model_a", "scen_b"]
+    tdb = pd.DataFrame(
+        [
+            _msa + ["World", "Emissions|HFC|C5F12", "kt C5F12/yr", 2, 3],
+            _msa + ["World", "Emissions|HFC|C2F6", "kt C2F6/yr", 0.5, 1.5],
+        ],
+        columns=["model", "scenario", "region", "variable", "unit", 2010, 2015],
+    )
+
+    larger_df = pd.DataFrame(
+        [
+            _msa + ["World", "Emissions|HFC|C5F12", "kt C5F12/yr", 2, 3],
+            _msa + ["World", "Emissions|HFC|C2F6", "kt C2F6/yr", 1, 2],
+            _msb + ["World", "Emissions|HFC|C5F12", "kt C5F12/yr", 4, 5],
+            _msb + ["World", "Emissions|HFC|C2F6", "kt C2F6/yr", 1.5, 2],
+            _msa + ["R5ASIA", "Emissions|HFC|C5F12", "kt C5F12/yr", 6, 9],
+            _msa + ["R5ASIA", "Emissions|HFC|C2F6", "kt C2F6/yr", 1, 2],
+            _msb + ["R5ASIA", "Emissions|HFC|C5F12", "kt C5F12/yr", 12, 15],
+            _msb + ["R5ASIA", "Emissions|HFC|C2F6", "kt C2F6/yr", 1.5, 2],
+        ],
+        columns=["model", "scenario", "region", "variable", "unit", 2010, 2015],
+    )
+
+    @pytest.mark.parametrize(
+        "cruncher", [QuantileRollingWindows, LinearInterpolation, TimeDepRatio]
+    )
+    @pytest.mark.parametrize("pool_regions", [False, True])
+    def test_infilling_plan(self, test_db, larger_df, tmpdir, cruncher, pool_regions):
+        database = _adjust_time_style_to_match(larger_df, test_db)
+        if cruncher is LinearInterpolation and pool_regions:
+            # Each model and scenario must only report one value at each time
+            database = database.filter(region="World")
+        leader = ["Emissions|HFC|C2F6"]
+        kwargs = dict(
+            required_variables_list=["Emissions|HFC|C5F12", "Emissions|HFC|C6F14"],
+            cruncher=cruncher,
+            output_timesteps=list(set(test_db[test_db.time_col])),
+            pool_regions=pool_regions,
+        )
+        to_fill = database.filter(variable=leader)
+        with pytest.warns(UserWarning, match="No data for"):
+            exp = infill_all_required_variables(
+                to_fill.copy(), database.copy(), leader, **kwargs
+            )
+
+        plan = compile_infilling_plan(database, leader, **kwargs)
+        path = str(tmpdir.join("plan.npz"))
+        plan.save(path)
+        loaded = InfillingPlan.load(path)
+        assert loaded.pool_regions == pool_regions
+        assert loaded.regions == plan.regions
+        assert loaded.unavailable_variables == ["Emissions|HFC|C6F14"]
+        assert loaded.output_timesteps == plan.output_timesteps
+        with pytest.warns(UserWarning, match="No data for"):
+            res = loaded.infill(to_fill.copy(), check_data_returned=True)
+        pd.testing.assert_frame_equal(res.data, exp.data)
+
+    def test_infilling_plan_prefixes(self, test_db, larger_df):
+        database = _adjust_time_style_to_match(larger_df, test_db)
+        leader = ["Emissions|HFC|C2F6"]
+        kwargs = dict(
+            required_variables_list=["Emissions|HFC|C5F12"],
+            output_timesteps=list(set(test_db[test_db.time_col])),
+        )
+        to_fill = database.filter(variable=leader)
+        to_fill.data["variable"] = "Old|" + to_fill.data["variable"]
+        exp = infill_all_required_variables(
+            to_fill.copy(),
+            database.copy(),
+            leader,
+            infilled_data_prefix="New",
+            to_fill_old_prefix="Old",
+            **kwargs,
+        )
+        res = compile_infilling_plan(database, leader, **kwargs).infill(
+            to_fill.copy(), infilled_data_prefix="New", to_fill_old_prefix="Old"
+        )
+        pd.testing.assert_frame_equal(res.data, exp.data)
+
+    def test_infilling_plan_errors(self, test_db, larger_df):
+        database = _adjust_time_style_to_match(larger_df, test_db)
+        leader = ["Emissions|HFC|C2F6"]
+        kwargs = dict(
+            required_variables_list=["Emissions|HFC|C5F12"],
+            output_timesteps=list(set(test_db[test_db.time_col])),
+        )
+        error_msg = (
+            "The relationships derived by `EqualQuantileWalk` cannot be compiled into "
+            "an infilling plan"
+        )
+        with pytest.raises(ValueError, match=error_msg):
+            compile_infilling_plan(
+                database, leader, cruncher=EqualQuantileWalk, **kwargs
+            )
+
+        plan = compile_infilling_plan(database.filter(region="World"), leader, **kwargs)
+        error_msg = "The cruncher data and the infilled data have different regions."
+        with pytest.raises(AssertionError, match=error_msg):
+            plan.infill(database.filter(variable=leader))
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pyam
+import pytest
+
+from silicone.database_crunchers.cube import _DatabaseCube, _MetadataIndex
+
+_msrvu = ["model", "scenario", "region", "variable", "unit"]
+
+
+def test_database_cube(check_aggregate_df):
+    cube = _DatabaseCube(check_aggregate_df.data, check_aggregate_df.time_col)
+    ts = check_aggregate_df.timeseries()
+
+    assert cube.time_col == "year"
+    assert cube.run_cols == ["model", "scenario", "region"]
+    assert cube.times.tolist() == ts.columns.tolist()
+    assert set(cube.variables) == set(check_aggregate_df.variables())
+    assert cube.values.shape == (len(cube.keys), len(cube.runs), len(cube.times))
+    assert cube.mask.sum() == len(check_aggregate_df.data)
+
+    for variable in cube.variables:
+        exp = ts[ts.index.get_level_values("variable") == variable]
+        assert cube.units(variable) == exp.index.get_level_values("unit").unique()
+        pd.testing.assert_frame_equal(cube.timeseries(variable), exp, check_names=False)
+
+
+def test_database_cube_missing_values_and_units():
+    df = pyam.IamDataFrame(
+        pd.DataFrame(
+            [
+                ["ma", "sa", "World", "Emissions|CO2", "Mt CO2/yr", 1, 2],
+                ["ma", "sb", "World", "Emissions|CO2", "Gt C/yr", 3, np.nan],
+                ["ma", "sa", "World", "Emissions|CH4", "Mt CH4/yr", np.nan, 5],
+            ],
+            columns=_msrvu + [2010, 2020],
+        )
+    )
+    cube = _DatabaseCube(df.data, df.time_col)
+
+    assert cube.units("Emissions|CO2") == ["Gt C/yr", "Mt CO2/yr"]
+    assert cube.key_indices("Emissions|N2O") == []
+    np.testing.assert_array_equal(
+        cube.variable_values("Emissions|CH4"), [[np.nan, 5], [np.nan, np.nan]]
+    )
+    error_msg = "`Emissions|CO2` is reported in 2 units"
+    with pytest.raises(ValueError, match=error_msg):
+        cube.variable_values("Emissions|CO2")
+
+    codes, n_groups = cube.group_runs(["model"])
+    assert n_groups == 1
+    np.testing.assert_array_equal(codes, [0, 0])
+
+
+def test_database_cube_extra_cols_with_nans():
+    data = pd.DataFrame(
+        [
+            ["ma", "sa", "World", "Emissions|CO2", "Mt CO2/yr", "a", 2010, 1],
+            ["ma", "sa", "World", "Emissions|CO2", "Mt CO2/yr", "a", 2020, 2],
+            ["ma", "sa", "World", "Emissions|CO2", "Mt CO2/yr", np.nan, 2010, 3],
+            ["ma", "sa", "World", "Emissions|CO2", "Mt CO2/yr", np.nan, 2020, 4],
+        ],
+        columns=_msrvu + ["climate_model", "year", "value"],
+    )
+    cube = _DatabaseCube(data, "year")
+
+    assert cube.run_cols == ["model", "scenario", "region", "climate_model"]
+    assert len(cube.runs) == 2
+    assert cube.runs.get_level_values("climate_model").isna().sum() == 1
+    np.testing.assert_array_equal(
+        cube.variable_values("Emissions|CO2"), [[1, 2], [3, 4]]
+    )
+
+
+@pytest.mark.parametrize("from_cube", [True, False])
+def test_metadata_index(check_aggregate_df, from_cube):
+    df = check_aggregate_df.filter(variable="Primary Energy|Gas", year=2010, keep=False)
+    if from_cube:
+        metadata = _MetadataIndex.from_cube(_DatabaseCube(df.data, df.time_col))
+        assert metadata.runs.names == ["model", "scenario", "region"]
+    else:
+        metadata = _MetadataIndex.from_data(df.data, df.time_col)
+        assert metadata.runs is None
+
+    assert metadata.time_col == "year"
+    assert set(metadata.variables) == set(df.variables())
+    assert "Primary Energy" in metadata
+    assert "Emissions|N2O" not in metadata
+    assert metadata.units("Emissions|CO2") == ["Mt CO2/yr"]
+    assert metadata.units("Emissions|N2O") == []
+    assert metadata.all_times.tolist() == [2005, 2010]
+    assert metadata.times("Primary Energy").tolist() == [2005, 2010]
+    assert metadata.times("Primary Energy|Gas").tolist() == [2005]
+    assert metadata.times("Emissions|N2O").tolist() == []
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pyam import IamDataFrame
+
+from silicone.database_crunchers import load_database_store, save_database_store
+from silicone.database_crunchers.cube import _DatabaseCube, _MetadataIndex
+
+
+@pytest.mark.parametrize("chunksize", [3, 1000000])
+def test_save_and_load_database_store(check_aggregate_df, tmpdir, chunksize):
+    save_database_store(check_aggregate_df, str(tmpdir), chunksize=chunksize)
+    cube = load_database_store(str(tmpdir))
+    exp = _DatabaseCube(check_aggregate_df.data, check_aggregate_df.time_col)
+
+    assert isinstance(cube.values, np.memmap)
+    assert not cube.values.flags.writeable
+    np.testing.assert_array_equal(cube.values, exp.values)
+    np.testing.assert_array_equal(cube.key_times, exp.key_times)
+    assert cube.time_col == exp.time_col
+    assert cube.run_cols == exp.run_cols
+    pd.testing.assert_index_equal(cube.keys, exp.keys)
+    pd.testing.assert_index_equal(cube.runs, exp.runs)
+    pd.testing.assert_index_equal(cube.times, exp.times)
+    assert cube.time_index.labels() == exp.time_index.labels()
+    for variable in exp.variables:
+        pd.testing.assert_frame_equal(
+            cube.timeseries(variable), exp.timeseries(variable)
+        )
+
+    metadata = _MetadataIndex.from_cube(cube)
+    exp_metadata = _MetadataIndex.from_cube(exp)
+    pd.testing.assert_index_equal(metadata.all_times, exp_metadata.all_times)
+    for variable in exp.variables:
+        pd.testing.assert_index_equal(
+            metadata.times(variable), exp_metadata.times(variable)
+        )
+
+
+def test_save_database_store_compact(check_aggregate_df, tmpdir):
+    save_database_store(check_aggregate_df, str(tmpdir), compact=True)
+    cube = load_database_store(str(tmpdir))
+
+    assert cube.values.dtype == np.float32
+    np.testing.assert_allclose(
+        cube.values,
+        _DatabaseCube(check_aggregate_df.data, check_aggregate_df.time_col).values,
+        rtol=1e-6,
+    )
+
+
+def test_database_store_index_not_pickled(check_aggregate_df, tmpdir):
+    save_database_store(check_aggregate_df, str(tmpdir))
+    assert set(os.listdir(str(tmpdir))) == {"index.npz", "values.npy"}
+    # The index can be read without unpickling any objects
+    with np.load(str(tmpdir.join("index.npz")), allow_pickle=False) as index:
+        assert all(index[key].dtype != object for key in index.files)
+
+
+def test_database_store_extra_cols(check_aggregate_df, tmpdir):
+    data = check_aggregate_df.data
+    data["climate_model"] = "a_model"
+    db = IamDataFrame(data)
+    # Missing labels are stored too
+    db.data.loc[db.data.index[:2], "climate_model"] = np.nan
+    save_database_store(db, str(tmpdir))
+    cube = load_database_store(str(tmpdir))
+    exp = _DatabaseCube(db.data, db.time_col)
+
+    assert "climate_model" in cube.run_cols
+    pd.testing.assert_index_equal(cube.runs, exp.runs)
+    np.testing.assert_array_equal(cube.values, exp.values)
+
+
+def test_database_store_bad_labels(check_aggregate_df, tmpdir):
+    data = check_aggregate_df.data
+    data["climate_model"] = [("a", i) for i in range(len(data))]
+    db = IamDataFrame(data)
+    error_msg = "The values of `climate_model` cannot be stored"
+    with pytest.raises(ValueError, match=error_msg):
+        save_database_store(db, str(tmpdir))
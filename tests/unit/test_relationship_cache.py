@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+import pytest
+
+from silicone.database_crunchers import QuantileRollingWindows, RelationshipCache
+
+
+def test_relationship_cache():
+    cache = RelationshipCache(maxsize=2)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    # "b" is now the least recently used, so is dropped
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.cache_info() == (2, 2, 2, 2)
+
+    cache.clear()
+    assert cache.cache_info() == (0, 0, 2, 0)
+
+
+def test_relationship_cache_maxsize():
+    with pytest.raises(ValueError, match="`maxsize` must be at least 1"):
+        RelationshipCache(maxsize=0)
+
+
+def test_relationship_cache_directory(check_aggregate_df, tmpdir):
+    directory = str(tmpdir.join("relationships"))
+    leaders = ["Emissions|CO2"]
+    filler = QuantileRollingWindows(check_aggregate_df).derive_relationship(
+        "Primary Energy", leaders
+    )
+    cache = RelationshipCache(directory=directory)
+    cache.put("key", filler)
+    assert len(os.listdir(directory)) == 1
+
+    # A new cache (e.g. in another process) loads the relationship from disk
+    cache = RelationshipCache(directory=directory)
+    loaded = cache.get("key")
+    assert cache.cache_info() == (1, 0, 128, 1)
+    assert cache.get("other key") is None
+    to_fill = check_aggregate_df.filter(variable=leaders)
+    pd.testing.assert_frame_equal(loaded(to_fill).data, filler(to_fill).data)
@@ -1,3 +1,4 @@
+import datetime as dt
 import os
 import re
 
@@ -12,7 +13,12 @@ from requests.exceptions import ConnectionError
 from silicone.utils import (
     _construct_consistent_values,
     _get_unit_of_variable,
+    _interpolate_from_table,
+    _interpolate_onto_times,
+    _interpolate_time_values,
+    _make_interpolation_table_from_arrays,
     _make_interpolator,
+    _TimeIndex,
     convert_units_to_MtCO2_equiv,
     download_or_load_sr15,
     find_matching_scenarios,
@@ -267,6 +273,137 @@ def test__make_interpolator():
     np.testing.assert_allclose(output, expected_output, atol=1e-10)
 
 
+def test__make_interpolation_table_from_arrays():
+    xs, ys, offsets = _make_interpolation_table_from_arrays(
+        np.array([1, 1, 2, 3, 4], dtype=float),
+        np.array([6, 4, 3, 2, 7], dtype=float),
+        np.array([0, 0, 0, 0, 1]),
+        2,
+    )
+    np.testing.assert_array_equal(offsets, [0, 3, 4])
+    np.testing.assert_array_equal(xs, [1, 2, 3, 4])
+    # Duplicate leader values are replaced by the average follower value
+    np.testing.assert_array_equal(ys, [5, 3, 2, 7])
+
+    input = np.array([[5, 0], [4, 5], [3, 4], [2, 3], [2.5, 1], [1, np.nan], [0, 4]])
+    expected_output = np.array(
+        [[2, 7], [2, 7], [2, 7], [3, 7], [2.5, 7], [5, np.nan], [5, 7]]
+    )
+    output = _interpolate_from_table(xs, ys, offsets, np.array([0, 1]), input)
+    np.testing.assert_allclose(output, expected_output, atol=1e-10)
+
+
+def test__interpolate_from_table_matches_interpolator():
+    variable_leaders = "variable_leaders"
+    variable_follower = "variable_follower"
+    time_col = "years"
+    np.random.seed(0)
+    wide_db = pd.DataFrame(
+        {
+            variable_leaders: np.round(np.random.normal(size=60), 1),
+            variable_follower: np.random.normal(size=60),
+            time_col: np.repeat([2010, 2020, 2030], 20),
+        }
+    )
+    input = np.round(np.random.normal(scale=2, size=(15, 3)), 1)
+
+    interpolators = _make_interpolator(
+        variable_follower, variable_leaders, wide_db, time_col
+    )
+    time_codes, times = pd.factorize(wide_db[time_col], sort=True)
+    xs, ys, offsets = _make_interpolation_table_from_arrays(
+        wide_db[variable_leaders].values,
+        wide_db[variable_follower].values,
+        time_codes,
+        len(times),
+    )
+    output = _interpolate_from_table(xs, ys, offsets, np.arange(3), input)
+    for ind, time in enumerate(times):
+        np.testing.assert_allclose(output[:, ind], interpolators[time](input[:, ind]))
+
+
+@pytest.mark.parametrize("use_datetimes", [True, False])
+def test__interpolate_time_values(use_datetimes):
+    times = [2010, 2020, 2030, 2050]
+    new_times = [2000, 2010, 2015, 2025, 2040, 2050, 2060]
+    values = np.array(
+        [
+            [1, 2, 3, 5],
+            [1, np.nan, 3, 5],
+            [np.nan, 2, 4, np.nan],
+            [np.nan, np.nan, np.nan, 1],
+        ]
+    )
+    expected = np.array(
+        [
+            [np.nan, 1, 1.5, 2.5, 4, 5, np.nan],
+            [np.nan, 1, 1.5, 2.5, 4, 5, np.nan],
+            [np.nan, np.nan, np.nan, 3, np.nan, np.nan, np.nan],
+            [np.nan, np.nan, np.nan, np.nan, np.nan, 1, np.nan],
+        ]
+    )
+    if use_datetimes:
+        times = [dt.datetime(t, 1, 1) for t in times]
+        new_times = [dt.datetime(t, 1, 1) for t in new_times]
+        # Leap years mean that datetimes are not evenly spaced
+        tolerance = {"rtol": 1e-2}
+    else:
+        tolerance = {}
+
+    res = _interpolate_time_values(values, times, new_times)
+    np.testing.assert_allclose(res, expected, **tolerance)
+
+    # Compare against pyam's implementation
+    to_interpolate = pd.DataFrame(
+        values,
+        index=pd.MultiIndex.from_tuples(
+            [("model_a", "scen_{}".format(i), "World", "v", "u") for i in range(4)],
+            names=_msrvu,
+        ),
+        columns=times,
+    )
+    to_interpolate = pyam.IamDataFrame(to_interpolate)
+    for time in new_times:
+        if time not in times:
+            to_interpolate.interpolate(time)
+    pyam_res = to_interpolate.timeseries().reindex(columns=new_times).values
+    np.testing.assert_allclose(res, pyam_res)
+
+
+@pytest.mark.parametrize("use_datetimes", [True, False])
+def test__interpolate_onto_times(use_datetimes):
+    times = [2010, 2020, 2030, 2050]
+    new_times = [2000, 2010, 2015, 2040, 2060]
+    values = np.array([[1, 2, 3, 5], [1, np.nan, 3, 5], [np.nan, 2, 4, np.nan]])
+    if use_datetimes:
+        times = [dt.datetime(t, 1, 1) for t in times]
+        new_times = [dt.datetime(t, 1, 1) for t in new_times]
+    df = pyam.IamDataFrame(
+        pd.DataFrame(
+            values,
+            index=pd.MultiIndex.from_tuples(
+                [("model_a", "scen_{}".format(i), "World", "v", "u") for i in range(3)],
+                names=_msrvu,
+            ),
+            columns=times,
+        )
+    )
+
+    res = _interpolate_onto_times(df, new_times)
+
+    # pyam interpolates one time at a time, and never extrapolates
+    exp = df.copy()
+    for time in new_times:
+        if time not in times:
+            exp.interpolate(time)
+    exp = exp.filter(**{exp.time_col: new_times})
+    assert res.time_col == df.time_col
+    pd.testing.assert_frame_equal(
+        res.timeseries(), exp.timeseries(), check_column_type=False
+    )
+    assert not res.data["value"].isnull().any()
+
+
 @pytest.mark.parametrize(
     "var,exp",
     (
@@ -576,3 +713,28 @@ def test_construct_consistent_error_no_data():
     )
     with pytest.raises(ValueError, match=error_msg):
         _construct_consistent_values(aggregate_name, components, test_db_ag)
+
+
+def test_time_index_years():
+    time_index = _TimeIndex([2020, np.int64(2010), 2020])
+    assert len(time_index) == 2
+    assert not time_index.is_datetime
+    np.testing.assert_array_equal(
+        time_index.get_indexer(pd.Index([2020, 2015, 2010])), [1, -1, 0]
+    )
+    assert time_index.labels() == [2010, 2020]
+    assert all(isinstance(y, int) for y in time_index.labels())
+
+
+def test_time_index_datetimes():
+    time_index = _TimeIndex(
+        [dt.datetime(2020, 1, 1), np.datetime64("2010-01-01"), "2030-01-01"]
+    )
+    assert time_index.is_datetime
+    np.testing.assert_array_equal(
+        time_index.get_indexer(
+            [pd.Timestamp("2030-01-01"), dt.datetime(2010, 1, 1), "2015-01-01"]
+        ),
+        [2, 0, -1],
+    )
+    assert time_index.labels([1]) == [dt.datetime(2020, 1, 1)]